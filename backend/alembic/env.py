@@ -16,7 +16,7 @@ sys.path.insert(0, os.path.dirname(backend_dir))
 from app.db import Base
 from app.core.config import settings
 # Import all models to register them with Base.metadata
-from app.models import shop, service, faq, chat_config, subscription
+from app.models import shop, service, faq, chat_config, subscription, knowledge, transcript, analytics, usage, job, sync, idempotency
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,92 @@
+"""cascade shop deletes and add the jobs table
+
+Revision ID: b7c3e1f0a945
+Revises:
+Create Date: 2026-10-19 00:00:00.000000
+
+Migration history is generated per deployment (alembic/versions is not
+tracked), so this revision starts its own branch. Apply it with
+`alembic upgrade heads`, then `alembic merge heads` to rejoin a single
+history. Constraints are found by reflection, so it works whatever names
+the original migrations gave them.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c3e1f0a945'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = ('shop_cascade',)
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column, referenced table)
+CASCADES = [
+    ('services', 'shop_id', 'shops'),
+    ('faqs', 'shop_id', 'shops'),
+    ('chat_configs', 'shop_id', 'shops'),
+    ('chat_widget_configs', 'shop_id', 'shops'),
+    ('compiled_contexts', 'shop_id', 'shops'),
+    ('knowledge_documents', 'shop_id', 'shops'),
+    ('knowledge_chunks', 'shop_id', 'shops'),
+    ('knowledge_chunks', 'document_id', 'knowledge_documents'),
+    ('chat_transcripts', 'shop_id', 'shops'),
+    ('chat_rollups', 'shop_id', 'shops'),
+    ('question_rollups', 'shop_id', 'shops'),
+    ('widget_event_counts', 'shop_id', 'shops'),
+    ('shop_usage', 'shop_id', 'shops'),
+]
+
+# Cascading deletes look rows up by shop_id; updated_at serves listings by recency
+INDEXES = [
+    ('ix_services_shop_updated', 'services', ['shop_id', 'updated_at']),
+    ('ix_faqs_shop_updated', 'faqs', ['shop_id', 'updated_at']),
+]
+
+
+def _recreate_foreign_keys(ondelete: Union[str, None]) -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table, column, referred in CASCADES:
+        if not inspector.has_table(table):
+            continue
+        for foreign_key in inspector.get_foreign_keys(table):
+            if foreign_key['constrained_columns'] == [column] and foreign_key['referred_table'] == referred:
+                op.drop_constraint(foreign_key['name'], table, type_='foreignkey')
+        op.create_foreign_key(f'{table}_{column}_fkey', table, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _recreate_foreign_keys('CASCADE')
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if inspector.has_table(table):
+            op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('kind', sa.String(length=64), nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('status', sa.String(length=16), server_default='queued', nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('run_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_jobs_status_run_at', 'jobs', ['status', 'run_at'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_status_run_at', table_name='jobs')
+    op.drop_table('jobs')
+    for name, table, _ in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    _recreate_foreign_keys(None)
@@ -0,0 +1,38 @@
+"""jobs: attempt limits, leases and start times for the job runner
+
+Revision ID: d41f9a7c2e58
+Revises: b7c3e1f0a945
+Create Date: 2026-10-19 00:00:00.000000
+
+Jobs already queued get job_max_attempts (8), except Supabase account
+deletions, which get about a day of retries like new ones.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f9a7c2e58'
+down_revision: Union[str, Sequence[str], None] = 'b7c3e1f0a945'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('max_attempts', sa.Integer(), server_default='8', nullable=False))
+    op.alter_column('jobs', 'max_attempts', server_default=None)
+    op.execute("UPDATE jobs SET max_attempts = 30 WHERE kind = 'supabase.delete_user'")
+    op.add_column('jobs', sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('jobs', sa.Column('started_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The previous worker retries queued jobs indefinitely and knows no other states
+    op.execute("UPDATE jobs SET status = 'queued' WHERE status IN ('running', 'dead')")
+    op.drop_column('jobs', 'started_at')
+    op.drop_column('jobs', 'locked_until')
+    op.drop_column('jobs', 'max_attempts')
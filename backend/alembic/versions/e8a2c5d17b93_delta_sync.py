@@ -0,0 +1,61 @@
+"""delta sync: per-shop versions, tombstones and the shops.owner_id index
+
+Revision ID: e8a2c5d17b93
+Revises: d41f9a7c2e58
+Create Date: 2026-10-19 00:00:00.000000
+
+The (shop_id, updated_at) indexes the sync queries use come with the
+cascade revision. Shops without a shop_sync_states row report version 0
+until their first change, so no backfill is needed.
+
+Like the rest of the shop_cascade branch, this can run before the
+deployment's base revision on a fresh database; it then does nothing and
+the base revision, generated from the models, creates these tables.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a2c5d17b93'
+down_revision: Union[str, Sequence[str], None] = 'd41f9a7c2e58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table('shops'):
+        return
+    op.create_table(
+        'shop_sync_states',
+        sa.Column('shop_id', sa.UUID(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['shop_id'], ['shops.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('shop_id'),
+    )
+    op.create_table(
+        'sync_tombstones',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('shop_id', sa.UUID(), nullable=False),
+        sa.Column('entity', sa.String(length=32), nullable=False),
+        sa.Column('entity_id', sa.UUID(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['shop_id'], ['shops.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_sync_tombstones_shop_deleted', 'sync_tombstones', ['shop_id', 'deleted_at'], unique=False)
+    op.create_index('ix_shops_owner_id', 'shops', ['owner_id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table('shop_sync_states'):
+        return
+    op.drop_index('ix_shops_owner_id', table_name='shops')
+    op.drop_index('ix_sync_tombstones_shop_deleted', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+    op.drop_table('shop_sync_states')
@@ -0,0 +1,50 @@
+"""idempotency_keys: chat turn deduplication shared by all workers
+
+Revision ID: f3b9d2a61c47
+Revises: e8a2c5d17b93
+Create Date: 2026-10-19 00:00:00.000000
+
+Like the rest of the shop_cascade branch, this does nothing on a fresh
+database, where the base revision generated from the models creates the
+table.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9d2a61c47'
+down_revision: Union[str, Sequence[str], None] = 'e8a2c5d17b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('shops') or inspector.has_table('idempotency_keys'):
+        return
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('scope', sa.String(length=64), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('claim_id', sa.UUID(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('scope', 'key'),
+    )
+    op.create_index('ix_idempotency_keys_expires_at', 'idempotency_keys', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table('idempotency_keys'):
+        return
+    op.drop_index('ix_idempotency_keys_expires_at', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,75 @@
+"""
+Factory for the public widget API: widget.js, anonymous chat (HTTP and
+WebSocket), timing reports and FAQ suggestions. Only the service layer is
+shared with the dashboard; nothing here imports the Supabase auth
+dependencies or the dashboard routers.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+
+from app.api.public.chat import router as public_chat_router
+from app.api.public.widget import router as public_widget_router
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.public_cors import PublicCORSMiddleware
+from app.core.responses import default_response_class
+from app.core.tracing import TracingMiddleware, configure_tracing
+from app.services.allowed_origins import refresh_origin_registry
+from app.services.subscription_cache import subscription_listener
+from app.services.transcripts import transcript_writer
+from app.services.widget_events import widget_events
+from app.services.usage import usage_meter
+
+
+def create_public_app(standalone: bool) -> FastAPI:
+    """
+    Build the public app. When mounted into the dashboard app (standalone=False)
+    its middleware and health/metrics endpoints are left to the parent.
+    """
+    if not standalone:
+        public_app = FastAPI(openapi_url=None, default_response_class=default_response_class())
+        public_app.include_router(public_chat_router, prefix="/api/v1")
+        public_app.include_router(public_widget_router, prefix="/api/v1")
+        return public_app
+
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI):
+        # Load the origin registry before taking traffic instead of on the first request
+        await asyncio.to_thread(refresh_origin_registry)
+        subscription_listener.start()
+        transcript_writer.start()
+        widget_events.start()
+        usage_meter.start()
+        yield
+        # The stops join their threads, so they run off the event loop
+        await asyncio.to_thread(subscription_listener.stop)
+        # Flush transcripts, event counts and token usage still held in memory
+        await asyncio.to_thread(transcript_writer.stop)
+        await asyncio.to_thread(widget_events.stop)
+        await asyncio.to_thread(usage_meter.stop)
+
+    configure_tracing()
+    public_app = FastAPI(
+        title="Chatbot.ai Widget API", version="1.0.0", lifespan=lifespan, docs_url=None, redoc_url=None,
+        default_response_class=default_response_class()
+    )
+    public_app.add_middleware(CompressionMiddleware)
+    public_app.add_middleware(PublicCORSMiddleware)
+    public_app.add_middleware(MetricsMiddleware)
+    public_app.add_middleware(TracingMiddleware)
+
+    public_app.include_router(public_chat_router, prefix="/api/v1")
+    public_app.include_router(public_widget_router, prefix="/api/v1")
+
+    @public_app.get("/health")
+    async def health():
+        return {"status": "ok", "version": "1.0.1"}
+
+    @public_app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        payload, content_type = render_metrics()
+        return Response(content=payload, media_type=content_type)
+
+    return public_app
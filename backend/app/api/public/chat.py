@@ -0,0 +1,271 @@
+import asyncio
+import json
+import time
+from typing import Dict, Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.schemas.chat import ChatRequest, ChatResponse, SocketHello, SocketUserMessage
+from app.services.chat import generate_chat_response, ChatGenerationError, ChatResult
+from app.services.chat_config import get_shop_by_id
+from app.services.chat_sessions import ChatSession, attach_session, detach_session
+from app.services.idempotency import IdempotencyConflict, chat_idempotency, request_fingerprint
+from app.services.transcripts import transcript_writer
+from app.core.config import settings
+from app.core.metrics import CHAT_SOCKETS_OPEN
+from app.core.public_cors import simple_json_body
+from app.core.disconnect import CLIENT_CLOSED_REQUEST, ClientDisconnected, cancel_on_disconnect
+from app.db import get_read_db, read_session
+
+router = APIRouter(prefix="/chat", tags=["public"])
+
+
+@router.post("/{shop_id}/public", response_model=ChatResponse)
+async def public_chat_completion(
+    shop_id: UUID,
+    request: Request,
+    response: Response,
+    chat_request: ChatRequest = Depends(simple_json_body(ChatRequest)),
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Generate AI chatbot response for anonymous customers using shop's widget.
+    
+    Takes a shop ID and chat messages, returns AI response using the shop's
+    context (services, FAQs, chat config). No authentication required.
+    
+    The body is JSON but may be sent as text/plain so that browsers skip the
+    CORS preflight; the origin was already checked by PublicCORSMiddleware.
+    The turn is queued for the transcript log after the reply is ready.
+    
+    With an idempotency key (Idempotency-Key header or idempotency_key in the
+    body, generated per turn by the widget) a retried request attaches to the
+    turn still being generated or gets its stored reply instead of starting
+    another completion; reusing a key with a different body is rejected.
+    """
+    # Get shop by ID
+    shop = get_shop_by_id(db, shop_id)
+    if not shop:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shop not found"
+        )
+    
+    # Convert Pydantic messages to dict format for OpenAI
+    messages = [
+        {"role": msg.role, "content": msg.content} 
+        for msg in chat_request.messages
+    ]
+    
+    async def run_turn(turn_db: Session) -> ChatResult:
+        result = await generate_chat_response(turn_db, shop, messages)
+        transcript_writer.record(
+            shop.id,
+            chat_request.session_id,
+            sum(1 for msg in messages if msg["role"] == "user"),
+            "http",
+            messages[-1]["content"] if messages else "",
+            result
+        )
+        return result
+    
+    async def run_detached_turn() -> ChatResult:
+        # May outlive this request, whose session is closed once it returns
+        turn_db = read_session()
+        try:
+            return await run_turn(turn_db)
+        finally:
+            turn_db.close()
+    
+    key = idempotency_key or chat_request.idempotency_key
+    try:
+        if key:
+            # Keyed turns outlive a disconnect for a short while, so a retry can pick them up
+            fingerprint = request_fingerprint(chat_request.model_dump(exclude={"idempotency_key"}))
+            result, replayed = await cancel_on_disconnect(
+                request, chat_idempotency.run(f"shop:{shop.id}", key, fingerprint, run_detached_turn)
+            )
+            if replayed:
+                response.headers["Idempotent-Replayed"] = "true"
+        else:
+            # Generate AI response, abandoning it if the client hangs up first
+            result = await cancel_on_disconnect(request, run_turn(db))
+        return ChatResponse(reply=result.reply)
+        
+    except IdempotencyConflict:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency key was already used with a different request"
+        )
+    except ClientDisconnected:
+        # Nobody is listening any more; the status only shows up in access logs
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except ChatGenerationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate response: {str(e)}"
+        )
+
+
+@router.websocket("/{shop_id}/ws")
+async def chat_websocket(websocket: WebSocket, shop_id: UUID):
+    """
+    Widget chat over one long-lived connection per visitor.
+    
+    The client opens with {"type": "hello"} (optionally carrying session_id,
+    turn and seq to resume), then sends {"type": "message", "content": ...}
+    per turn. The server streams {"type": "delta"} frames followed by
+    "done" or "error", and sends "ping" when idle; the client answers "pong".
+    Only one turn may be in flight per session.
+    """
+    db = read_session()
+    try:
+        shop = get_shop_by_id(db, shop_id)
+    finally:
+        db.close()
+    if not shop:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Shop not found")
+        return
+    
+    await websocket.accept()
+    try:
+        raw = await asyncio.wait_for(websocket.receive_text(), settings.ws_heartbeat_interval)
+        # Checked before parsing; the schema then bounds each history entry
+        if len(raw) > settings.ws_max_history_messages * settings.ws_max_history_message_chars + 1024:
+            raise ValueError("Hello frame too long")
+        hello = SocketHello.model_validate_json(raw)
+    except (asyncio.TimeoutError, ValueError, WebSocketDisconnect):
+        await _close_quietly(websocket, status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    listener = asyncio.Event()
+    history = [{"role": msg.role, "content": msg.content} for msg in hello.history if msg.role != "system"]
+    session = attach_session(shop_id, hello.session_id, history, listener)
+    if session is None:
+        await _close_quietly(websocket, status.WS_1013_TRY_AGAIN_LATER)
+        return
+    
+    resumed = session.id == hello.session_id
+    await websocket.send_json({"type": "ready", "session_id": session.id, "resumed": resumed, "turn": session.turn})
+    
+    CHAT_SOCKETS_OPEN.inc()
+    last_activity = [time.monotonic()]
+    sender = asyncio.ensure_future(_send_updates(
+        websocket, session, listener, last_activity,
+        hello.turn if resumed else 0,
+        hello.seq if resumed else 0
+    ))
+    receiver = asyncio.ensure_future(_receive_messages(websocket, session, last_activity))
+    try:
+        await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        sender.cancel()
+        receiver.cancel()
+        await asyncio.gather(sender, receiver, return_exceptions=True)
+        detach_session(session, listener)
+        CHAT_SOCKETS_OPEN.dec()
+        await _close_quietly(websocket, status.WS_1000_NORMAL_CLOSURE)
+
+
+async def _close_quietly(websocket: WebSocket, code: int) -> None:
+    try:
+        await websocket.close(code=code)
+    except RuntimeError:
+        # Already closed by the client
+        pass
+
+
+async def _send_json(websocket: WebSocket, payload: Dict) -> None:
+    # A client that cannot keep up is disconnected rather than buffered for
+    await asyncio.wait_for(websocket.send_json(payload), settings.ws_send_timeout)
+
+
+async def _send_updates(
+    websocket: WebSocket,
+    session: ChatSession,
+    listener: asyncio.Event,
+    last_activity: list,
+    turn: int,
+    cursor: int
+) -> None:
+    """
+    Forward the session's reply to this connection.
+    
+    Deltas produced while a send was in progress are coalesced into the next
+    frame, so a slow client gets fewer, larger frames instead of a backlog.
+    """
+    # Clients ignore a repeated "done" for a turn they already finished
+    finished = False
+    listener.set()
+    while True:
+        try:
+            await asyncio.wait_for(listener.wait(), settings.ws_heartbeat_interval)
+        except asyncio.TimeoutError:
+            if not session.busy and time.monotonic() - last_activity[0] > settings.ws_idle_timeout:
+                return
+            await _send_json(websocket, {"type": "ping"})
+            continue
+        listener.clear()
+        
+        if turn != session.turn:
+            turn, cursor, finished = session.turn, 0, False
+        if finished:
+            continue
+        
+        if cursor < len(session.deltas):
+            pending = session.deltas[cursor:]
+            cursor += len(pending)
+            await _send_json(websocket, {"type": "delta", "turn": turn, "seq": cursor, "text": "".join(pending)})
+        
+        if not session.busy and turn > 0:
+            finished = True
+            if session.error:
+                await _send_json(websocket, {"type": "error", "turn": turn, "detail": session.error})
+            else:
+                await _send_json(websocket, {"type": "done", "turn": turn, "seq": cursor})
+
+
+async def _receive_messages(websocket: WebSocket, session: ChatSession, last_activity: list) -> None:
+    """Handle client frames; returns when the client disconnects or stops answering pings"""
+    while True:
+        try:
+            raw = await asyncio.wait_for(websocket.receive_text(), settings.ws_heartbeat_interval * 2)
+        except (asyncio.TimeoutError, WebSocketDisconnect):
+            return
+        
+        if len(raw) > settings.ws_max_message_chars + 1024:
+            await _send_json(websocket, {"type": "error", "detail": "Message too long"})
+            continue
+        try:
+            frame = json.loads(raw)
+        except ValueError:
+            await _send_json(websocket, {"type": "error", "detail": "Invalid JSON"})
+            continue
+        
+        kind = frame.get("type") if isinstance(frame, dict) else None
+        if kind == "ping":
+            await _send_json(websocket, {"type": "pong"})
+        elif kind == "pong":
+            pass
+        elif kind == "message":
+            try:
+                message = SocketUserMessage.model_validate(frame)
+            except ValidationError:
+                await _send_json(websocket, {"type": "error", "detail": "Invalid message"})
+                continue
+            content = message.content.strip()
+            if not content or len(content) > settings.ws_max_message_chars:
+                await _send_json(websocket, {"type": "error", "detail": "Message too long"})
+            elif session.busy:
+                await _send_json(websocket, {"type": "error", "detail": "A reply is still being generated"})
+            elif session.turn >= settings.ws_max_turns:
+                await _send_json(websocket, {"type": "error", "detail": "Conversation limit reached"})
+                return
+            else:
+                last_activity[0] = time.monotonic()
+                session.start_turn(content, message.traceparent)
+        else:
+            await _send_json(websocket, {"type": "error", "detail": "Unknown frame type"})
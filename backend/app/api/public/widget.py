@@ -0,0 +1,115 @@
+import asyncio
+import os
+from typing import List
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+
+from app.schemas.widget import WidgetTimingReport, WidgetEventBatch, FAQSuggestion
+from app.services.faq_index import (
+    get_cached_faq_index,
+    is_faq_index_stale,
+    claim_faq_index_refresh,
+    refresh_faq_index
+)
+from app.services.allowed_origins import is_known_shop
+from app.services.widget_events import widget_events
+from app.core.responses import FastJSONResponse
+from app.core.tracing import record_client_span
+from app.core.public_cors import ensure_origin_registry, simple_json_body
+
+router = APIRouter(prefix="/widget", tags=["public"])
+
+
+@router.get("/widget.js")
+async def serve_widget_js():
+    """
+    Serve the widget JavaScript file for embedding on customer websites.
+    
+    This endpoint serves the static widget.js file that creates the chat UI
+    and connects to the public chat API.
+    """
+    widget_path = os.path.join("app", "static", "widget", "v1", "widget.js")
+    
+    if not os.path.exists(widget_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Widget file not found"
+        )
+    
+    return FileResponse(
+        widget_path,
+        media_type="application/javascript",
+        headers={"Cache-Control": "public, max-age=3600"}
+    )
+
+
+@router.post("/{shop_id}/timing", status_code=status.HTTP_204_NO_CONTENT)
+async def report_widget_timing(
+    shop_id: UUID,
+    report: WidgetTimingReport = Depends(simple_json_body(WidgetTimingReport))
+):
+    """
+    Record the widget's client-side time-to-first-render for a chat turn.
+
+    The span is attached to the trace started by widget.js for that turn, so it
+    appears next to the server-side spans of the same request. Sent as
+    text/plain to avoid a CORS preflight.
+    """
+    record_client_span(
+        "widget.first_render",
+        report.traceparent,
+        report.ttfr_ms,
+        {"shop.id": str(shop_id)}
+    )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post("/{shop_id}/events", status_code=status.HTTP_204_NO_CONTENT)
+async def record_widget_events(
+    shop_id: UUID,
+    batch: WidgetEventBatch = Depends(simple_json_body(WidgetEventBatch))
+):
+    """
+    Count a batch of widget funnel events (impressions, opens, closes,
+    messages sent), as sent by navigator.sendBeacon.
+    
+    Only adds to this worker's in-memory counters, which are written to the
+    database in bulk every few seconds. Events for shop ids the origin
+    registry does not know are discarded without touching the database.
+    """
+    await ensure_origin_registry()
+    widget_events.add(shop_id, batch.events)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/{shop_id}/suggest", response_model=List[FAQSuggestion])
+async def suggest_faqs(
+    shop_id: UUID,
+    q: str = Query(default="", max_length=200),
+    limit: int = Query(default=5, ge=1, le=10)
+):
+    """
+    Typeahead suggestions from the shop's FAQs for the widget input.
+    
+    Served from the worker's in-memory FAQ index. A stale index is still served
+    while it is rebuilt in the background, so only the very first request for
+    a shop on a cold worker reads the database. Shop ids the origin registry
+    does not know get a 404 without an index being built.
+    """
+    await ensure_origin_registry()
+    if not is_known_shop(shop_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shop not found")
+    
+    index = get_cached_faq_index(shop_id, allow_stale=True)
+    if index is None:
+        claim_faq_index_refresh(shop_id)
+        index = await run_in_threadpool(refresh_faq_index, shop_id)
+    elif is_faq_index_stale(shop_id) and claim_faq_index_refresh(shop_id):
+        asyncio.get_running_loop().run_in_executor(None, refresh_faq_index, shop_id)
+    
+    return FastJSONResponse(
+        [{"id": entry.id, "question": entry.question, "answer": entry.answer} for entry in index.suggest(q, limit)],
+        headers={"Cache-Control": "public, max-age=30"}
+    )
\ No newline at end of file
@@ -0,0 +1,83 @@
+from typing import List
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+from app.schemas.admin import JobResponse, ModelOverrideUpdate
+from app.schemas.chat_config import ChatConfigResponse
+from app.services.chat_config import get_chat_config_by_shop, set_model_override
+from app.core.admin_auth import require_admin
+from app.core.profiling import list_profiles, load_profile
+from app.services.chat import get_llm_health
+from app.services.jobs import list_jobs, retry_job
+from app.db import get_db
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiles", response_model=List[str])
+async def get_profiles():
+    """List request ids that have a stored profile"""
+    return list_profiles()
+
+
+@router.get("/profiles/{request_id}", response_class=PlainTextResponse)
+async def get_profile(request_id: str):
+    """
+    Return the collapsed stacks recorded for a profiled request.
+    
+    The output can be fed directly to flamegraph.pl or loaded into speedscope.
+    """
+    profile = load_profile(request_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return profile
+
+
+@router.get("/llm")
+async def get_llm_status():
+    """Circuit breaker state, trip count and recent OpenAI latency for the serving worker"""
+    return get_llm_health()
+
+
+@router.put("/shops/{shop_id}/model-override", response_model=ChatConfigResponse)
+async def update_model_override(
+    shop_id: UUID,
+    override: ModelOverrideUpdate,
+    db: Session = Depends(get_db)
+):
+    """Pin a shop to a specific model, or clear the pin with null to use normal routing"""
+    chat_config = get_chat_config_by_shop(db, shop_id)
+    if not chat_config:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat config not found"
+        )
+    
+    return set_model_override(db, chat_config, override.model_override)
+
+
+@router.get("/jobs", response_model=List[JobResponse])
+async def get_jobs(
+    status_filter: str = Query(default="dead", alias="status", pattern="^(queued|running|done|dead)$"),
+    limit: int = Query(default=50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Background jobs by status, most recent first; dead jobs are those that ran out of attempts"""
+    return list_jobs(db, status_filter, limit)
+
+
+@router.post("/jobs/{job_id}/retry", response_model=JobResponse)
+async def retry_dead_job(job_id: UUID, db: Session = Depends(get_db)):
+    """Queue a dead job again with a fresh set of attempts"""
+    job = retry_job(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dead job not found"
+        )
+    return job
@@ -0,0 +1,33 @@
+from typing import Dict
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.schemas.analytics import AnalyticsResponse
+from app.services.analytics import get_shop_analytics
+from app.services.chat_config import get_shop_by_owner
+from app.core.supabase_auth import get_current_user
+from app.db import get_read_db
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+@router.get("/", response_model=AnalyticsResponse)
+async def get_analytics(
+    days: int = Query(default=7, ge=1, le=90),
+    user: Dict[str, str] = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Widget chat volume, response times and top questions for the user's shop.
+    
+    Served from the hourly/daily rollups, which trail live traffic by a
+    couple of minutes, so the cost does not grow with chat volume.
+    """
+    shop = get_shop_by_owner(db, user["id"])
+    if not shop:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shop not found"
+        )
+    
+    return get_shop_analytics(db, shop.id, days)
@@ -1,20 +1,24 @@
-from typing import Dict
-from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Dict, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 
 from app.schemas.chat import ChatRequest, ChatResponse
-from app.services.chat import generate_chat_response
-from app.services.chat_config import get_shop_by_owner, get_shop_by_id
+from app.services.chat import generate_chat_response, ChatGenerationError
+from app.services.chat_config import get_shop_by_owner
+from app.services.idempotency import IdempotencyConflict, chat_idempotency, request_fingerprint
 from app.core.supabase_auth import get_current_user
-from app.db import get_db
+from app.core.disconnect import CLIENT_CLOSED_REQUEST, ClientDisconnected, cancel_on_disconnect
+from app.db import SessionLocal, get_db
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
 @router.post("/", response_model=ChatResponse)
 async def chat_completion(
+    request: Request,
+    response: Response,
     chat_request: ChatRequest,
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
     user: Dict[str, str] = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -22,7 +26,8 @@ async def chat_completion(
     Generate AI chatbot response for the authenticated user's shop.
     
     Takes a list of chat messages and returns an AI-generated response
-    using the shop's context (services, FAQs, chat config).
+    using the shop's context (services, FAQs, chat config). A retry carrying
+    the same Idempotency-Key reuses the first request's reply.
     """
     # Get user's shop
     shop = get_shop_by_owner(db, user["id"])
@@ -38,50 +43,38 @@ async def chat_completion(
         for msg in chat_request.messages
     ]
     
+    async def run_detached_turn():
+        # May outlive this request, whose session is closed once it returns
+        turn_db = SessionLocal()
+        try:
+            return await generate_chat_response(turn_db, shop, messages)
+        finally:
+            turn_db.close()
+    
+    key = idempotency_key or chat_request.idempotency_key
     try:
-        # Generate AI response
-        reply = await generate_chat_response(db, shop, messages)
-        return ChatResponse(reply=reply)
+        if key:
+            fingerprint = request_fingerprint(chat_request.model_dump(exclude={"idempotency_key"}))
+            result, replayed = await cancel_on_disconnect(
+                request,
+                chat_idempotency.run(f"user:{user['id']}", key, fingerprint, run_detached_turn)
+            )
+            if replayed:
+                response.headers["Idempotent-Replayed"] = "true"
+        else:
+            # Generate AI response, abandoning it if the client hangs up first
+            result = await cancel_on_disconnect(request, generate_chat_response(db, shop, messages))
+        return ChatResponse(reply=result.reply)
         
-    except Exception as e:
+    except IdempotencyConflict:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to generate response: {str(e)}"
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency key was already used with a different request"
         )
-
-
-@router.post("/{shop_id}/public", response_model=ChatResponse)
-async def public_chat_completion(
-    shop_id: UUID,
-    chat_request: ChatRequest,
-    db: Session = Depends(get_db)
-):
-    """
-    Generate AI chatbot response for anonymous customers using shop's widget.
-    
-    Takes a shop ID and chat messages, returns AI response using the shop's
-    context (services, FAQs, chat config). No authentication required.
-    """
-    # Get shop by ID
-    shop = get_shop_by_id(db, shop_id)
-    if not shop:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Shop not found"
-        )
-    
-    # Convert Pydantic messages to dict format for OpenAI
-    messages = [
-        {"role": msg.role, "content": msg.content} 
-        for msg in chat_request.messages
-    ]
-    
-    try:
-        # Generate AI response
-        reply = await generate_chat_response(db, shop, messages)
-        return ChatResponse(reply=reply)
-        
-    except Exception as e:
+    except ClientDisconnected:
+        # Nobody is listening any more; the status only shows up in access logs
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except ChatGenerationError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate response: {str(e)}"
@@ -1,5 +1,7 @@
-from typing import Dict
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+from typing import Dict, List
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from sqlalchemy.orm import Session
 
 from app.schemas.chat_config import (
@@ -10,16 +12,26 @@ from app.schemas.chat_config import (
     ChatWidgetConfigUpdate, 
     ChatWidgetConfigRead
 )
+from app.schemas.knowledge import KnowledgeDocumentResponse
 from app.services.chat_config import (
     get_shop_by_owner,
     get_chat_config_by_shop,
     create_chat_config,
     update_chat_config
 )
+from app.services.knowledge import (
+    get_document_rows_by_shop,
+    get_document_by_id,
+    ingest_document,
+    delete_document
+)
+from app.services.allowed_origins import update_shop_origins
+from app.core.config import settings
 from app.models.chat_config import ChatWidgetConfig
+from app.core.responses import FastJSONResponse
 from app.core.supabase_auth import get_current_user
 from app.core.subscription_auth import require_active_subscription
-from app.db import get_db
+from app.db import get_db, get_read_db
 
 router = APIRouter(prefix="/chat-config", tags=["chat-config"])
 
@@ -28,7 +40,7 @@ router = APIRouter(prefix="/chat-config", tags=["chat-config"])
 async def get_chat_config(
     user: Dict[str, str] = Depends(get_current_user),
     subscription = Depends(require_active_subscription),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     shop = get_shop_by_owner(db, user["id"])
     if not shop:
@@ -93,7 +105,13 @@ async def update_existing_chat_config(
             detail="Chat config not found"
         )
     
-    updated_config = update_chat_config(db, chat_config, config_data.user_context)
+    updated_config = update_chat_config(
+        db,
+        chat_config,
+        config_data.user_context,
+        faq_shortcut_enabled=config_data.faq_shortcut_enabled,
+        faq_shortcut_threshold=config_data.faq_shortcut_threshold
+    )
     return updated_config
 
 
@@ -102,7 +120,7 @@ async def update_existing_chat_config(
 async def get_widget_config(
     user: Dict[str, str] = Depends(get_current_user),
     subscription = Depends(require_active_subscription),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
 
     shop = get_shop_by_owner(db, user["id"])
@@ -151,6 +169,7 @@ async def create_widget_config(
     db.add(widget_config)
     db.commit()
     db.refresh(widget_config)
+    update_shop_origins(shop.id, widget_config.allowed_origins)
     return widget_config
 
 
@@ -181,4 +200,96 @@ async def update_widget_config(
     
     db.commit()
     db.refresh(widget_config)
-    return widget_config
\ No newline at end of file
+    update_shop_origins(shop.id, widget_config.allowed_origins)
+    return widget_config
+
+
+# Knowledge Document Endpoints
+
+ALLOWED_DOCUMENT_EXTENSIONS = {".txt", ".md", ".markdown"}
+
+
+@router.get("/documents", response_model=List[KnowledgeDocumentResponse])
+async def get_knowledge_documents(
+    user: Dict[str, str] = Depends(get_current_user),
+    subscription = Depends(require_active_subscription),
+    db: Session = Depends(get_read_db)
+):
+    shop = get_shop_by_owner(db, user["id"])
+    if not shop:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shop not found"
+        )
+    
+    return FastJSONResponse(get_document_rows_by_shop(db, shop.id))
+
+
+@router.post("/documents", response_model=KnowledgeDocumentResponse, status_code=status.HTTP_201_CREATED)
+async def upload_knowledge_document(
+    file: UploadFile = File(...),
+    user: Dict[str, str] = Depends(get_current_user),
+    subscription = Depends(require_active_subscription),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload a text or markdown document (policies, price sheets, ...).
+    
+    The document is split into chunks and embedded; only the chunks relevant
+    to each customer question are added to the chatbot prompt.
+    """
+    shop = get_shop_by_owner(db, user["id"])
+    if not shop:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shop not found"
+        )
+    
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in ALLOWED_DOCUMENT_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only .txt and .md documents are supported"
+        )
+    
+    raw = await file.read(settings.knowledge_max_upload_bytes + 1)
+    if len(raw) > settings.knowledge_max_upload_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Document is too large"
+        )
+    
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Document must be UTF-8 text"
+        )
+    
+    return ingest_document(db, shop.id, file.filename, text)
+
+
+@router.delete("/documents/{document_id}")
+async def delete_knowledge_document(
+    document_id: UUID,
+    user: Dict[str, str] = Depends(get_current_user),
+    subscription = Depends(require_active_subscription),
+    db: Session = Depends(get_db)
+):
+    shop = get_shop_by_owner(db, user["id"])
+    if not shop:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shop not found"
+        )
+    
+    document = get_document_by_id(db, document_id, shop.id)
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    delete_document(db, document)
+    return {"detail": "Document deleted successfully"}
\ No newline at end of file
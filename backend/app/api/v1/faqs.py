@@ -6,14 +6,15 @@ from sqlalchemy.orm import Session
 from app.schemas.faq import FAQCreate, FAQUpdate, FAQResponse
 from app.services.faq import (
     get_shop_by_owner,
-    get_faqs_by_shop,
+    get_faq_rows_by_shop,
     get_faq_by_id,
     create_faq,
     update_faq,
     delete_faq
 )
+from app.core.responses import FastJSONResponse
 from app.core.supabase_auth import get_current_user
-from app.db import get_db
+from app.db import get_db, get_read_db
 
 router = APIRouter(prefix="/faqs", tags=["faqs"])
 
@@ -21,7 +22,7 @@ router = APIRouter(prefix="/faqs", tags=["faqs"])
 @router.get("/", response_model=List[FAQResponse])
 async def get_faqs(
     user: Dict[str, str] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     shop = get_shop_by_owner(db, user["id"])
     if not shop:
@@ -30,8 +31,8 @@ async def get_faqs(
             detail="Shop not found"
         )
     
-    faqs = get_faqs_by_shop(db, shop.id)
-    return faqs
+    # Rows from our own table already match FAQResponse; skip re-validating them
+    return FastJSONResponse(get_faq_rows_by_shop(db, shop.id))
 
 
 @router.post("/", response_model=FAQResponse, status_code=status.HTTP_201_CREATED)
@@ -6,14 +6,15 @@ from sqlalchemy.orm import Session
 from app.schemas.service import ServiceCreate, ServiceUpdate, ServiceResponse
 from app.services.service import (
     get_shop_by_owner,
-    get_services_by_shop,
+    get_service_rows_by_shop,
     get_service_by_id,
     create_service,
     update_service,
     delete_service
 )
+from app.core.responses import FastJSONResponse
 from app.core.supabase_auth import get_current_user
-from app.db import get_db
+from app.db import get_db, get_read_db
 
 router = APIRouter(prefix="/services", tags=["services"])
 
@@ -21,7 +22,7 @@ router = APIRouter(prefix="/services", tags=["services"])
 @router.get("/", response_model=List[ServiceResponse])
 async def get_services(
     user: Dict[str, str] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     shop = get_shop_by_owner(db, user["id"])
     if not shop:
@@ -30,8 +31,8 @@ async def get_services(
             detail="Shop not found"
         )
     
-    services = get_services_by_shop(db, shop.id)
-    return services
+    # Rows from our own table already match ServiceResponse; skip re-validating them
+    return FastJSONResponse(get_service_rows_by_shop(db, shop.id))
 
 
 @router.post("/", response_model=ServiceResponse, status_code=status.HTTP_201_CREATED)
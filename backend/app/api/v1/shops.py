@@ -5,7 +5,8 @@ from typing import Dict
 from app.models.shop import Shop
 from app.schemas.shop import ShopCreate, ShopResponse
 from app.core.supabase_auth import get_current_user
-from app.db import get_db
+from app.db import get_db, get_read_db
+from app.services.allowed_origins import add_known_shop
 
 router = APIRouter(prefix="/shops", tags=["shops"])
 
@@ -30,13 +31,14 @@ async def create_shop(
     db.add(shop)
     db.commit()
     db.refresh(shop)
+    add_known_shop(shop.id)
     return shop
 
 
 @router.get("/me", response_model=ShopResponse)
 async def get_my_shop(
     user: Dict[str, str] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     shop = db.query(Shop).filter(Shop.owner_id == user["id"]).first()
     if not shop:
@@ -80,6 +82,7 @@ async def delete_my_shop(
             detail="Shop not found"
         )
     
+    # Services, FAQs, configs, knowledge and chat history go with it (ON DELETE CASCADE)
     db.delete(shop)
     db.commit()
     return {"detail": "Deleted successfully"}
\ No newline at end of file
@@ -2,14 +2,17 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import Dict
 
-from app.schemas.subscription import SubscriptionResponse
+from app.schemas.subscription import SubscriptionResponse, UsageResponse
 from app.services.subscription import (
     get_subscription_by_owner,
     create_free_subscription,
     cancel_subscription
 )
+from app.services.chat_config import get_shop_by_owner
+from app.services.subscription_cache import get_subscription_state
+from app.services.usage import get_shop_usage
 from app.core.supabase_auth import get_current_user
-from app.db import get_db
+from app.db import get_db, get_read_db
 
 router = APIRouter()
 
@@ -17,7 +20,7 @@ router = APIRouter()
 @router.get("/me", response_model=SubscriptionResponse)
 async def get_my_subscription(
     user: Dict[str, str] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     subscription = get_subscription_by_owner(db, user["id"])
     if not subscription:
@@ -28,6 +31,26 @@ async def get_my_subscription(
     return subscription
 
 
+@router.get("/usage", response_model=UsageResponse)
+async def get_my_usage(
+    user: Dict[str, str] = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Chatbot token usage of the user's shop in the current billing period
+    (calendar month, UTC) against the plan's soft and hard limits.
+    """
+    shop = get_shop_by_owner(db, user["id"])
+    if not shop:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shop not found"
+        )
+    
+    subscription = get_subscription_state(db, user["id"])
+    return get_shop_usage(db, shop.id, subscription.plan_name if subscription else None)
+
+
 @router.post("/activate-free", response_model=SubscriptionResponse, status_code=status.HTTP_201_CREATED)
 async def activate_free_plan(
     user: Dict[str, str] = Depends(get_current_user),
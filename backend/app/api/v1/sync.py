@@ -0,0 +1,47 @@
+from typing import Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session
+
+from app.schemas.sync import SyncResponse
+from app.services.sync import get_sync_changes, get_sync_state
+from app.core.responses import FastJSONResponse
+from app.core.supabase_auth import get_current_user
+from app.db import get_read_db
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+@router.get(
+    "/",
+    response_model=SyncResponse,
+    responses={204: {"description": "Nothing changed since the cursor"}}
+)
+async def sync_shop(
+    since: Optional[str] = Query(default=None, description="Cursor from the previous sync"),
+    user: Dict[str, str] = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Shop, services, FAQs, chat config and widget config changed since the cursor.
+    
+    Deleted services and FAQs are listed by id under "deleted". When nothing
+    has changed the response is 204 with no body, after a single indexed
+    query, so the dashboard can poll this instead of refetching its lists.
+    """
+    state = get_sync_state(db, user["id"])
+    if state is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shop not found"
+        )
+    
+    try:
+        changes = get_sync_changes(db, state, since)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync cursor"
+        )
+    if changes is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    return FastJSONResponse(changes)
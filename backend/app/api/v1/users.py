@@ -1,7 +1,10 @@
-from typing import Dict
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Dict, Literal, Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
+from app.services.export import parse_export_cursor, stream_export
 from app.services.user import delete_user_account
 from app.core.supabase_auth import get_current_user
 from app.db import get_db
@@ -14,13 +17,50 @@ async def delete_my_account(
     user: Dict[str, str] = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Delete current user account and all associated data"""
+    """
+    Delete current user account and all associated data.
+    
+    The sign-in account is removed from Supabase shortly afterwards by the
+    background job runner, so this returns without waiting on Supabase.
+    """
     try:
-        await delete_user_account(db, user["id"])
+        delete_user_account(db, user["id"])
         return {"detail": "Account deleted successfully"}
     except Exception as e:
         print(f"Account deletion error: {str(e)}")  # Add logging
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete account: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/me/export")
+def export_my_data(
+    format: Literal["ndjson", "zip"] = Query("ndjson"),
+    after: Optional[str] = Query(None, description="Cursor of the last line received, to resume an NDJSON export"),
+    user: Dict[str, str] = Depends(get_current_user)
+):
+    """
+    Export everything held about the current user's shop as a stream.
+
+    NDJSON lines carry a cursor; an interrupted download resumes by passing
+    the last complete line's cursor as `after`. Zip exports (one NDJSON file
+    per section) always start from the beginning.
+    """
+    if after is not None:
+        if format != "ndjson":
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only NDJSON exports can be resumed")
+        try:
+            parse_export_cursor(after)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid export cursor")
+
+    media_type = "application/zip" if format == "zip" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_export(UUID(user["id"]), format, after),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="detailchatbot-export.{format}"',
+            "Cache-Control": "no-store",
+        }
+    )
@@ -0,0 +1,234 @@
+"""
+Maintenance commands, run from the backend directory:
+
+    python -m app.cli backfill-contexts [--shop SHOP_ID ...]
+    python -m app.cli check-contexts [--fix]
+    python -m app.cli rollup-analytics
+    python -m app.cli reindex-knowledge [--shop SHOP_ID ...]
+    python -m app.cli benchmark-export [--services N] [--faqs N] [--transcripts N]
+    python -m app.cli benchmark-responses [--rows N] [--iterations N]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import List
+from uuid import UUID
+
+import brotli
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.responses import FastJSONResponse
+from app.db import SessionLocal
+from app.models.faq import FAQ
+from app.models.service import Service
+from app.models.shop import Shop
+from app.models.transcript import ChatTranscript
+from app.schemas.service import ServiceResponse
+from app.services.analytics import run_rollups
+from app.services.compiled_context import backfill_compiled_contexts, find_inconsistent_contexts
+from app.services.export import iter_ndjson_export, iter_zip_export
+from app.services.knowledge import find_shops_needing_reindex, reindex_shop
+from app.services.transcripts import ensure_transcript_partitions
+
+
+def backfill_contexts(args) -> int:
+    db = SessionLocal()
+    try:
+        count = backfill_compiled_contexts(db, args.shop or None)
+    finally:
+        db.close()
+    print(f"Compiled context for {count} shop(s)")
+    return 0
+
+
+def check_contexts(args) -> int:
+    db = SessionLocal()
+    try:
+        problems = find_inconsistent_contexts(db)
+        for problem in problems:
+            print(f"{problem['shop_id']}: {problem['status']}")
+        if problems and args.fix:
+            backfill_compiled_contexts(db, [problem["shop_id"] for problem in problems])
+            print(f"Recompiled {len(problems)} shop(s)")
+            return 0
+    finally:
+        db.close()
+    if not problems:
+        print("All compiled contexts are up to date")
+    return 1 if problems else 0
+
+
+def reindex_knowledge(args) -> int:
+    """Re-embed knowledge chunks with the current embedder and recompile the affected contexts"""
+    db = SessionLocal()
+    try:
+        shop_ids = args.shop or find_shops_needing_reindex(db)
+        for shop_id in shop_ids:
+            reindex_shop(db, shop_id)
+        backfill_compiled_contexts(db, shop_ids)
+    finally:
+        db.close()
+    print(f"Reindexed knowledge for {len(shop_ids)} shop(s)")
+    return 0
+
+
+def rollup_analytics(args) -> int:
+    db = SessionLocal()
+    try:
+        count = run_rollups(db)
+    finally:
+        db.close()
+    print(f"Folded {count} transcript row(s) into analytics rollups")
+    return 0
+
+
+def _insert_batches(db, table, rows, batch_size=5000) -> None:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            db.execute(insert(table), batch)
+            batch = []
+    if batch:
+        db.execute(insert(table), batch)
+
+
+def benchmark_export(args) -> int:
+    """
+    Seed a synthetic tenant inside a transaction, export it in each format
+    and roll back, so nothing is left behind. Peak memory is measured with
+    tracemalloc and should not grow with the tenant size.
+    """
+    ensure_transcript_partitions()
+    db = SessionLocal()
+    try:
+        owner_id = uuid.uuid4()
+        shop_id = uuid.uuid4()
+        db.execute(insert(Shop.__table__), [{"id": shop_id, "owner_id": owner_id, "business_name": "Benchmark Detailing"}])
+        _insert_batches(db, Service.__table__, (
+            {"shop_id": shop_id, "name": f"Service {i}", "description": "Full interior and exterior detail " * 4,
+             "price": 99.0 + i % 50, "duration_minutes": 60}
+            for i in range(args.services)
+        ))
+        _insert_batches(db, FAQ.__table__, (
+            {"shop_id": shop_id, "question": f"Question {i}?", "answer": "An answer of typical length. " * 8}
+            for i in range(args.faqs)
+        ))
+        now = datetime.now(timezone.utc)
+        _insert_batches(db, ChatTranscript.__table__, (
+            {"shop_id": shop_id, "created_at": now - timedelta(seconds=i), "session_id": f"s{i // 6}",
+             "turn": i % 6 + 1, "channel": "http", "question": "Do you do ceramic coating?",
+             "reply": "Yes, we offer ceramic coating packages starting at $499. " * 3,
+             "source": "model", "route": "default", "model": "benchmark", "prompt_tokens": 900,
+             "completion_tokens": 80, "latency_ms": 1200}
+            for i in range(args.transcripts)
+        ))
+        db.flush()
+        rows = 1 + args.services + args.faqs + args.transcripts
+        print(f"Seeded {rows} row(s)")
+
+        for name, export in (("ndjson", iter_ndjson_export), ("zip", iter_zip_export)):
+            tracemalloc.start()
+            started = time.perf_counter()
+            size = sum(len(chunk) for chunk in export(db, owner_id))
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(
+                f"{name}: {size / 1e6:.1f} MB in {elapsed:.2f}s "
+                f"({rows / elapsed:,.0f} rows/s), peak Python memory {peak / 1e6:.1f} MB"
+            )
+    finally:
+        db.rollback()
+        db.close()
+    return 0
+
+
+def benchmark_responses(args) -> int:
+    """
+    Compare the old list response path (ORM objects validated into
+    response_model, jsonable_encoder, json.dumps) with plain rows through
+    FastJSONResponse, and the bytes each compression sends. No database needed.
+    """
+    now = datetime.now(timezone.utc)
+    rows = [
+        {"id": uuid.uuid4(), "shop_id": uuid.uuid4(), "name": f"Service {i}",
+         "description": "Hand wash, clay bar, one-step polish and ceramic sealant. " * 3,
+         "price": 149.0 + i, "duration_minutes": 120, "created_at": now, "updated_at": now}
+        for i in range(args.rows)
+    ]
+    objects = [SimpleNamespace(**row) for row in rows]
+    adapter = TypeAdapter(List[ServiceResponse])
+
+    def pydantic_path() -> bytes:
+        validated = adapter.validate_python(objects, from_attributes=True)
+        return JSONResponse(jsonable_encoder(adapter.dump_python(validated, mode="json"))).body
+
+    def direct_path() -> bytes:
+        return FastJSONResponse(rows).body
+
+    for name, render in (("response_model + json", pydantic_path), ("rows + orjson", direct_path)):
+        started = time.process_time()
+        for _ in range(args.iterations):
+            body = render()
+        cpu_ms = (time.process_time() - started) / args.iterations * 1000
+        print(f"{name}: {cpu_ms:.2f} ms CPU per response, {len(body):,} bytes")
+
+    body = direct_path()
+    gzip = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 31)
+    for name, compress in (
+        ("gzip", lambda: gzip.compress(body) + gzip.flush()),
+        ("br", lambda: brotli.compress(body, quality=settings.compression_brotli_quality)),
+    ):
+        started = time.process_time()
+        compressed = compress()
+        cpu_ms = (time.process_time() - started) * 1000
+        print(f"{name}: {len(compressed):,} bytes on the wire ({len(compressed) / len(body):.0%}), {cpu_ms:.2f} ms CPU")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser("backfill-contexts", help="Compile and store chatbot contexts")
+    backfill.add_argument("--shop", type=UUID, action="append", help="Only this shop (repeatable)")
+    backfill.set_defaults(handler=backfill_contexts)
+
+    check = commands.add_parser("check-contexts", help="Compare stored contexts with a fresh compile")
+    check.add_argument("--fix", action="store_true", help="Recompile missing, stale and orphaned rows")
+    check.set_defaults(handler=check_contexts)
+
+    reindex = commands.add_parser("reindex-knowledge", help="Re-embed knowledge chunks after switching embedders")
+    reindex.add_argument("--shop", type=UUID, action="append", help="Only this shop (repeatable; default: stale shops)")
+    reindex.set_defaults(handler=reindex_knowledge)
+
+    rollup = commands.add_parser("rollup-analytics", help="Fold new chat transcripts into analytics rollups now")
+    rollup.set_defaults(handler=rollup_analytics)
+
+    benchmark = commands.add_parser("benchmark-export", help="Time a data export of a synthetic tenant (rolled back)")
+    benchmark.add_argument("--services", type=int, default=2000)
+    benchmark.add_argument("--faqs", type=int, default=2000)
+    benchmark.add_argument("--transcripts", type=int, default=200000)
+    benchmark.set_defaults(handler=benchmark_export)
+
+    responses = commands.add_parser("benchmark-responses", help="Compare list response encoding and compression")
+    responses.add_argument("--rows", type=int, default=200)
+    responses.add_argument("--iterations", type=int, default=200)
+    responses.set_defaults(handler=benchmark_responses)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+import hmac
+from fastapi import Header, HTTPException, status
+
+from .config import settings
+
+
+async def require_admin(x_admin_token: str = Header(default="")) -> None:
+    """
+    FastAPI dependency guarding operator-only endpoints.
+    
+    Raises:
+        HTTPException 403: If no admin token is configured or the header does not match
+    """
+    if not settings.admin_api_token or not hmac.compare_digest(x_admin_token, settings.admin_api_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
\ No newline at end of file
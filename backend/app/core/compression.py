@@ -0,0 +1,145 @@
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import brotli
+
+from app.core.config import settings
+
+# Already compressed, or streamed in small pieces that must reach the client immediately
+_SKIP_CONTENT_TYPES = ("text/event-stream", "application/zip", "application/gzip", "image/", "video/", "audio/")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported encoding the client accepts ("br" before "gzip"), honouring q=0"""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    def allowed(name: str) -> bool:
+        return accepted.get(name, accepted.get("*", 0.0)) > 0
+
+    if settings.compression_brotli and allowed("br"):
+        return "br"
+    if allowed("gzip"):
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.compression_brotli_quality)
+        else:
+            # wbits 31 writes a gzip header and trailer
+            self._zlib = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing response bodies with brotli or gzip,
+    whichever the client's Accept-Encoding prefers among those enabled.
+
+    Bodies under compression_minimum_size are sent as-is, since compressing
+    them costs more CPU than the bytes saved. Streaming responses are
+    compressed chunk by chunk; server-sent events and already compressed
+    content types pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.compression_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+                if _header(headers, b"content-encoding") is not None or content_type.startswith(_SKIP_CONTENT_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held back until the first body chunk shows whether it is worth compressing
+                    start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < settings.compression_minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers = [
+                    (key, value) for key, value in start_message.get("headers", [])
+                    if key.lower() != b"content-length"
+                ]
+                headers.append((b"content-encoding", encoding.encode()))
+                vary = _header(headers, b"vary")
+                if vary is None:
+                    headers.append((b"vary", b"Accept-Encoding"))
+                elif b"accept-encoding" not in vary.lower():
+                    headers = [(key, value) for key, value in headers if key.lower() != b"vary"]
+                    headers.append((b"vary", vary + b", Accept-Encoding"))
+                compressed = compressor.compress(body)
+                if not more_body:
+                    compressed += compressor.finish()
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                await send({**start_message, "headers": headers})
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+                return
+
+            compressed = compressor.compress(body)
+            if not more_body:
+                compressed += compressor.finish()
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,3 +1,4 @@
+from typing import Dict, List
 from pydantic_settings import BaseSettings
 
 
@@ -7,11 +8,175 @@ class Settings(BaseSettings):
     supabase_anon_key: str
     supabase_service_role_key: str
     database_url: str
+    # Optional comma-separated read replicas for read-only endpoints
+    database_replica_urls: str = ""
+    database_replica_eject_seconds: float = 30.0
+    database_read_your_writes_seconds: float = 5.0
     openai_api_key: str
     backend_url: str
+    # Base URL of the public widget API when it runs as its own service (defaults to backend_url)
+    widget_api_url: str = ""
+
+    # Dashboard origins (credentialed CORS); widget endpoints use each shop's allowed origins
+    # Comma-separated, as documented in DEPLOYMENT.md
+    cors_origins: str = (
+        "http://localhost:3000,http://127.0.0.1:3000,http://localhost:63343,"
+        "http://localhost:8080,http://localhost:5173,https://detailchatbot.ai,"
+        "https://www.detailchatbot.ai,https://detailchatbot-ai.vercel.app"
+    )
+    cors_origin_regex: str = r"https://.*\.railway\.app"
+    cors_max_age: int = 86400
+    origin_registry_ttl: float = 30.0
+
+    # Tracing: exporter is one of "none", "file", "console" or "otlp"
+    tracing_exporter: str = "none"
+    tracing_sample_ratio: float = 1.0
+    tracing_file_path: str = "traces.jsonl"
+    tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    tracing_service_name: str = "chatbot-ai-api"
+
+    # Operator endpoints and the X-Debug-Profile header are disabled while this is empty
+    admin_api_token: str = ""
+
+    # Response encoding: "orjson" or "json" (the standard library encoder)
+    json_response_class: str = "orjson"
+    # Brotli or gzip for bodies of at least compression_minimum_size bytes, as the client accepts
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024
+    compression_brotli: bool = True
+    compression_brotli_quality: int = 4
+    compression_gzip_level: int = 6
+
+    # Delta sync: rows changed this long before a cursor are sent again, to cover
+    # transactions that commit after a poll; older cursors get a full resync
+    sync_overlap_seconds: float = 60.0
+    sync_tombstone_retention_days: int = 30
+
+    # Per-request sampling profiler
+    profiler_sample_rate: float = 0.0
+    profiler_interval: float = 0.001
+    profiler_output_dir: str = "/tmp/chatbot-profiles"
+    profiler_max_profiles: int = 200
+
+    # OpenAI resilience: deadlines in seconds, hedging after the recent p95 latency
+    llm_attempt_timeout: float = 20.0
+    llm_total_timeout: float = 45.0
+    llm_max_retries: int = 2
+    llm_backoff_base: float = 0.5
+    llm_backoff_max: float = 4.0
+    llm_hedge_enabled: bool = False
+    llm_hedge_percentile: float = 0.95
+    llm_hedge_min_samples: int = 20
+    llm_breaker_failure_threshold: int = 5
+    llm_breaker_recovery_timeout: float = 30.0
+    # Concurrent OpenAI calls per worker; callers queue for a permit beyond this
+    llm_max_concurrency: int = 32
+
+    # Model routing: plan defaults, plus a fast tier for short/simple turns
+    llm_default_model: str = "gpt-4"
+    llm_plan_models: Dict[str, str] = {}
+    llm_temperature: float = 0.7
+    llm_max_tokens: int = 500
+    llm_min_max_tokens: int = 250
+    llm_fast_routing_enabled: bool = True
+    llm_fast_model: str = "gpt-4o-mini"
+    llm_fast_max_words: int = 12
+    llm_fast_max_tokens: int = 200
+
+    # In-memory FAQ index (shortcut answers and suggestions)
+    faq_index_ttl: float = 60.0
+    faq_index_max_shops: int = 5000
+
+    # Per-worker subscription cache; LISTEN/NOTIFY drops entries as soon as they change
+    subscription_cache_ttl: float = 30.0
+    subscription_cache_max_entries: int = 10000
+    subscription_notify_enabled: bool = True
+
+    # Widget chat transcripts, written in batches by a background thread per worker
+    transcripts_enabled: bool = True
+    transcript_queue_size: int = 10000
+    transcript_batch_size: int = 500
+    transcript_flush_interval: float = 1.0
+    transcript_shutdown_timeout: float = 10.0
+
+    # Analytics rollups (seconds); the lag keeps rollups behind rows still queued for writing
+    analytics_rollup_enabled: bool = True
+    analytics_rollup_interval: float = 60.0
+    analytics_rollup_lag: float = 120.0
+    analytics_rollup_max_window: float = 3600.0
+    analytics_questions_per_day: int = 200
+
+    # Widget funnel events, counted in memory and flushed in bulk (seconds)
+    widget_events_enabled: bool = True
+    widget_events_flush_interval: float = 10.0
+    widget_events_max_keys: int = 50000
+
+    # LLM token quotas per plan and calendar month (prompt + completion); unlisted plans are unlimited.
+    # Past the soft limit replies use llm_fast_model, past the hard limit the canned fallback reply.
+    usage_soft_limits: Dict[str, int] = {"free": 500000}
+    usage_hard_limits: Dict[str, int] = {"free": 1000000}
+    usage_flush_interval: float = 5.0
+    usage_totals_ttl: float = 30.0
+
+    # Background jobs (jobs table), run in-process by every API worker (seconds)
+    jobs_enabled: bool = True
+    job_concurrency: int = 4
+    job_poll_interval: float = 1.0
+    job_timeout: float = 60.0
+    job_max_attempts: int = 8
+    job_backoff_base: float = 5.0
+    job_backoff_max: float = 3600.0
+    job_retention_days: int = 7
+    job_maintenance_interval: float = 30.0
+    job_shutdown_timeout: float = 10.0
+    # About a day of retries before the job is dead-lettered
+    supabase_delete_max_attempts: int = 30
+
+    # Widget WebSocket transport (seconds / characters)
+    ws_heartbeat_interval: float = 20.0
+    ws_idle_timeout: float = 300.0
+    ws_resume_grace: float = 60.0
+    ws_send_timeout: float = 10.0
+    ws_max_message_chars: int = 2000
+    ws_max_turns: int = 100
+    ws_max_history_messages: int = 20
+    # Per history entry in the hello frame; assistant replies can be longer than user messages
+    ws_max_history_message_chars: int = 4000
+    ws_max_sessions: int = 5000
+
+    # HTTP chat turns sent with an Idempotency-Key (seconds): successful replies are
+    # replayed for idempotency_ttl, and a turn every requester has abandoned keeps
+    # running for idempotency_abandon_grace so a retry can attach to it
+    idempotency_ttl: float = 300.0
+    idempotency_abandon_grace: float = 15.0
+    idempotency_max_entries: int = 10000
+    # Keys are shared through the idempotency_keys table: a claim not finished within
+    # idempotency_claim_timeout (longer than any turn) is assumed lost and run again,
+    # and a retry on another worker checks for the reply every idempotency_poll_interval
+    idempotency_claim_timeout: float = 120.0
+    idempotency_poll_interval: float = 0.25
+
+    # Knowledge retrieval: embedder is "hashing" (offline, deterministic) or "openai"
+    embedder: str = "hashing"
+    embedding_dim: int = 384
+    embedding_openai_model: str = "text-embedding-3-small"
+    knowledge_chunk_chars: int = 800
+    knowledge_chunk_overlap: int = 100
+    knowledge_top_k: int = 4
+    knowledge_cache_ttl: float = 300.0
+    knowledge_cache_max_shops: int = 2000
+    knowledge_max_upload_bytes: int = 1_000_000
 
     class Config:
         env_file = ".env"
 
+    @property
+    def database_replica_url_list(self) -> List[str]:
+        return [url.strip() for url in self.database_replica_urls.split(",") if url.strip()]
+
+    @property
+    def cors_origin_list(self) -> List[str]:
+        return [origin.strip().rstrip("/") for origin in self.cors_origins.split(",") if origin.strip()]
+
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,46 @@
+import asyncio
+from typing import Awaitable, TypeVar
+
+from starlette.requests import Request
+
+T = TypeVar("T")
+
+# Non-standard status (nginx convention) logged when the client hung up first
+CLIENT_CLOSED_REQUEST = 499
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client closed the connection before the work finished"""
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    # The body has already been read by the endpoint, so the next ASGI message
+    # on this connection is http.disconnect once the client goes away
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """
+    Await work, cancelling it as soon as the client disconnects.
+
+    Cancellation propagates into the awaited coroutine, so in-flight upstream
+    HTTP calls are aborted and any semaphores they hold are released.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+
+    if not task.done():
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        raise ClientDisconnected()
+    return task.result()
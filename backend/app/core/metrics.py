@@ -0,0 +1,190 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+# Buckets tuned for a chat API: sub-millisecond DB hits up to multi-second LLM calls
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0,
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status code",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+PHASE_LATENCY = Histogram(
+    "chat_phase_duration_seconds",
+    "Latency of individual request phases (auth, db, context, llm)",
+    ["phase"],
+    buckets=LATENCY_BUCKETS,
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being processed",
+    multiprocess_mode="livesum",
+)
+
+CHAT_SOCKETS_OPEN = Gauge(
+    "chat_websockets_open",
+    "Widget chat WebSocket connections currently open",
+    multiprocess_mode="livesum",
+)
+
+LLM_IN_FLIGHT = Gauge(
+    "llm_requests_in_flight",
+    "OpenAI calls currently awaiting a response",
+    multiprocess_mode="livesum",
+)
+
+LLM_CANCELLED = Counter(
+    "llm_requests_cancelled_total",
+    "OpenAI calls abandoned before completion, by reason",
+    ["reason"],
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Prompt and completion tokens consumed per shop",
+    ["shop_id", "kind"],
+)
+
+LLM_ROUTE_LATENCY = Histogram(
+    "llm_route_duration_seconds",
+    "OpenAI latency (including retries) by routing decision and model",
+    ["route", "model"],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_ROUTE_TOKENS = Counter(
+    "llm_route_tokens_total",
+    "Tokens consumed by routing decision and model, for cost comparison",
+    ["route", "model", "kind"],
+)
+
+FAQ_SHORTCUT = Counter(
+    "faq_shortcut_total",
+    "FAQ shortcut lookups on shops that enabled it, by result (hit/miss)",
+    ["result"],
+)
+
+FAQ_SHORTCUT_SECONDS_SAVED = Counter(
+    "faq_shortcut_seconds_saved_total",
+    "Estimated LLM latency avoided by answering from FAQs (recent p50 per hit)",
+)
+
+# Accumulated DB time for the current request, read by the middleware at the end
+_db_time: ContextVar[Optional[list]] = ContextVar("db_time", default=None)
+
+
+@contextmanager
+def observe_phase(phase: str):
+    """Time a block of code into the phase histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_LATENCY.labels(phase).observe(time.perf_counter() - start)
+
+
+def record_token_usage(shop_id, prompt_tokens: int, completion_tokens: int) -> None:
+    shop_label = str(shop_id)
+    if prompt_tokens:
+        LLM_TOKENS.labels(shop_label, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(shop_label, "completion").inc(completion_tokens)
+
+
+def record_route(route: str, model: str, seconds: float, prompt_tokens: int, completion_tokens: int) -> None:
+    LLM_ROUTE_LATENCY.labels(route, model).observe(seconds)
+    if prompt_tokens:
+        LLM_ROUTE_TOKENS.labels(route, model, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_ROUTE_TOKENS.labels(route, model, "completion").inc(completion_tokens)
+
+
+def instrument_engine(engine) -> None:
+    """Attach cursor hooks that add statement time to the per-request DB total"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        bucket = _db_time.get()
+        if bucket is not None:
+            bucket[0] += elapsed
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request latency and in-flight counts.
+
+    Routes are labelled by their template (e.g. /api/v1/chat/{shop_id}/public)
+    so that label cardinality stays bounded regardless of traffic.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+        db_bucket = [0.0]
+        token = _db_time.set(db_bucket)
+        REQUESTS_IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            _db_time.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], route_path, str(status_code)).observe(
+                time.perf_counter() - start
+            )
+            if db_bucket[0]:
+                PHASE_LATENCY.labels("db").observe(db_bucket[0])
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Render all metrics in Prometheus text format.
+
+    When PROMETHEUS_MULTIPROC_DIR is set (required for multiple uvicorn workers)
+    the values written by every worker process are merged before rendering.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
\ No newline at end of file
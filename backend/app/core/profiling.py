@@ -0,0 +1,131 @@
+import asyncio
+import hmac
+import os
+import random
+import re
+import uuid
+from typing import List, Optional
+
+from pyinstrument import Profiler
+
+from .config import settings
+
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _is_authorized_debug(token: Optional[str]) -> bool:
+    return bool(settings.admin_api_token) and token is not None and hmac.compare_digest(
+        token, settings.admin_api_token
+    )
+
+
+def _collapse(frame, prefix: str, lines: List[str]) -> None:
+    """Walk pyinstrument's call tree, emitting 'a;b;c <microseconds>' lines of self time"""
+    name = f"{frame.function or '<root>'} ({frame.file_path_short}:{frame.line_no})"
+    stack = f"{prefix};{name}" if prefix else name
+    self_time = frame.time - sum(child.time for child in frame.children)
+    if self_time > 0:
+        lines.append(f"{stack} {int(self_time * 1_000_000)}")
+    for child in frame.children:
+        _collapse(child, stack, lines)
+
+
+def _profile_path(request_id: str) -> str:
+    return os.path.join(settings.profiler_output_dir, f"{request_id}.collapsed")
+
+
+def _store_profile(request_id: str, session) -> None:
+    lines: List[str] = []
+    root = session.root_frame()
+    if root is not None:
+        _collapse(root, "", lines)
+
+    os.makedirs(settings.profiler_output_dir, exist_ok=True)
+    with open(_profile_path(request_id), "w", encoding="utf-8") as handle:
+        handle.write("\n".join(lines))
+
+    # Keep only the newest profiles so the directory stays bounded
+    profiles = sorted(
+        (entry for entry in os.scandir(settings.profiler_output_dir) if entry.name.endswith(".collapsed")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in profiles[settings.profiler_max_profiles:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def list_profiles() -> List[str]:
+    if not os.path.isdir(settings.profiler_output_dir):
+        return []
+    return sorted(
+        entry.name[: -len(".collapsed")]
+        for entry in os.scandir(settings.profiler_output_dir)
+        if entry.name.endswith(".collapsed")
+    )
+
+
+def load_profile(request_id: str) -> Optional[str]:
+    if not _REQUEST_ID_RE.match(request_id):
+        return None
+    try:
+        with open(_profile_path(request_id), encoding="utf-8") as handle:
+            return handle.read()
+    except FileNotFoundError:
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    Profile individual requests with a sampling profiler.
+
+    A request is profiled when it carries X-Debug-Profile with the admin token,
+    or when it is picked by profiler_sample_rate. Output is stored as collapsed
+    stacks (flamegraph.pl / speedscope input) under the request id, which is
+    returned in the X-Profile-Id response header. Untriggered requests only pay
+    for one header lookup and, if sampling is enabled, one random draw.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        debug_token = None
+        request_id = None
+        for key, value in scope["headers"]:
+            if key == b"x-debug-profile":
+                debug_token = value.decode("latin-1")
+            elif key == b"x-request-id":
+                request_id = value.decode("latin-1")
+
+        triggered = _is_authorized_debug(debug_token) or (
+            settings.profiler_sample_rate > 0 and random.random() < settings.profiler_sample_rate
+        )
+        if not triggered:
+            await self.app(scope, receive, send)
+            return
+
+        if not request_id or not _REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-profile-id", request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        profiler = Profiler(interval=settings.profiler_interval, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session = profiler.stop()
+            await asyncio.to_thread(_store_profile, request_id, session)
\ No newline at end of file
@@ -0,0 +1,144 @@
+import asyncio
+import re
+from typing import Awaitable, Callable, Type, TypeVar
+from uuid import UUID
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+
+from app.core.config import settings
+from app.services.allowed_origins import (
+    claim_registry_refresh,
+    is_origin_allowed,
+    is_registry_loaded,
+    is_registry_stale,
+    refresh_origin_registry,
+)
+
+M = TypeVar("M", bound=BaseModel)
+
+# Shop-scoped endpoints called by widget.js from customer sites
+PUBLIC_PATH_RE = re.compile(r"^/api/v1/(?:chat|widget)/(?P<shop_id>[0-9a-fA-F-]{36})/[a-z]+$")
+
+_FORBIDDEN_BODY = b'{"detail":"Origin not allowed for this shop"}'
+
+
+async def ensure_origin_registry() -> None:
+    """Load the registry on first use and reload it in the background once stale"""
+    if not is_registry_loaded():
+        await asyncio.to_thread(refresh_origin_registry)
+    elif is_registry_stale() and claim_registry_refresh():
+        # Keep serving the current snapshot while it reloads
+        asyncio.get_running_loop().run_in_executor(None, refresh_origin_registry)
+
+
+class PublicCORSMiddleware:
+    """
+    CORS for the widget's public endpoints, checked against the shop's
+    allowed-origin registry before the request reaches any route.
+
+    Allowed origins are echoed without credentials and preflights are cached
+    for cors_max_age. The Origin header is hidden from the inner dashboard
+    CORSMiddleware so it does not add its credentialed headers as well.
+    Requests without an Origin header (not from a browser page) pass through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        match = PUBLIC_PATH_RE.match(scope["path"])
+        if not match:
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        request_headers = None
+        other_headers = []
+        for key, value in scope["headers"]:
+            if key == b"origin":
+                origin = value.decode("latin-1")
+            else:
+                if key == b"access-control-request-headers":
+                    request_headers = value
+                other_headers.append((key, value))
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            shop_id = UUID(match["shop_id"])
+        except ValueError:
+            await self.app(scope, receive, send)
+            return
+
+        await ensure_origin_registry()
+        allowed = is_origin_allowed(shop_id, origin)
+
+        if scope["type"] == "websocket":
+            if not allowed:
+                # Closing before accept makes the server answer the handshake with 403
+                await send({"type": "websocket.close", "code": 1008})
+                return
+            await self.app(scope, receive, send)
+            return
+
+        cors_headers = [
+            (b"access-control-allow-origin", origin.encode("latin-1")),
+            (b"vary", b"Origin"),
+        ]
+
+        if scope["method"] == "OPTIONS" and any(key == b"access-control-request-method" for key, _ in other_headers):
+            if allowed:
+                headers = cors_headers + [
+                    (b"access-control-allow-methods", b"GET, POST"),
+                    (b"access-control-max-age", str(settings.cors_max_age).encode("latin-1")),
+                ]
+                if request_headers:
+                    headers.append((b"access-control-allow-headers", request_headers))
+            else:
+                headers = [(b"vary", b"Origin")]
+            headers.append((b"content-length", b"0"))
+            await send({"type": "http.response.start", "status": 204 if allowed else 403, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if not allowed:
+            await send({
+                "type": "http.response.start",
+                "status": 403,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(_FORBIDDEN_BODY)).encode("latin-1")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": _FORBIDDEN_BODY})
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + cors_headers
+            await send(message)
+
+        await self.app(dict(scope, headers=other_headers), receive, send_wrapper)
+
+
+def simple_json_body(model: Type[M]) -> Callable[[Request], Awaitable[M]]:
+    """
+    Dependency reading a JSON body regardless of its Content-Type.
+
+    Lets widget.js post JSON as text/plain, a CORS-simple content type, so
+    cross-origin calls do not need a preflight.
+    """
+
+    async def dependency(request: Request) -> M:
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+
+    return dependency
@@ -0,0 +1,244 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from prometheus_client import Counter, Gauge
+
+T = TypeVar("T")
+
+BREAKER_STATE = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["name"],
+    multiprocess_mode="max",
+)
+
+BREAKER_TRIPS = Counter(
+    "circuit_breaker_trips_total",
+    "Number of times a circuit breaker opened",
+    ["name"],
+)
+
+CALL_ATTEMPTS = Counter(
+    "resilient_call_attempts_total",
+    "Attempts made by the resilience layer, by outcome",
+    ["name", "outcome"],
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the breaker is open"""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when the overall deadline for a call is used up"""
+
+
+class LatencyTracker:
+    """Rolling window of recent successful call latencies"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(p * len(ordered)))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After failure_threshold consecutive failures the breaker opens and rejects
+    calls for recovery_timeout seconds, then lets a single probe through
+    (half-open). A successful probe closes it, a failed one re-opens it, and
+    a cancelled one frees the slot for the next call. A probe that has not
+    reported back within recovery_timeout is presumed lost and replaced.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.trip_count = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        BREAKER_STATE.labels(name).set(0)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        BREAKER_STATE.labels(self.name).set(self._STATE_VALUES[state])
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected outright (open and still cooling down)"""
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.recovery_timeout
+
+    def allow_request(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            now = time.monotonic()
+            if not self._probe_in_flight or now - self._probe_started_at >= self.recovery_timeout:
+                self._probe_in_flight = True
+                self._probe_started_at = now
+                return True
+        return False
+
+    def release_probe(self) -> None:
+        """The call ended without an outcome (e.g. it was cancelled); leave the state as it is"""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.opened_at = time.monotonic()
+            self.trip_count += 1
+            BREAKER_TRIPS.labels(self.name).inc()
+            self._set_state(self.OPEN)
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trip_count": self.trip_count,
+            "failure_threshold": self.failure_threshold,
+            "recovery_timeout": self.recovery_timeout,
+        }
+
+
+async def _cancel_all(tasks) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def call_with_resilience(
+    func: Callable[[], Awaitable[T]],
+    *,
+    name: str,
+    breaker: CircuitBreaker,
+    latency: LatencyTracker,
+    is_retryable: Callable[[BaseException], bool],
+    attempt_timeout: float,
+    deadline: float,
+    max_retries: int = 2,
+    backoff_base: float = 0.5,
+    backoff_max: float = 4.0,
+    hedge_delay: Optional[float] = None,
+) -> T:
+    """
+    Call func with per-attempt timeouts, an overall deadline, retries with
+    full-jitter exponential backoff and an optional hedged second request.
+
+    Only retryable failures count against the breaker; anything else is
+    raised immediately since repeating it would fail the same way.
+    """
+    expires_at = time.monotonic() + deadline
+    attempt = 0
+
+    while True:
+        if not breaker.allow_request():
+            CALL_ATTEMPTS.labels(name, "rejected").inc()
+            raise CircuitOpenError(f"{name} circuit is open")
+
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError(f"{name} deadline of {deadline}s exceeded")
+
+        start = time.monotonic()
+        try:
+            result = await _hedged_attempt(func, name, min(attempt_timeout, remaining), hedge_delay)
+        except Exception as exc:
+            if not is_retryable(exc):
+                CALL_ATTEMPTS.labels(name, "error").inc()
+                # The upstream answered, so even a non-retryable error proves it is reachable
+                breaker.record_success()
+                raise
+            CALL_ATTEMPTS.labels(name, "retryable_error").inc()
+            breaker.record_failure()
+            if attempt >= max_retries:
+                raise
+            attempt += 1
+            sleep_for = random.uniform(0, min(backoff_max, backoff_base * 2 ** attempt))
+            if time.monotonic() + sleep_for >= expires_at:
+                raise
+            await asyncio.sleep(sleep_for)
+            continue
+        except BaseException:
+            # Cancelled (client gone, hedge lost, ...): says nothing about the upstream
+            breaker.release_probe()
+            raise
+
+        CALL_ATTEMPTS.labels(name, "success").inc()
+        latency.record(time.monotonic() - start)
+        breaker.record_success()
+        return result
+
+
+async def _hedged_attempt(
+    func: Callable[[], Awaitable[T]],
+    name: str,
+    timeout: float,
+    hedge_delay: Optional[float],
+) -> T:
+    """Run one attempt, firing a duplicate request if the first is slower than hedge_delay"""
+    primary = asyncio.ensure_future(func())
+    tasks = [primary]
+    try:
+        if hedge_delay is None or hedge_delay >= timeout:
+            return await asyncio.wait_for(primary, timeout)
+
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+        if not done:
+            CALL_ATTEMPTS.labels(name, "hedge").inc()
+            tasks.append(asyncio.ensure_future(func()))
+
+        expires_at = time.monotonic() + timeout - hedge_delay
+        pending = set(tasks)
+        last_error: Optional[BaseException] = None
+        while pending:
+            remaining = expires_at - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+        if last_error is not None and not pending:
+            raise last_error
+        raise asyncio.TimeoutError()
+    finally:
+        await _cancel_all([task for task in tasks if not task.done()])
\ No newline at end of file
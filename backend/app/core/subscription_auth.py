@@ -2,8 +2,7 @@ from fastapi import Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import Dict
 
-from app.services.subscription import get_subscription_by_owner
-from app.models.subscription import Subscription
+from app.services.subscription_cache import SubscriptionState, get_subscription_state
 from .supabase_auth import get_current_user
 from ..db import get_db
 
@@ -11,17 +10,20 @@ from ..db import get_db
 async def require_active_subscription(
     user: Dict[str, str] = Depends(get_current_user),
     db: Session = Depends(get_db)
-) -> Subscription:
+) -> SubscriptionState:
     """
     FastAPI dependency to validate user has an active subscription.
     
+    Served from the per-worker subscription cache, so most calls do not
+    touch the database.
+    
     Returns:
-        Subscription object for the current user
+        Cached subscription state for the current user
         
     Raises:
         HTTPException 403: If no active subscription found
     """
-    subscription = get_subscription_by_owner(db, user["id"])
+    subscription = get_subscription_state(db, user["id"])
     
     if not subscription or not subscription.is_active:
         raise HTTPException(
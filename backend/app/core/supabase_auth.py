@@ -1,14 +1,17 @@
 import httpx
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Dict
 
 from .config import settings
+from .metrics import observe_phase
+from .tracing import tracer
 
 security = HTTPBearer()
 
 
 async def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> Dict[str, str]:
     """
@@ -22,37 +25,40 @@ async def get_current_user(
     """
     token = credentials.credentials
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{settings.supabase_project_url}/auth/v1/user",
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "apikey": settings.supabase_service_role_key
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid token"
+    with observe_phase("auth"), tracer.start_as_current_span("auth.get_current_user"):
+        async with httpx.AsyncClient() as client:
+            try:
+                response = await client.get(
+                    f"{settings.supabase_project_url}/auth/v1/user",
+                    headers={
+                        "Authorization": f"Bearer {token}",
+                        "apikey": settings.supabase_service_role_key
+                    }
                 )
             
-            user_data = response.json()
+                if response.status_code != 200:
+                    raise HTTPException(
+                        status_code=status.HTTP_401_UNAUTHORIZED,
+                        detail="Invalid token"
+                    )
             
-            if not user_data or not user_data.get("id"):
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="User not found"
-                )
+                user_data = response.json()
+            
+                if not user_data or not user_data.get("id"):
+                    raise HTTPException(
+                        status_code=status.HTTP_401_UNAUTHORIZED,
+                        detail="User not found"
+                    )
             
-            return {
-                "id": user_data["id"],
-                "email": user_data.get("email", "")
-            }
+                # Lets app.db keep this user's reads on the primary right after a write
+                request.state.user_id = user_data["id"]
+                return {
+                    "id": user_data["id"],
+                    "email": user_data.get("email", "")
+                }
             
-        except httpx.RequestError:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Authentication service unavailable"
-            )
\ No newline at end of file
+            except httpx.RequestError:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Authentication service unavailable"
+                )
\ No newline at end of file
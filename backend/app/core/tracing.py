@@ -0,0 +1,165 @@
+import threading
+import time
+from typing import Optional, Sequence
+from urllib.parse import parse_qs
+
+from opentelemetry import trace
+from opentelemetry.propagate import extract
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from sqlalchemy import event
+
+from .config import settings
+
+tracer = trace.get_tracer("chatbot-ai")
+
+
+class FileSpanExporter(SpanExporter):
+    """Append finished spans as JSON lines to a local file (works fully offline)"""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        try:
+            with self._lock, open(self._path, "a", encoding="utf-8") as handle:
+                handle.write(lines)
+        except OSError:
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def _build_exporter(name: str) -> Optional[SpanExporter]:
+    if name == "file":
+        return FileSpanExporter(settings.tracing_file_path)
+    if name == "console":
+        return ConsoleSpanExporter()
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)
+    return None
+
+
+def configure_tracing() -> None:
+    """
+    Install the global tracer provider according to settings.
+
+    Sampling is decided from the trace id alone (even for traces started by
+    widget.js), so a chat request and its client-side timing report always
+    share the same sampling decision.
+    """
+    exporter = _build_exporter(settings.tracing_exporter)
+    if exporter is None:
+        return
+
+    ratio = TraceIdRatioBased(settings.tracing_sample_ratio)
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.tracing_service_name}),
+        sampler=ParentBased(
+            root=ratio,
+            remote_parent_sampled=ratio,
+            remote_parent_not_sampled=ratio,
+        ),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+
+def instrument_engine_tracing(engine) -> None:
+    """Open a client span around every SQL statement executed on the engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = tracer.start_span(
+            "db.query",
+            kind=SpanKind.CLIENT,
+            attributes={"db.system": "postgresql", "db.statement": statement[:1000]},
+        )
+        conn.info.setdefault("trace_spans", []).append(span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["trace_spans"].pop().end()
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("trace_spans") if conn is not None else None
+        if spans:
+            span = spans.pop()
+            span.record_exception(exception_context.original_exception)
+            span.set_status(Status(StatusCode.ERROR))
+            span.end()
+
+
+def record_client_span(name: str, traceparent: str, duration_ms: float, attributes: dict) -> None:
+    """Record a span measured in the browser, parented to the trace from its traceparent"""
+    parent = extract({"traceparent": traceparent})
+    end_ns = time.time_ns()
+    span = tracer.start_span(
+        name,
+        context=parent,
+        kind=SpanKind.CLIENT,
+        start_time=end_ns - int(duration_ms * 1_000_000),
+        attributes=attributes,
+    )
+    span.end(end_time=end_ns)
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening a server span per request, continuing any incoming traceparent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in scope["headers"]
+            if key in (b"traceparent", b"tracestate")
+        }
+        if "traceparent" not in carrier and b"traceparent=" in scope["query_string"]:
+            # widget.js passes it in the URL so its requests stay CORS-simple
+            query = parse_qs(scope["query_string"].decode("latin-1"))
+            if query.get("traceparent"):
+                carrier["traceparent"] = query["traceparent"][0]
+        parent = extract(carrier) if carrier else None
+
+        with tracer.start_as_current_span(
+            f"{scope['method']} {scope['path']}",
+            context=parent,
+            kind=SpanKind.SERVER,
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+        ) as span:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.update_name(f"{scope['method']} {route}")
+                    span.set_attribute("http.route", route)
\ No newline at end of file
@@ -1,17 +1,163 @@
-from sqlalchemy import create_engine
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from prometheus_client import Counter
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from .core.config import settings
+from .core.metrics import instrument_engine
+from .core.tracing import instrument_engine_tracing
+
+DB_ROUTED = Counter(
+    "db_sessions_routed_total",
+    "Read-only sessions by the database they were routed to",
+    ["target"],
+)
+
+REPLICA_EJECTIONS = Counter(
+    "db_replica_ejections_total",
+    "Times a read replica was taken out of rotation after a connection error",
+)
+
+
+def _create_engine(url: str, **kwargs) -> Engine:
+    created = create_engine(url, **kwargs)
+    instrument_engine(created)
+    instrument_engine_tracing(created)
+    return created
+
+
+engine = _create_engine(settings.database_url)
+
+
+class ReplicaSet:
+    """
+    Round-robin over read replicas, skipping any that recently failed.
+
+    An ejected replica is retried once replica_eject_seconds have passed; if
+    every replica is ejected, reads fall back to the primary.
+    """
+
+    def __init__(self, engines: List[Engine]):
+        self.engines = engines
+        self._ejected_until: Dict[int, float] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        for replica in engines:
+            event.listen(replica, "handle_error", self._on_error)
+
+    def choose(self) -> Optional[Engine]:
+        if not self.engines:
+            return None
+        now = time.monotonic()
+        start = next(self._counter)
+        for offset in range(len(self.engines)):
+            candidate = self.engines[(start + offset) % len(self.engines)]
+            if self._ejected_until.get(id(candidate), 0) <= now:
+                return candidate
+        return None
+
+    def eject(self, replica: Engine) -> None:
+        with self._lock:
+            self._ejected_until[id(replica)] = time.monotonic() + settings.database_replica_eject_seconds
+        REPLICA_EJECTIONS.inc()
+
+    def _on_error(self, exception_context) -> None:
+        if exception_context.is_disconnect or exception_context.connection is None:
+            self.eject(exception_context.engine)
+
+
+# Pre-ping so a dead replica fails at checkout, where it can be ejected
+replicas = ReplicaSet([_create_engine(url, pool_pre_ping=True) for url in settings.database_replica_url_list])
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to a replica when opened for a read-only endpoint.
+
+    Flushes always go to the primary, and once a session has written it
+    stays on the primary so it reads its own writes. A session keeps the
+    replica it picked first so its reads see one consistent snapshot.
+    """
 
-engine = create_engine(settings.database_url)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if clause is not None and getattr(clause, "is_dml", False):
+            # Bulk insert/update/delete issued outside a flush
+            self.info["wrote"] = True
+            return engine
+        if not self.info.get("use_replica") or self._flushing or self.info.get("wrote"):
+            return engine
+        replica = self.info.get("replica")
+        if replica is None:
+            # Decided on first use, once the endpoint's auth dependency has identified the user
+            replica = engine if _wrote_recently(_client_key(self)) else replicas.choose() or engine
+            self.info["replica"] = replica
+            DB_ROUTED.labels("primary" if replica is engine else "replica").inc()
+        return replica
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Authenticated user id -> monotonic time until which their reads go to the primary
+_recent_writers: Dict[str, float] = {}
+
+
+def _client_key(session: Session) -> Optional[str]:
+    """The user id get_current_user stored on the session's request, if any"""
+    request = session.info.get("request")
+    return getattr(request.state, "user_id", None) if request is not None else None
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _mark_session_wrote(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _remember_writer(session):
+    client_key = _client_key(session)
+    if client_key and session.info.get("wrote"):
+        now = time.monotonic()
+        if len(_recent_writers) > 10000:
+            for key in [key for key, until in _recent_writers.items() if until <= now]:
+                _recent_writers.pop(key, None)
+        _recent_writers[client_key] = now + settings.database_read_your_writes_seconds
+
+
+def _wrote_recently(client_key: Optional[str]) -> bool:
+    return client_key is not None and _recent_writers.get(client_key, 0) > time.monotonic()
+
+
+def read_session() -> Session:
+    """Session for background reads that tolerate replica lag"""
+    return SessionLocal(info={"use_replica": True})
+
+
+def get_db(request: Request):
+    db = SessionLocal(info={"request": request})
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db(request: Request):
+    """
+    Session for read-only endpoints, served by a replica when one is configured.
 
-def get_db():
-    db = SessionLocal()
+    A user who wrote through get_db within the last
+    database_read_your_writes_seconds keeps reading from the primary, so the
+    dashboard shows a change right after saving it.
+    """
+    db = SessionLocal(info={"use_replica": True, "request": request})
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
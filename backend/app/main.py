@@ -1,4 +1,7 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1.shops import router as shops_router
@@ -9,28 +12,68 @@ from app.api.v1.chat_config import router as chat_config_router
 from app.api.v1.widget import router as widget_router
 from app.api.v1.chat import router as chat_router
 from app.api.v1.users import router as users_router
+from app.api.v1.admin import router as admin_router
+from app.api.v1.analytics import router as analytics_router
+from app.api.v1.sync import router as sync_router
+from app.api.public.app import create_public_app
+from app.core.compression import CompressionMiddleware
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.public_cors import PublicCORSMiddleware
+from app.core.responses import default_response_class
+from app.core.tracing import TracingMiddleware, configure_tracing
+from app.core.profiling import ProfilingMiddleware
+from app.services.subscription_cache import subscription_listener
+from app.services.transcripts import transcript_writer
+from app.services.analytics import rollup_worker
+from app.services.widget_events import widget_events
+from app.services.usage import usage_meter
+from app.services.jobs import job_runner
+
+configure_tracing()
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    subscription_listener.start()
+    transcript_writer.start()
+    rollup_worker.start()
+    widget_events.start()
+    usage_meter.start()
+    await job_runner.start()
+    yield
+    # The stops join their threads and flush to the database, so they run off the event loop
+    await asyncio.to_thread(subscription_listener.stop)
+    await asyncio.to_thread(transcript_writer.stop)
+    await asyncio.to_thread(rollup_worker.stop)
+    await asyncio.to_thread(widget_events.stop)
+    await asyncio.to_thread(usage_meter.stop)
+    await job_runner.stop()
+
 
-app = FastAPI(title="Chatbot.ai API", version="1.0.0")
+app = FastAPI(
+    title="Chatbot.ai API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=default_response_class()
+)
 
+# Innermost, so CORS and metrics see the final headers and timing includes compression
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",
-        "http://127.0.0.1:3000",
-        "http://localhost:63343",  # IDE server
-        "http://localhost:8080",   # Common dev server
-        "http://localhost:5173",   # Vite dev server
-        "file://",                 # Local file access
-        "https://detailchatbot.ai",
-        "https://www.detailchatbot.ai",
-        "https://detailchatbot-ai.vercel.app",  # Vercel deployment
-        "https://*.railway.app",   # Railway domains
-        "*"  # Allow all origins for widget embedding
-    ],
+    allow_origins=settings.cors_origin_list,
+    allow_origin_regex=settings.cors_origin_regex or None,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=settings.cors_max_age,
 )
+# Widget endpoints are checked against each shop's allowed origins instead
+app.add_middleware(PublicCORSMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
 app.include_router(shops_router, prefix="/api/v1")
 app.include_router(subscriptions_router, prefix="/api/v1/subscriptions", tags=["subscriptions"])
@@ -40,8 +83,23 @@ app.include_router(chat_config_router, prefix="/api/v1")
 app.include_router(widget_router, prefix="/api/v1")
 app.include_router(chat_router, prefix="/api/v1")
 app.include_router(users_router, prefix="/api/v1")
+app.include_router(admin_router, prefix="/api/v1")
+app.include_router(analytics_router, prefix="/api/v1")
+app.include_router(sync_router, prefix="/api/v1")
 
 
 @app.get("/health")
 async def health():
-    return {"status": "ok", "version": "1.0.1"}
\ No newline at end of file
+    return {"status": "ok", "version": "1.0.1"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint, aggregated across workers when multiprocess mode is enabled"""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+
+# Widget traffic (anonymous chat, widget.js, suggestions); mounted last so the
+# dashboard routes above take precedence. Run app.public_app to scale it separately.
+app.mount("/", create_public_app(standalone=False))
\ No newline at end of file
@@ -0,0 +1,71 @@
+import uuid
+from sqlalchemy import Column, Text, DateTime, ForeignKey, UniqueConstraint, String, Integer
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+
+from ..db import Base
+
+
+class ChatRollup(Base):
+    """Chat volume and latency for one shop and one hour or day (UTC), built from chat_transcripts"""
+    __tablename__ = "chat_rollups"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id", ondelete="CASCADE"), nullable=False)
+    # "hour" or "day"
+    granularity = Column(String(8), nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    turns = Column(Integer, nullable=False, default=0)
+    conversations = Column(Integer, nullable=False, default=0)
+    faq_shortcuts = Column(Integer, nullable=False, default=0)
+    fallbacks = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    # services.analytics.LatencySketch bucket counts; merged by adding
+    latency_sketch = Column(JSONB, nullable=False, default=dict)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('shop_id', 'granularity', 'bucket_start', name='unique_chat_rollup_bucket'),
+    )
+
+
+class QuestionRollup(Base):
+    """How often a normalized question was asked in a shop's widget on one day (UTC)"""
+    __tablename__ = "question_rollups"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id", ondelete="CASCADE"), nullable=False)
+    day = Column(DateTime(timezone=True), nullable=False)
+    question_key = Column(String(255), nullable=False)
+    # First wording seen for the key, shown to the owner
+    sample_question = Column(Text, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('shop_id', 'day', 'question_key', name='unique_question_rollup'),
+    )
+
+
+class RollupCursor(Base):
+    """How far a rollup job has consumed its source table"""
+    __tablename__ = "rollup_cursors"
+
+    name = Column(String(64), primary_key=True)
+    processed_until = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class WidgetEventCount(Base):
+    """Widget funnel events (impression, open, close, message_sent) per shop and hour (UTC)"""
+    __tablename__ = "widget_event_counts"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id", ondelete="CASCADE"), nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    event_type = Column(String(32), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('shop_id', 'bucket_start', 'event_type', name='unique_widget_event_bucket'),
+    )
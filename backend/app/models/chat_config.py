@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, Text, DateTime, ForeignKey, UniqueConstraint, String, Boolean, Enum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Text, DateTime, ForeignKey, UniqueConstraint, String, Boolean, Enum, Float, Integer
+from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.sql import func
 import enum
 
@@ -22,9 +22,12 @@ class ChatConfig(Base):
     __tablename__ = "chat_configs"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id"), nullable=False, unique=True)
+    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id", ondelete="CASCADE"), nullable=False, unique=True)
     system_prompt = Column(Text, nullable=False)
     user_context = Column(Text, nullable=True)
+    model_override = Column(String(100), nullable=True)
+    faq_shortcut_enabled = Column(Boolean, nullable=False, default=False, server_default="false")
+    faq_shortcut_threshold = Column(Float, nullable=False, default=0.85, server_default="0.85")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -37,16 +40,31 @@ class ChatWidgetConfig(Base):
     __tablename__ = "chat_widget_configs"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id"), nullable=False, unique=True)
+    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id", ondelete="CASCADE"), nullable=False, unique=True)
     position = Column(String(20), nullable=False, default="bottom-right")
     theme = Column(String(10), nullable=False, default="light")
     primary_color = Column(String(7), nullable=False, default="#3B82F6")
     greeting = Column(String(500), nullable=False, default="Hi! How can we help you with your services?")
     placeholder = Column(String(500), nullable=False, default="Ask about pricing, availability, or how we work...")
     show_branding = Column(Boolean, nullable=False, default=True)
+    # Sites allowed to call the public chat API for this shop; empty means any site
+    allowed_origins = Column(ARRAY(String(255)), nullable=False, default=list, server_default="{}")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     __table_args__ = (
         UniqueConstraint('shop_id', name='unique_shop_widget_config'),
-    )
\ No newline at end of file
+    )
+
+
+class CompiledContext(Base):
+    """Materialized system prompt for a shop, rebuilt in the same transaction as any write it depends on"""
+    __tablename__ = "compiled_contexts"
+
+    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    content_hash = Column(String(64), nullable=False)
+    context = Column(Text, nullable=False)
+    # True when the business context lives in knowledge chunks and is retrieved per question
+    uses_knowledge = Column(Boolean, nullable=False, default=False)
+    compiled_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
\ No newline at end of file
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, DateTime, String, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+
+from ..db import Base
+
+
+class IdempotencyKey(Base):
+    """
+    A chat turn claimed under a client idempotency key, shared by every
+    worker (services/idempotency.py). The worker whose claim_id is on the row
+    runs the turn; the others wait for its result.
+    """
+    __tablename__ = "idempotency_keys"
+
+    # "user:<id>" for the dashboard, "shop:<id>" for the widget
+    scope = Column(String(64), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    claim_id = Column(UUID(as_uuid=True), nullable=False)
+    # "running" or "done"
+    status = Column(String(16), nullable=False)
+    result = Column(JSONB, nullable=True)
+    # A running claim past this is assumed lost with its worker; a done row is no longer replayed
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
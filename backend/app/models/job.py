@@ -0,0 +1,40 @@
+import uuid
+from sqlalchemy import Column, String, Text, Integer, DateTime, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+
+from ..db import Base
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    # Gave up after max_attempts; kept for inspection and manual retry
+    DEAD = "dead"
+
+
+class Job(Base):
+    """
+    Unit of background work run by services/jobs.py. Enqueue it in the same
+    transaction as the change that needs it, so it exists only if that commits.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String(64), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    status = Column(String(16), nullable=False, default=JobStatus.QUEUED, server_default=JobStatus.QUEUED)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # A running job whose lease has expired is assumed lost with its worker and re-queued
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
@@ -0,0 +1,35 @@
+import uuid
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, LargeBinary
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import deferred
+from sqlalchemy.sql import func
+
+from ..db import Base
+
+
+class KnowledgeDocument(Base):
+    __tablename__ = "knowledge_documents"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id", ondelete="CASCADE"), nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    source = Column(String(20), nullable=False, default="upload")
+    char_count = Column(Integer, nullable=False, default=0)
+    # Original text, kept so chunks can be re-embedded when the embedder changes
+    content = deferred(Column(Text, nullable=False))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class KnowledgeChunk(Base):
+    __tablename__ = "knowledge_chunks"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id", ondelete="CASCADE"), nullable=False, index=True)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("knowledge_documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+    # float32 vector, little-endian, produced by the embedder named alongside it
+    embedding = Column(LargeBinary, nullable=False)
+    embedder = Column(String(100), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
@@ -11,7 +11,7 @@ class Shop(Base):
     __tablename__ = "shops"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    owner_id = Column(UUID(as_uuid=True), nullable=False)
+    owner_id = Column(UUID(as_uuid=True), nullable=False, index=True)
     business_name = Column(String(255), nullable=False)
     website = Column(String(500), nullable=True)
     email = Column(String(255), nullable=True)
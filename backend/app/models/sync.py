@@ -0,0 +1,34 @@
+from sqlalchemy import Column, BigInteger, DateTime, ForeignKey, String, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from ..db import Base
+
+
+class ShopSyncState(Base):
+    """
+    Change counter for the rows the dashboard syncs (shop, services, FAQs,
+    chat and widget config), bumped in the transaction that changes them, so
+    a poll of an unchanged shop is a primary-key lookup.
+    """
+    __tablename__ = "shop_sync_states"
+
+    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1)
+    changed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class SyncTombstone(Base):
+    """A deleted service or FAQ, kept for sync_tombstone_retention_days so clients can drop it"""
+    __tablename__ = "sync_tombstones"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id", ondelete="CASCADE"), nullable=False)
+    # "services" or "faqs"
+    entity = Column(String(32), nullable=False)
+    entity_id = Column(UUID(as_uuid=True), nullable=False)
+    deleted_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_sync_tombstones_shop_deleted", "shop_id", "deleted_at"),
+    )
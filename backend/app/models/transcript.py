@@ -0,0 +1,37 @@
+import uuid
+from sqlalchemy import Column, Text, DateTime, ForeignKey, String, Integer, Index, PrimaryKeyConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from ..db import Base
+
+
+class ChatTranscript(Base):
+    """
+    One widget chat turn. Range-partitioned by month on created_at; partitions
+    are created by services/transcripts.ensure_transcript_partitions.
+    """
+    __tablename__ = "chat_transcripts"
+
+    id = Column(UUID(as_uuid=True), nullable=False, default=uuid.uuid4)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id", ondelete="CASCADE"), nullable=False)
+    session_id = Column(String(64), nullable=True)
+    turn = Column(Integer, nullable=False)
+    channel = Column(String(16), nullable=False)
+    question = Column(Text, nullable=False)
+    reply = Column(Text, nullable=False)
+    # "model", "faq_shortcut", "fallback" or "quota"
+    source = Column(String(16), nullable=False)
+    route = Column(String(32), nullable=True)
+    model = Column(String(100), nullable=True)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # The partition key has to be part of the primary key
+        PrimaryKeyConstraint("id", "created_at", name="chat_transcripts_pkey"),
+        Index("ix_chat_transcripts_shop_created", "shop_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
@@ -0,0 +1,22 @@
+import uuid
+from sqlalchemy import Column, DateTime, ForeignKey, UniqueConstraint, BigInteger
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from ..db import Base
+
+
+class ShopUsage(Base):
+    """LLM tokens used by a shop's chatbot in one billing period (calendar month, UTC)"""
+    __tablename__ = "shop_usage"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    shop_id = Column(UUID(as_uuid=True), ForeignKey("shops.id", ondelete="CASCADE"), nullable=False)
+    period_start = Column(DateTime(timezone=True), nullable=False)
+    prompt_tokens = Column(BigInteger, nullable=False, default=0)
+    completion_tokens = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('shop_id', 'period_start', name='unique_shop_usage_period'),
+    )
@@ -0,0 +1,11 @@
+"""
+Standalone entry point for the public widget API, so widget traffic can be
+scaled separately from the dashboard API:
+
+    uvicorn app.public_app:app --workers 8
+
+app.main mounts the same routes for single-process deployments.
+"""
+from app.api.public.app import create_public_app
+
+app = create_public_app(standalone=True)
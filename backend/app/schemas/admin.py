@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from uuid import UUID
+from pydantic import BaseModel
+
+
+class ModelOverrideUpdate(BaseModel):
+    model_override: Optional[str] = None
+
+
+class JobResponse(BaseModel):
+    id: UUID
+    kind: str
+    payload: Dict[str, Any]
+    status: str
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
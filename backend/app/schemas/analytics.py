@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel
+
+
+class AnalyticsBucket(BaseModel):
+    bucket_start: datetime
+    turns: int
+    conversations: int
+    latency_p50_ms: Optional[float] = None
+    latency_p95_ms: Optional[float] = None
+
+
+class TopQuestion(BaseModel):
+    question: str
+    count: int
+
+
+class AnalyticsResponse(BaseModel):
+    granularity: Literal["hour", "day"]
+    since: datetime
+    turns: int
+    conversations: int
+    faq_shortcuts: int
+    fallbacks: int
+    prompt_tokens: int
+    completion_tokens: int
+    latency_p50_ms: Optional[float] = None
+    latency_p95_ms: Optional[float] = None
+    series: List[AnalyticsBucket]
+    top_questions: List[TopQuestion]
+    # impression / open / close / message_sent counts
+    widget_events: Dict[str, int] = {}
@@ -1,5 +1,7 @@
-from typing import List, Literal
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
 
 
 class ChatMessage(BaseModel):
@@ -9,7 +11,32 @@ class ChatMessage(BaseModel):
 
 class ChatRequest(BaseModel):
     messages: List[ChatMessage]
+    # Widget visitor session, only used to group turns in the transcript log
+    session_id: Optional[str] = Field(default=None, max_length=64)
+    # Same as the Idempotency-Key header, for clients that avoid custom headers (and the CORS preflight)
+    idempotency_key: Optional[str] = Field(default=None, min_length=1, max_length=255)
 
 
 class ChatResponse(BaseModel):
-    reply: str
\ No newline at end of file
+    reply: str
+
+
+class SocketHistoryMessage(BaseModel):
+    role: Literal["user", "assistant", "system"]
+    content: str = Field(max_length=settings.ws_max_history_message_chars)
+
+
+class SocketHello(BaseModel):
+    """First frame on /chat/{shop_id}/ws; session_id/turn/seq resume an earlier connection"""
+    type: Literal["hello"]
+    session_id: Optional[str] = None
+    turn: int = 0
+    seq: int = 0
+    # Client-side copy of the conversation, used when the server no longer has the session
+    history: List[SocketHistoryMessage] = Field(default=[], max_length=settings.ws_max_history_messages)
+
+
+class SocketUserMessage(BaseModel):
+    type: Literal["message"]
+    content: str
+    traceparent: Optional[str] = None
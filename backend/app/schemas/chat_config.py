@@ -1,7 +1,9 @@
 from uuid import UUID
 from datetime import datetime
-from typing import Optional, Literal
-from pydantic import BaseModel
+from typing import List, Optional, Literal
+from pydantic import BaseModel, Field, field_validator
+
+from app.services.allowed_origins import normalize_origin
 
 
 class ChatConfigBase(BaseModel):
@@ -13,13 +15,18 @@ class ChatConfigCreate(ChatConfigBase):
 
 
 class ChatConfigUpdate(ChatConfigBase):
-    pass
+    # Left unchanged when omitted
+    faq_shortcut_enabled: Optional[bool] = None
+    faq_shortcut_threshold: Optional[float] = Field(default=None, ge=0.5, le=1.0)
 
 
 class ChatConfigResponse(ChatConfigBase):
     id: UUID
     shop_id: UUID
     system_prompt: str
+    model_override: Optional[str] = None
+    faq_shortcut_enabled: bool
+    faq_shortcut_threshold: float
     created_at: datetime
     updated_at: datetime
 
@@ -34,6 +41,13 @@ class ChatWidgetConfigBase(BaseModel):
     greeting: str = "Hi! How can we help you with your services?"
     placeholder: str = "Ask about pricing, availability, or how we work..."
     show_branding: bool = True
+    # Sites allowed to embed the widget, e.g. "https://example.com" or "https://*.example.com"
+    allowed_origins: List[str] = Field(default=[], max_length=50)
+
+    @field_validator("allowed_origins")
+    @classmethod
+    def normalize_allowed_origins(cls, value: List[str]) -> List[str]:
+        return list(dict.fromkeys(normalize_origin(origin) for origin in value if origin.strip()))
 
 
 class ChatWidgetConfigCreate(ChatWidgetConfigBase):
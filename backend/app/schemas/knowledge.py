@@ -0,0 +1,16 @@
+from uuid import UUID
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class KnowledgeDocumentResponse(BaseModel):
+    id: UUID
+    shop_id: UUID
+    name: str
+    source: str
+    char_count: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
\ No newline at end of file
@@ -3,6 +3,19 @@ from typing import Optional
 from pydantic import BaseModel
 
 
+class UsageResponse(BaseModel):
+    plan_name: str
+    period_start: datetime
+    period_end: datetime
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    soft_limit: Optional[int] = None
+    hard_limit: Optional[int] = None
+    # "ok", "soft_limit" (replies use the fast model) or "hard_limit" (canned replies only)
+    status: str
+
+
 class SubscriptionResponse(BaseModel):
     plan_name: str
     is_active: bool
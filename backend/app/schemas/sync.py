@@ -0,0 +1,26 @@
+from typing import List, Optional
+from uuid import UUID
+from pydantic import BaseModel
+
+from app.schemas.chat_config import ChatConfigResponse, ChatWidgetConfigRead
+from app.schemas.faq import FAQResponse
+from app.schemas.service import ServiceResponse
+from app.schemas.shop import ShopResponse
+
+
+class SyncDeleted(BaseModel):
+    services: List[UUID]
+    faqs: List[UUID]
+
+
+class SyncResponse(BaseModel):
+    # Pass back as ?since= on the next poll
+    cursor: str
+    # True when this is the complete state rather than changes since the cursor
+    full: bool
+    shop: Optional[ShopResponse] = None
+    chat_config: Optional[ChatConfigResponse] = None
+    widget_config: Optional[ChatWidgetConfigRead] = None
+    services: List[ServiceResponse]
+    faqs: List[FAQResponse]
+    deleted: SyncDeleted
@@ -1,5 +1,23 @@
-from pydantic import BaseModel
+from typing import Dict, Literal
+from uuid import UUID
+from pydantic import BaseModel, Field, conint
 
 
 class WidgetEmbedResponse(BaseModel):
-    embed_script: str
\ No newline at end of file
+    embed_script: str
+
+
+class WidgetTimingReport(BaseModel):
+    traceparent: str = Field(pattern=r"^00-[0-9a-f]{32}-[0-9a-f]{16}-[0-9a-f]{2}$")
+    ttfr_ms: float = Field(ge=0, le=300000)
+
+
+class WidgetEventBatch(BaseModel):
+    """Counts of funnel events gathered by widget.js since its last beacon"""
+    events: Dict[Literal["impression", "open", "close", "message_sent"], conint(ge=1, le=1000)]
+
+
+class FAQSuggestion(BaseModel):
+    id: UUID
+    question: str
+    answer: str
\ No newline at end of file
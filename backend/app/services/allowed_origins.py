@@ -0,0 +1,153 @@
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from urllib.parse import urlsplit
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import read_session
+from app.models.chat_config import ChatWidgetConfig
+from app.models.shop import Shop
+
+_HOST_RE = re.compile(r"^(\*\.)?[a-z0-9]([a-z0-9-]*[a-z0-9])?(\.[a-z0-9]([a-z0-9-]*[a-z0-9])?)*$")
+
+
+def normalize_origin(value: str) -> str:
+    """
+    Reduce a URL or origin to scheme://host[:port], as browsers send it.
+
+    A leading "*." in the host allows every subdomain. Raises ValueError for
+    anything that is not an http(s) origin.
+    """
+    value = value.strip()
+    if "://" not in value:
+        value = f"https://{value}"
+    parts = urlsplit(value)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if scheme not in ("http", "https") or not _HOST_RE.match(host):
+        raise ValueError(f"Invalid origin: {value}")
+    default_port = 443 if scheme == "https" else 80
+    port = f":{parts.port}" if parts.port and parts.port != default_port else ""
+    return f"{scheme}://{host}{port}"
+
+
+@dataclass(frozen=True)
+class CompiledOrigins:
+    exact: FrozenSet[str]
+    # (scheme://, .example.com) pairs from "*.example.com" entries
+    wildcards: Tuple[Tuple[str, str], ...]
+
+    @classmethod
+    def compile(cls, origins: List[str]) -> "CompiledOrigins":
+        exact = set()
+        wildcards = []
+        for origin in origins:
+            scheme, _, host = origin.partition("://")
+            if host.startswith("*."):
+                wildcards.append((f"{scheme}://", host[1:]))
+            else:
+                exact.add(origin)
+        return cls(frozenset(exact), tuple(wildcards))
+
+    def allows(self, origin: str) -> bool:
+        if origin in self.exact:
+            return True
+        return any(origin.startswith(scheme) and origin.endswith(suffix) for scheme, suffix in self.wildcards)
+
+
+# Dashboard origins may always call the public API (widget preview and test page)
+_dashboard_origins = frozenset(settings.cors_origin_list)
+
+# Only shops that restrict their origins are held; all others accept any site
+_registry: Dict[UUID, CompiledOrigins] = {}
+# Every shop id at the last load, so junk ids from anonymous callers cost no database work
+_shop_ids: FrozenSet[UUID] = frozenset()
+_loaded_at: Optional[float] = None
+_refreshing = False
+_lock = threading.Lock()
+
+
+def is_origin_allowed(shop_id: UUID, origin: str) -> bool:
+    """Pure in-memory check, safe to call before any database work"""
+    if origin in _dashboard_origins:
+        return True
+    compiled = _registry.get(shop_id)
+    return compiled is None or compiled.allows(origin.lower())
+
+
+def is_known_shop(shop_id: UUID) -> bool:
+    """
+    Whether the shop existed at the last load or was created by this worker
+    since. Shops created through another worker are unknown here for up to
+    origin_registry_ttl seconds.
+    """
+    return shop_id in _shop_ids
+
+
+def is_registry_loaded() -> bool:
+    return _loaded_at is not None
+
+
+def is_registry_stale() -> bool:
+    return _loaded_at is None or time.monotonic() - _loaded_at >= settings.origin_registry_ttl
+
+
+def load_origin_registry(db: Session) -> None:
+    """Replace the registry with a fresh snapshot of every shop id and every restricted shop"""
+    global _registry, _shop_ids, _loaded_at
+    shop_ids = frozenset(db.execute(select(Shop.id)).scalars())
+    rows = db.query(ChatWidgetConfig.shop_id, ChatWidgetConfig.allowed_origins).filter(
+        ChatWidgetConfig.allowed_origins != []
+    ).all()
+    registry = {row.shop_id: CompiledOrigins.compile(row.allowed_origins) for row in rows}
+    with _lock:
+        _registry = registry
+        _shop_ids = shop_ids
+        _loaded_at = time.monotonic()
+
+
+def refresh_origin_registry() -> None:
+    """Reload the registry with a short-lived session (for use off the request path)"""
+    global _refreshing
+    db = read_session()
+    try:
+        load_origin_registry(db)
+    finally:
+        db.close()
+        with _lock:
+            _refreshing = False
+
+
+def claim_registry_refresh() -> bool:
+    """Single-flight guard so a stale registry is only reloaded once per worker"""
+    global _refreshing
+    with _lock:
+        if _refreshing:
+            return False
+        _refreshing = True
+        return True
+
+
+def update_shop_origins(shop_id: UUID, origins: List[str]) -> None:
+    """Apply a shop's new list locally right away; other workers pick it up within the TTL"""
+    global _registry
+    with _lock:
+        registry = dict(_registry)
+        if origins:
+            registry[shop_id] = CompiledOrigins.compile(origins)
+        else:
+            registry.pop(shop_id, None)
+        _registry = registry
+
+
+def add_known_shop(shop_id: UUID) -> None:
+    """Make a shop created by this worker known right away; other workers pick it up within the TTL"""
+    global _shop_ids
+    with _lock:
+        _shop_ids = _shop_ids | {shop_id}
@@ -0,0 +1,329 @@
+import logging
+import math
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, text, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import SessionLocal
+from app.models.analytics import ChatRollup, QuestionRollup, RollupCursor, WidgetEventCount
+from app.models.transcript import ChatTranscript
+from app.services.faq_index import normalize_tokens
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "chat_transcripts"
+# pg advisory lock key so only one worker folds transcripts at a time
+_ROLLUP_LOCK_KEY = 4_204_201
+
+# Relative accuracy of latency percentiles
+_SKETCH_ALPHA = 0.02
+_SKETCH_GAMMA = (1 + _SKETCH_ALPHA) / (1 - _SKETCH_ALPHA)
+_LOG_GAMMA = math.log(_SKETCH_GAMMA)
+
+
+class LatencySketch:
+    """
+    Log-bucketed latency histogram with bounded relative error (DDSketch style).
+
+    Sketches merge by adding bucket counts, so hourly sketches combine into
+    daily ones and any range can be summarized without the raw rows. Stored
+    as {bucket index: count} with string keys for JSONB.
+    """
+
+    def __init__(self, buckets: Optional[Dict[int, int]] = None):
+        self.buckets: Dict[int, int] = dict(buckets or {})
+
+    @classmethod
+    def from_json(cls, data: Optional[Dict[str, int]]) -> "LatencySketch":
+        return cls({int(key): count for key, count in (data or {}).items()})
+
+    def to_json(self) -> Dict[str, int]:
+        return {str(key): count for key, count in sorted(self.buckets.items())}
+
+    @property
+    def count(self) -> int:
+        return sum(self.buckets.values())
+
+    def add(self, value_ms: float, count: int = 1) -> None:
+        index = 0 if value_ms <= 1 else math.ceil(math.log(value_ms) / _LOG_GAMMA)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other: "LatencySketch") -> None:
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                break
+        if index == 0:
+            return 1.0
+        return 2 * _SKETCH_GAMMA ** index / (_SKETCH_GAMMA + 1)
+
+
+@dataclass
+class _Bucket:
+    turns: int = 0
+    conversations: int = 0
+    faq_shortcuts: int = 0
+    fallbacks: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    sketch: LatencySketch = field(default_factory=LatencySketch)
+
+
+def question_key(question: str) -> str:
+    """Normalized form used to group the same question asked in different words"""
+    return " ".join(normalize_tokens(question))[:255]
+
+
+def _merge_buckets(db: Session, granularity: str, buckets: Dict[Tuple[UUID, datetime], _Bucket]) -> None:
+    if not buckets:
+        return
+    existing = {
+        (rollup.shop_id, rollup.bucket_start): rollup
+        for rollup in db.query(ChatRollup).filter(
+            ChatRollup.granularity == granularity,
+            tuple_(ChatRollup.shop_id, ChatRollup.bucket_start).in_(list(buckets))
+        )
+    }
+    for (shop_id, bucket_start), bucket in buckets.items():
+        rollup = existing.get((shop_id, bucket_start))
+        if rollup is None:
+            rollup = ChatRollup(
+                shop_id=shop_id, granularity=granularity, bucket_start=bucket_start,
+                turns=0, conversations=0, faq_shortcuts=0, fallbacks=0,
+                prompt_tokens=0, completion_tokens=0, latency_sketch={}
+            )
+            db.add(rollup)
+        rollup.turns += bucket.turns
+        rollup.conversations += bucket.conversations
+        rollup.faq_shortcuts += bucket.faq_shortcuts
+        rollup.fallbacks += bucket.fallbacks
+        rollup.prompt_tokens += bucket.prompt_tokens
+        rollup.completion_tokens += bucket.completion_tokens
+        sketch = LatencySketch.from_json(rollup.latency_sketch)
+        sketch.merge(bucket.sketch)
+        rollup.latency_sketch = sketch.to_json()
+
+
+def _merge_questions(db: Session, questions: Dict[Tuple[UUID, datetime, str], List]) -> None:
+    keys = list(questions)
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        existing = {
+            (rollup.shop_id, rollup.day, rollup.question_key): rollup
+            for rollup in db.query(QuestionRollup).filter(
+                tuple_(QuestionRollup.shop_id, QuestionRollup.day, QuestionRollup.question_key).in_(chunk)
+            )
+        }
+        for key in chunk:
+            sample, count = questions[key]
+            rollup = existing.get(key)
+            if rollup is None:
+                db.add(QuestionRollup(shop_id=key[0], day=key[1], question_key=key[2], sample_question=sample, count=count))
+            else:
+                rollup.count += count
+
+    # Keep only each day's most asked questions so reads stay bounded
+    days = sorted({key[1] for key in keys})
+    if days:
+        db.flush()
+        db.execute(text(
+            "DELETE FROM question_rollups WHERE id IN ("
+            "  SELECT id FROM ("
+            "    SELECT id, row_number() OVER (PARTITION BY shop_id, day ORDER BY count DESC) AS rank"
+            "    FROM question_rollups WHERE day = ANY(:days)"
+            "  ) ranked WHERE rank > :keep"
+            ")"
+        ), {"days": days, "keep": settings.analytics_questions_per_day})
+
+
+def roll_up_transcripts(db: Session) -> Optional[int]:
+    """
+    Fold one window of new chat_transcripts rows into the rollup tables.
+
+    Windows end analytics_rollup_lag seconds in the past so rows still in a
+    worker's transcript queue are not skipped, and span at most
+    analytics_rollup_max_window seconds. Returns the number of rows folded,
+    or None when there was nothing to do or another worker holds the lock.
+    """
+    if not db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _ROLLUP_LOCK_KEY}).scalar():
+        db.rollback()
+        return None
+
+    until = datetime.now(timezone.utc) - timedelta(seconds=settings.analytics_rollup_lag)
+    cursor = db.get(RollupCursor, CURSOR_NAME)
+    if cursor is None:
+        earliest = db.query(func.min(ChatTranscript.created_at)).scalar()
+        cursor = RollupCursor(name=CURSOR_NAME, processed_until=min(earliest or until, until))
+        db.add(cursor)
+    start = cursor.processed_until
+    if start >= until:
+        db.rollback()
+        return None
+    end = min(until, start + timedelta(seconds=settings.analytics_rollup_max_window))
+
+    hours: Dict[Tuple[UUID, datetime], _Bucket] = {}
+    days: Dict[Tuple[UUID, datetime], _Bucket] = {}
+    questions: Dict[Tuple[UUID, datetime, str], List] = {}
+    rows = db.query(
+        ChatTranscript.shop_id,
+        ChatTranscript.created_at,
+        ChatTranscript.turn,
+        ChatTranscript.source,
+        ChatTranscript.prompt_tokens,
+        ChatTranscript.completion_tokens,
+        ChatTranscript.latency_ms,
+        ChatTranscript.question
+    ).filter(
+        ChatTranscript.created_at >= start,
+        ChatTranscript.created_at < end
+    ).yield_per(1000)
+
+    folded = 0
+    for row in rows:
+        folded += 1
+        created_at = row.created_at.astimezone(timezone.utc)
+        hour = created_at.replace(minute=0, second=0, microsecond=0)
+        day = hour.replace(hour=0)
+        for bucket in (hours.setdefault((row.shop_id, hour), _Bucket()), days.setdefault((row.shop_id, day), _Bucket())):
+            bucket.turns += 1
+            bucket.conversations += 1 if row.turn == 1 else 0
+            bucket.faq_shortcuts += 1 if row.source == "faq_shortcut" else 0
+            bucket.fallbacks += 1 if row.source == "fallback" else 0
+            bucket.prompt_tokens += row.prompt_tokens
+            bucket.completion_tokens += row.completion_tokens
+            bucket.sketch.add(row.latency_ms)
+        key = question_key(row.question)
+        if key:
+            entry = questions.setdefault((row.shop_id, day, key), [row.question[:1000], 0])
+            entry[1] += 1
+
+    _merge_buckets(db, "hour", hours)
+    _merge_buckets(db, "day", days)
+    _merge_questions(db, questions)
+    cursor.processed_until = end
+    db.commit()
+    return folded
+
+
+def run_rollups(db: Session) -> int:
+    """Fold transcripts until the cursor has caught up; returns rows folded"""
+    total = 0
+    while True:
+        folded = roll_up_transcripts(db)
+        if folded is None:
+            return total
+        total += folded
+
+
+def get_shop_analytics(db: Session, shop_id: UUID, days: int) -> Dict:
+    """
+    Chat statistics for the last `days` days (UTC, including today), read
+    only from the rollup tables: hourly buckets for up to two days, daily
+    buckets beyond that. widget_events sums the widget funnel counters.
+    """
+    granularity = "hour" if days <= 2 else "day"
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    since = today - timedelta(days=days - 1)
+
+    rollups = db.query(ChatRollup).filter(
+        ChatRollup.shop_id == shop_id,
+        ChatRollup.granularity == granularity,
+        ChatRollup.bucket_start >= since
+    ).order_by(ChatRollup.bucket_start).all()
+
+    overall = LatencySketch()
+    series = []
+    for rollup in rollups:
+        sketch = LatencySketch.from_json(rollup.latency_sketch)
+        overall.merge(sketch)
+        series.append({
+            "bucket_start": rollup.bucket_start,
+            "turns": rollup.turns,
+            "conversations": rollup.conversations,
+            "latency_p50_ms": sketch.quantile(0.5),
+            "latency_p95_ms": sketch.quantile(0.95),
+        })
+
+    top_questions = db.query(
+        func.min(QuestionRollup.sample_question).label("question"),
+        func.sum(QuestionRollup.count).label("count")
+    ).filter(
+        QuestionRollup.shop_id == shop_id,
+        QuestionRollup.day >= since
+    ).group_by(QuestionRollup.question_key).order_by(func.sum(QuestionRollup.count).desc()).limit(10).all()
+
+    funnel = db.query(WidgetEventCount.event_type, func.sum(WidgetEventCount.count)).filter(
+        WidgetEventCount.shop_id == shop_id,
+        WidgetEventCount.bucket_start >= since
+    ).group_by(WidgetEventCount.event_type).all()
+
+    return {
+        "granularity": granularity,
+        "since": since,
+        "turns": sum(rollup.turns for rollup in rollups),
+        "conversations": sum(rollup.conversations for rollup in rollups),
+        "faq_shortcuts": sum(rollup.faq_shortcuts for rollup in rollups),
+        "fallbacks": sum(rollup.fallbacks for rollup in rollups),
+        "prompt_tokens": sum(rollup.prompt_tokens for rollup in rollups),
+        "completion_tokens": sum(rollup.completion_tokens for rollup in rollups),
+        "latency_p50_ms": overall.quantile(0.5),
+        "latency_p95_ms": overall.quantile(0.95),
+        "series": series,
+        "top_questions": [{"question": row.question, "count": int(row.count)} for row in top_questions],
+        "widget_events": {event_type: int(count) for event_type, count in funnel},
+    }
+
+
+class AnalyticsRollupWorker:
+    """
+    Background thread folding new transcripts into rollups every
+    analytics_rollup_interval seconds. Every worker runs one; the advisory
+    lock in roll_up_transcripts lets only one of them work at a time.
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if not settings.analytics_rollup_enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="analytics-rollup", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(settings.analytics_rollup_interval):
+            db = SessionLocal()
+            try:
+                run_rollups(db)
+            except SQLAlchemyError as e:
+                logger.warning("Analytics rollup failed: %r", e)
+                db.rollback()
+            finally:
+                db.close()
+
+
+rollup_worker = AnalyticsRollupWorker()
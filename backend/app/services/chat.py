@@ -1,47 +1,386 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+import openai
 from openai import AsyncOpenAI
 from uuid import UUID
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
 
+from app.models.chat_config import ChatConfig
 from app.models.shop import Shop
-from app.services.chat_config import get_shop_by_owner, build_full_context
+from app.services.chat_config import get_shop_by_owner, get_chat_config_by_shop, build_full_context
+from app.services.faq_index import get_faq_index
+from app.services.model_routing import ModelRoute, choose_route, latest_user_message
+from app.services.subscription_cache import get_subscription_state
+from app.services.usage import QUOTA_HARD_LIMIT, QUOTA_SOFT_LIMIT, usage_meter
 from app.core.config import settings
+from app.core.metrics import (
+    FAQ_SHORTCUT,
+    FAQ_SHORTCUT_SECONDS_SAVED,
+    LLM_CANCELLED,
+    LLM_IN_FLIGHT,
+    observe_phase,
+    record_route,
+    record_token_usage,
+)
+from app.core.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    LatencyTracker,
+    call_with_resilience,
+)
+from app.core.tracing import tracer
 
-# Initialize OpenAI client
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+logger = logging.getLogger(__name__)
+
+# Initialize OpenAI client (retries and timeouts are handled by the resilience layer)
+client = AsyncOpenAI(api_key=settings.openai_api_key, max_retries=0)
+
+llm_breaker = CircuitBreaker(
+    "openai",
+    failure_threshold=settings.llm_breaker_failure_threshold,
+    recovery_timeout=settings.llm_breaker_recovery_timeout
+)
+# Caps concurrent OpenAI turns per worker (a hedge shares its turn's permit); released on cancellation too
+llm_slots = asyncio.Semaphore(settings.llm_max_concurrency)
+# Latency differs a lot between models, so hedging delays are tracked per model
+llm_latency: Dict[str, LatencyTracker] = {}
+
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+
+class ChatGenerationError(Exception):
+    """Raised when a reply cannot be produced and a canned reply would not help"""
+
+
+@dataclass
+class ChatResult:
+    """A reply plus how it was produced, for transcripts and usage accounting"""
+    reply: str = ""
+    # "model", "faq_shortcut", "fallback" or "quota" (hard token limit reached)
+    source: str = "model"
+    route: Optional[str] = None
+    model: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_ms: int = 0
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, RETRYABLE_ERRORS)
+
+
+def _latency_for(model: str) -> LatencyTracker:
+    if model not in llm_latency:
+        llm_latency[model] = LatencyTracker()
+    return llm_latency[model]
+
+
+def _hedge_delay(model: str) -> Optional[float]:
+    """Fire a hedged request once the first has been slower than the model's recent p95"""
+    latency = _latency_for(model)
+    if not settings.llm_hedge_enabled or len(latency) < settings.llm_hedge_min_samples:
+        return None
+    return latency.percentile(settings.llm_hedge_percentile)
+
+
+def build_fallback_reply(shop: Shop) -> str:
+    """Canned reply pointing the customer at the shop's own contact details"""
+    contacts = []
+    if shop.phone_number:
+        contacts.append(f"call us at {shop.phone_number}")
+    if shop.email:
+        contacts.append(f"email us at {shop.email}")
+    
+    if contacts:
+        return (
+            f"Sorry, I'm having trouble answering right now. "
+            f"Please {' or '.join(contacts)} and the {shop.business_name} team will be happy to help."
+        )
+    return "Sorry, I'm having trouble answering right now. Please try again in a few minutes."
+
+
+def get_llm_health() -> Dict:
+    """Breaker state and recent latency of the OpenAI integration for this worker"""
+    return {
+        "breaker": llm_breaker.snapshot(),
+        "models": {
+            model: {
+                "latency_samples": len(latency),
+                "latency_p50": latency.percentile(0.5),
+                "latency_p95": latency.percentile(0.95),
+                "hedge_delay": _hedge_delay(model),
+            }
+            for model, latency in llm_latency.items()
+        },
+    }
+
+
+def _faq_shortcut(db: Session, shop: Shop, chat_config: Optional[ChatConfig], messages: List[Dict[str, str]]) -> Optional[str]:
+    """Return the stored FAQ answer when the latest question closely matches an FAQ"""
+    if chat_config is None or not chat_config.faq_shortcut_enabled:
+        return None
+    
+    with observe_phase("faq_match"), tracer.start_as_current_span("faq.shortcut") as span:
+        match = get_faq_index(db, shop.id).best_match(latest_user_message(messages))
+        score = match[1] if match else 0.0
+        span.set_attribute("faq.score", score)
+    
+    if match is None or score < chat_config.faq_shortcut_threshold:
+        FAQ_SHORTCUT.labels("miss").inc()
+        return None
+    
+    FAQ_SHORTCUT.labels("hit").inc()
+    typical_latency = _latency_for(settings.llm_default_model).percentile(0.5)
+    if typical_latency:
+        FAQ_SHORTCUT_SECONDS_SAVED.inc(typical_latency)
+    return match[0].answer
+
+
+def _elapsed_ms(started: float) -> int:
+    return int((time.perf_counter() - started) * 1000)
+
+
+async def _create_completion(params: Dict):
+    with LLM_IN_FLIGHT.track_inprogress(), \
+            tracer.start_as_current_span("openai.chat.completions.create") as span:
+        span.set_attribute("llm.model", params["model"])
+        response = await client.chat.completions.create(**params)
+        if response.usage:
+            span.set_attribute("llm.prompt_tokens", response.usage.prompt_tokens)
+            span.set_attribute("llm.completion_tokens", response.usage.completion_tokens)
+        return response
+
+
+def _prepare_turn(
+    db: Session,
+    shop: Shop,
+    messages: List[Dict[str, str]]
+) -> Tuple[Optional[ChatResult], Optional[ModelRoute], Optional[Dict]]:
+    """
+    Everything that happens before OpenAI is called.
+    
+    Returns (result, None, None) when the turn can be answered without the
+    model (FAQ shortcut, breaker open, hard token limit reached), otherwise
+    (None, route, params).
+    """
+    chat_config = get_chat_config_by_shop(db, shop.id)
+    
+    # Answer near-verbatim FAQ questions directly, without calling OpenAI
+    faq_answer = _faq_shortcut(db, shop, chat_config, messages)
+    if faq_answer is not None:
+        return ChatResult(reply=faq_answer, source="faq_shortcut"), None, None
+    
+    # Fail fast without building the context while OpenAI is known to be down
+    if llm_breaker.is_open():
+        return ChatResult(reply=build_fallback_reply(shop), source="fallback"), None, None
+    
+    # Quota state is held in memory, so this adds no database round trip
+    subscription = get_subscription_state(db, shop.owner_id)
+    plan_name = subscription.plan_name if subscription else None
+    quota = usage_meter.check_quota(shop.id, plan_name)
+    if quota == QUOTA_HARD_LIMIT:
+        return ChatResult(reply=build_fallback_reply(shop), source="quota"), None, None
+    
+    # Use existing build_full_context function from chat_config service
+    system_context = build_full_context(db, shop.id, query=latest_user_message(messages))
+    
+    if not system_context:
+        raise ChatGenerationError("No chat configuration found for shop")
+    
+    # Prepare messages for OpenAI
+    openai_messages = [
+        {"role": "system", "content": system_context}
+    ]
+    
+    # Add user messages
+    openai_messages.extend(messages)
+    
+    # Pick model and completion budget for this turn
+    route = choose_route(chat_config, plan_name, messages, over_soft_limit=quota == QUOTA_SOFT_LIMIT)
+    
+    params = {
+        "model": route.model,
+        "messages": openai_messages,
+        "temperature": route.temperature,
+        "max_tokens": route.max_tokens,
+    }
+    return None, route, params
+
+
+async def _prepare_turn_in_thread(
+    db: Session,
+    shop: Shop,
+    messages: List[Dict[str, str]]
+) -> Tuple[Optional[ChatResult], Optional[ModelRoute], Optional[Dict]]:
+    """
+    _prepare_turn off the event loop: its queries and the embedding of the
+    question (an HTTP call with EMBEDDER=openai) block.
+    """
+    prepare = asyncio.ensure_future(asyncio.to_thread(_prepare_turn, db, shop, messages))
+    try:
+        return await asyncio.shield(prepare)
+    except asyncio.CancelledError:
+        # The caller closes the session as it unwinds, so let the thread finish with it first
+        await asyncio.wait({prepare})
+        raise
 
 
 async def generate_chat_response(
     db: Session, 
     shop: Shop, 
     messages: List[Dict[str, str]]
-) -> str:
+) -> ChatResult:
     """Generate AI response using OpenAI ChatCompletion"""
     
+    turn_started = time.perf_counter()
+    result, route, params = await _prepare_turn_in_thread(db, shop, messages)
+    if result is not None:
+        result.latency_ms = _elapsed_ms(turn_started)
+        return result
+    
+    result = ChatResult(route=route.name, model=route.model)
+    started = time.perf_counter()
     try:
-        # Use existing build_full_context function from chat_config service
-        system_context = build_full_context(db, shop.id)
-        
-        if not system_context:
-            raise Exception("No chat configuration found for shop")
-        
-        # Prepare messages for OpenAI
-        openai_messages = [
-            {"role": "system", "content": system_context}
-        ]
-        
-        # Add user messages
-        openai_messages.extend(messages)
-        
-        # Call OpenAI API using new v1.0+ syntax
-        response = await client.chat.completions.create(
-            model="gpt-4",
-            messages=openai_messages,
-            temperature=0.7,
-            max_tokens=500
-        )
-        
-        return response.choices[0].message.content
+        with observe_phase("llm"), tracer.start_as_current_span("llm.routed_call") as span:
+            span.set_attribute("llm.route", route.name)
+            span.set_attribute("llm.model", route.model)
+            # Taken outside the resilience layer, so waiting for a permit is not
+            # counted against the attempt timeout or as an OpenAI failure
+            async with llm_slots:
+                response = await call_with_resilience(
+                    lambda: _create_completion(params),
+                    name="openai",
+                    breaker=llm_breaker,
+                    latency=_latency_for(route.model),
+                    is_retryable=_is_retryable,
+                    attempt_timeout=settings.llm_attempt_timeout,
+                    deadline=settings.llm_total_timeout,
+                    max_retries=settings.llm_max_retries,
+                    backoff_base=settings.llm_backoff_base,
+                    backoff_max=settings.llm_backoff_max,
+                    hedge_delay=_hedge_delay(route.model)
+                )
+    except asyncio.CancelledError:
+        # The caller went away (e.g. the visitor closed the tab); the pending
+        # HTTP request to OpenAI has been cancelled along with this task
+        LLM_CANCELLED.labels("client_disconnect").inc()
+        logger.info("OpenAI call for shop %s cancelled after %.2fs", shop.id, time.perf_counter() - started)
+        raise
+    except (CircuitOpenError, DeadlineExceededError, *RETRYABLE_ERRORS) as e:
+        logger.warning("OpenAI unavailable for shop %s, using fallback reply: %r", shop.id, e)
+        result.reply = build_fallback_reply(shop)
+        result.source = "fallback"
+        result.latency_ms = _elapsed_ms(turn_started)
+        return result
+    except openai.OpenAIError as e:
+        logger.error("OpenAI request failed for shop %s: %r", shop.id, e)
+        raise ChatGenerationError("The assistant could not process this request") from e
+    
+    result.prompt_tokens = response.usage.prompt_tokens if response.usage else 0
+    result.completion_tokens = response.usage.completion_tokens if response.usage else 0
+    record_token_usage(shop.id, result.prompt_tokens, result.completion_tokens)
+    usage_meter.record(shop.id, result.prompt_tokens, result.completion_tokens)
+    record_route(route.name, route.model, time.perf_counter() - started, result.prompt_tokens, result.completion_tokens)
+    
+    result.reply = response.choices[0].message.content
+    result.latency_ms = _elapsed_ms(turn_started)
+    return result
+
+
+async def _open_stream(params: Dict):
+    with tracer.start_as_current_span("openai.chat.completions.create") as span:
+        span.set_attribute("llm.model", params["model"])
+        span.set_attribute("llm.stream", True)
+        return await client.chat.completions.create(**params)
+
+
+async def stream_chat_response(
+    db: Session,
+    shop: Shop,
+    messages: List[Dict[str, str]],
+    result: Optional[ChatResult] = None
+) -> AsyncIterator[str]:
+    """
+    Yield the reply in pieces as OpenAI produces them.
+    
+    Retries and the breaker only cover opening the stream; once tokens have
+    been sent a failure cannot be retried transparently and raises
+    ChatGenerationError. Replies that skip the model come as a single piece.
+    When result is given it is filled in as the reply is produced.
+    """
+    result = result if result is not None else ChatResult()
+    turn_started = time.perf_counter()
+    shortcut, route, params = await _prepare_turn_in_thread(db, shop, messages)
+    if shortcut is not None:
+        result.reply, result.source = shortcut.reply, shortcut.source
+        result.latency_ms = _elapsed_ms(turn_started)
+        yield shortcut.reply
+        return
+    
+    params = {**params, "stream": True, "stream_options": {"include_usage": True}}
+    result.route, result.model = route.name, route.model
+    started = time.perf_counter()
+    
+    # Held for the whole stream, not just the request that opens it
+    async with llm_slots:
+        try:
+            with observe_phase("llm_first_token"), tracer.start_as_current_span("llm.routed_stream") as span:
+                span.set_attribute("llm.route", route.name)
+                span.set_attribute("llm.model", route.model)
+                # No hedging: a losing duplicate stream could not be closed reliably
+                stream = await call_with_resilience(
+                    lambda: _open_stream(params),
+                    name="openai",
+                    breaker=llm_breaker,
+                    latency=_latency_for(route.model),
+                    is_retryable=_is_retryable,
+                    attempt_timeout=settings.llm_attempt_timeout,
+                    deadline=settings.llm_total_timeout,
+                    max_retries=settings.llm_max_retries,
+                    backoff_base=settings.llm_backoff_base,
+                    backoff_max=settings.llm_backoff_max
+                )
+        except asyncio.CancelledError:
+            LLM_CANCELLED.labels("client_disconnect").inc()
+            raise
+        except (CircuitOpenError, DeadlineExceededError, *RETRYABLE_ERRORS) as e:
+            logger.warning("OpenAI unavailable for shop %s, using fallback reply: %r", shop.id, e)
+            result.reply, result.source = build_fallback_reply(shop), "fallback"
+            result.latency_ms = _elapsed_ms(turn_started)
+            yield result.reply
+            return
+        except openai.OpenAIError as e:
+            logger.error("OpenAI request failed for shop %s: %r", shop.id, e)
+            raise ChatGenerationError("The assistant could not process this request") from e
         
-    except Exception as e:
-        raise Exception(f"OpenAI API error: {str(e)}")
\ No newline at end of file
+        try:
+            with LLM_IN_FLIGHT.track_inprogress():
+                async for chunk in stream:
+                    if chunk.usage:
+                        result.prompt_tokens = chunk.usage.prompt_tokens
+                        result.completion_tokens = chunk.usage.completion_tokens
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        result.reply += chunk.choices[0].delta.content
+                        yield chunk.choices[0].delta.content
+        except asyncio.CancelledError:
+            LLM_CANCELLED.labels("client_disconnect").inc()
+            raise
+        except openai.OpenAIError as e:
+            logger.error("OpenAI stream failed for shop %s: %r", shop.id, e)
+            raise ChatGenerationError("The reply was interrupted") from e
+        finally:
+            await stream.close()
+    
+    record_token_usage(shop.id, result.prompt_tokens, result.completion_tokens)
+    usage_meter.record(shop.id, result.prompt_tokens, result.completion_tokens)
+    record_route(route.name, route.model, time.perf_counter() - started, result.prompt_tokens, result.completion_tokens)
+    result.latency_ms = _elapsed_ms(turn_started)
\ No newline at end of file
@@ -4,6 +4,10 @@ from sqlalchemy.orm import Session
 
 from app.models.chat_config import ChatConfig
 from app.models.shop import Shop
+from app.services.knowledge import retrieve_relevant_chunks, sync_user_context
+from app.services.compiled_context import compile_static_context, get_compiled_context
+from app.core.metrics import observe_phase
+from app.core.tracing import tracer
 
 
 def get_shop_by_owner(db: Session, owner_id: UUID) -> Optional[Shop]:
@@ -40,81 +44,66 @@ def create_chat_config(db: Session, shop_id: UUID, user_context: Optional[str] =
     db.add(chat_config)
     db.commit()
     db.refresh(chat_config)
+    sync_user_context(db, shop_id, user_context)
     return chat_config
 
 
-def update_chat_config(db: Session, chat_config: ChatConfig, user_context: Optional[str]) -> ChatConfig:
+def update_chat_config(
+    db: Session,
+    chat_config: ChatConfig,
+    user_context: Optional[str],
+    faq_shortcut_enabled: Optional[bool] = None,
+    faq_shortcut_threshold: Optional[float] = None
+) -> ChatConfig:
     chat_config.user_context = user_context
+    if faq_shortcut_enabled is not None:
+        chat_config.faq_shortcut_enabled = faq_shortcut_enabled
+    if faq_shortcut_threshold is not None:
+        chat_config.faq_shortcut_threshold = faq_shortcut_threshold
     db.commit()
     db.refresh(chat_config)
+    sync_user_context(db, chat_config.shop_id, user_context)
     return chat_config
 
 
-def build_full_context(db: Session, shop_id: UUID) -> str:
-    """Build complete chatbot context from all shop data"""
-    from app.models.service import Service
-    from app.models.faq import FAQ
-    
-    chat_config = get_chat_config_by_shop(db, shop_id)
-    if not chat_config:
-        return ""
-    
-    # Get shop details
-    shop = db.query(Shop).filter(Shop.id == shop_id).first()
-    if not shop:
-        return ""
-    
-    # Start with system prompt but customize it with shop name
-    base_prompt = chat_config.system_prompt
-    if shop.business_name:
-        customized_prompt = base_prompt.replace(
-            "a service business", 
-            f"{shop.business_name}"
-        ).replace(
-            "the business",
-            f"{shop.business_name}"
-        )
-    else:
-        customized_prompt = base_prompt
-    
-    context_parts = [customized_prompt]
-    
-    # Add shop information
-    shop_info = f"\nBusiness Information:\n"
-    shop_info += f"Business Name: {shop.business_name}\n"
-    if shop.description:
-        shop_info += f"Description: {shop.description}\n"
-    if shop.website:
-        shop_info += f"Website: {shop.website}\n"
-    if shop.email:
-        shop_info += f"Email: {shop.email}\n"
-    if shop.phone_number:
-        shop_info += f"Phone: {shop.phone_number}\n"
-    context_parts.append(shop_info)
-    
-    # Add user context if available
-    if chat_config.user_context:
-        context_parts.append(f"\nAdditional Business Context:\n{chat_config.user_context}")
-    
-    # Add services
-    services = db.query(Service).filter(Service.shop_id == shop_id).all()
-    if services:
-        services_text = "\nServices We Offer:\n"
-        for service in services:
-            services_text += f"- {service.name}: ${service.price} ({service.duration_minutes} minutes)"
-            if service.description:
-                services_text += f" - {service.description}"
-            services_text += "\n"
-        context_parts.append(services_text)
-    else:
-        context_parts.append("\nNote: No specific services have been configured yet. Please ask the customer to contact us directly for service information.")
-    
-    # Add FAQs
-    faqs = db.query(FAQ).filter(FAQ.shop_id == shop_id).all()
-    if faqs:
-        faqs_text = "\nFrequently Asked Questions:\n"
-        for faq in faqs:
-            faqs_text += f"Q: {faq.question}\nA: {faq.answer}\n\n"
-        context_parts.append(faqs_text)
+def set_model_override(db: Session, chat_config: ChatConfig, model_override: Optional[str]) -> ChatConfig:
+    chat_config.model_override = model_override or None
+    db.commit()
+    db.refresh(chat_config)
+    return chat_config
+
+
+def build_full_context(db: Session, shop_id: UUID, query: Optional[str] = None) -> str:
+    """
+    Build complete chatbot context from all shop data.
     
-    return "\n".join(context_parts)
\ No newline at end of file
+    Reads the materialized row kept up to date by app.services.compiled_context,
+    compiling on the fly only if it has not been backfilled yet. When the shop's
+    business context has been ingested into knowledge chunks, only the chunks
+    most relevant to query are appended instead of the whole text.
+    """
+    with observe_phase("context"), tracer.start_as_current_span("build_full_context") as span:
+        span.set_attribute("shop.id", str(shop_id))
+        
+        compiled = get_compiled_context(db, shop_id)
+        if compiled is not None:
+            context, uses_knowledge = compiled.context, compiled.uses_knowledge
+        else:
+            span.set_attribute("context.materialized", False)
+            fresh = compile_static_context(db, shop_id)
+            if fresh is None:
+                return ""
+            context, uses_knowledge = fresh
+        
+        if uses_knowledge:
+            relevant_chunks = retrieve_relevant_chunks(db, shop_id, query)
+            if relevant_chunks is None:
+                # Compiled before an embedder switch left its chunks unusable; recompile so
+                # the raw user context is included until `python -m app.cli reindex-knowledge`
+                span.set_attribute("context.knowledge_stale", True)
+                fresh = compile_static_context(db, shop_id)
+                return fresh[0] if fresh else ""
+            if relevant_chunks:
+                context += "\n\nAdditional Business Context (most relevant excerpts):\n" + "\n\n".join(relevant_chunks)
+        
+        return context
\ No newline at end of file
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import secrets
+from typing import Dict, List, Optional, Set
+from uuid import UUID
+
+from opentelemetry.propagate import extract
+
+from app.core.config import settings
+from app.core.tracing import tracer
+from app.db import read_session
+from app.services.chat import ChatGenerationError, ChatResult, stream_chat_response
+from app.services.chat_config import get_shop_by_id
+from app.services.transcripts import transcript_writer
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSession:
+    """
+    Server-side state of one visitor conversation over the widget WebSocket.
+
+    The reply being generated is buffered as a list of deltas so that a
+    reconnecting client can pick up from the last piece it received. Each
+    open connection registers an asyncio.Event that is set on every change.
+    """
+
+    def __init__(self, session_id: str, shop_id: UUID, history: List[Dict[str, str]]):
+        self.id = session_id
+        self.shop_id = shop_id
+        self.history = history
+        self.turn = 0
+        self.deltas: List[str] = []
+        self.error: Optional[str] = None
+        self.generation: Optional[asyncio.Task] = None
+        self.listeners: Set[asyncio.Event] = set()
+        self._expiry: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def busy(self) -> bool:
+        return self.generation is not None and not self.generation.done()
+
+    def _notify(self) -> None:
+        for listener in self.listeners:
+            listener.set()
+
+    def start_turn(self, content: str, traceparent: Optional[str] = None) -> None:
+        self.history.append({"role": "user", "content": content})
+        self.turn += 1
+        self.deltas = []
+        self.error = None
+        messages = self.history[-settings.ws_max_history_messages:]
+        self.generation = asyncio.ensure_future(self._run_turn(messages, traceparent))
+        self._notify()
+
+    async def _run_turn(self, messages: List[Dict[str, str]], traceparent: Optional[str]) -> None:
+        parent = extract({"traceparent": traceparent}) if traceparent else None
+        db = read_session()
+        result = ChatResult()
+        try:
+            with tracer.start_as_current_span("chat.ws_turn", context=parent) as span:
+                span.set_attribute("shop.id", str(self.shop_id))
+                shop = get_shop_by_id(db, self.shop_id)
+                if not shop:
+                    raise ChatGenerationError("Shop not found")
+                async for delta in stream_chat_response(db, shop, messages, result):
+                    self.deltas.append(delta)
+                    self._notify()
+            self.history.append({"role": "assistant", "content": "".join(self.deltas)})
+            transcript_writer.record(self.shop_id, self.id, self.turn, "ws", messages[-1]["content"], result)
+        except ChatGenerationError as e:
+            self.error = str(e)
+        except Exception:
+            logger.exception("WebSocket chat turn failed for shop %s", self.shop_id)
+            self.error = "Failed to generate response"
+        finally:
+            db.close()
+            self._notify()
+
+
+_sessions: Dict[str, ChatSession] = {}
+
+
+def attach_session(
+    shop_id: UUID,
+    session_id: Optional[str],
+    history: List[Dict[str, str]],
+    listener: asyncio.Event
+) -> Optional[ChatSession]:
+    """
+    Resume the visitor's session if this worker still holds it, otherwise
+    start a new one seeded with the client's history.
+
+    Returns None when the worker is at its session limit.
+    """
+    session = _sessions.get(session_id) if session_id else None
+    if session is None or session.shop_id != shop_id:
+        if len(_sessions) >= settings.ws_max_sessions:
+            return None
+        session = ChatSession(secrets.token_urlsafe(16), shop_id, history[-settings.ws_max_history_messages:])
+        _sessions[session.id] = session
+
+    if session._expiry is not None:
+        session._expiry.cancel()
+        session._expiry = None
+    session.listeners.add(listener)
+    return session
+
+
+def detach_session(session: ChatSession, listener: asyncio.Event) -> None:
+    """Forget a closed connection; the session is kept for a grace period so the client can resume"""
+    session.listeners.discard(listener)
+    if not session.listeners and session._expiry is None:
+        session._expiry = asyncio.get_running_loop().call_later(
+            settings.ws_resume_grace, _expire_session, session.id
+        )
+
+
+def _expire_session(session_id: str) -> None:
+    session = _sessions.pop(session_id, None)
+    if session is None:
+        return
+    # Nobody came back for the reply, so stop paying for it
+    if session.busy:
+        session.generation.cancel()
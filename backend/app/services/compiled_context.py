@@ -0,0 +1,223 @@
+import hashlib
+import itertools
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.db import SessionLocal
+from app.models.chat_config import ChatConfig, CompiledContext
+from app.models.faq import FAQ
+from app.models.knowledge import KnowledgeDocument
+from app.models.service import Service
+from app.models.shop import Shop
+from app.services.knowledge import has_knowledge
+
+# Writes to any of these mark the owning shop's compiled context for rebuild
+_CONTEXT_SOURCES = (Shop, Service, FAQ, ChatConfig, KnowledgeDocument)
+_DIRTY_KEY = "compiled_context_dirty_shops"
+
+
+def compile_static_context(db: Session, shop_id: UUID) -> Optional[Tuple[str, bool]]:
+    """
+    Assemble the question-independent part of the prompt from the shop,
+    services, FAQs and chat config.
+    
+    Returns (context, uses_knowledge), or None when the shop has no chat config.
+    """
+    chat_config = db.query(ChatConfig).filter(ChatConfig.shop_id == shop_id).first()
+    if not chat_config:
+        return None
+    
+    # Get shop details
+    shop = db.query(Shop).filter(Shop.id == shop_id).first()
+    if not shop:
+        return None
+    
+    # Start with system prompt but customize it with shop name
+    base_prompt = chat_config.system_prompt
+    if shop.business_name:
+        customized_prompt = base_prompt.replace(
+            "a service business", 
+            f"{shop.business_name}"
+        ).replace(
+            "the business",
+            f"{shop.business_name}"
+        )
+    else:
+        customized_prompt = base_prompt
+    
+    context_parts = [customized_prompt]
+    
+    # Add shop information
+    shop_info = f"\nBusiness Information:\n"
+    shop_info += f"Business Name: {shop.business_name}\n"
+    if shop.description:
+        shop_info += f"Description: {shop.description}\n"
+    if shop.website:
+        shop_info += f"Website: {shop.website}\n"
+    if shop.email:
+        shop_info += f"Email: {shop.email}\n"
+    if shop.phone_number:
+        shop_info += f"Phone: {shop.phone_number}\n"
+    context_parts.append(shop_info)
+    
+    # Add user context if available; once ingested into knowledge chunks it is
+    # retrieved per question instead (see build_full_context)
+    uses_knowledge = has_knowledge(db, shop_id)
+    if chat_config.user_context and not uses_knowledge:
+        context_parts.append(f"\nAdditional Business Context:\n{chat_config.user_context}")
+    
+    # Add services
+    services = db.query(Service).filter(Service.shop_id == shop_id).all()
+    if services:
+        services_text = "\nServices We Offer:\n"
+        for service in services:
+            services_text += f"- {service.name}: ${service.price} ({service.duration_minutes} minutes)"
+            if service.description:
+                services_text += f" - {service.description}"
+            services_text += "\n"
+        context_parts.append(services_text)
+    else:
+        context_parts.append("\nNote: No specific services have been configured yet. Please ask the customer to contact us directly for service information.")
+    
+    # Add FAQs
+    faqs = db.query(FAQ).filter(FAQ.shop_id == shop_id).all()
+    if faqs:
+        faqs_text = "\nFrequently Asked Questions:\n"
+        for faq in faqs:
+            faqs_text += f"Q: {faq.question}\nA: {faq.answer}\n\n"
+        context_parts.append(faqs_text)
+    
+    return "\n".join(context_parts), uses_knowledge
+
+
+def hash_context(context: str, uses_knowledge: bool) -> str:
+    return hashlib.sha256(f"{int(uses_knowledge)}:{context}".encode("utf-8")).hexdigest()
+
+
+def lock_shop_derived_state(db: Session, shop_id: UUID) -> None:
+    """
+    Serialize, until the transaction ends, the commit-time work that derives
+    per-shop state from the shop's rows (compiled context, sync version).
+    Take it before touching any derived row so writers queue in one order.
+    """
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:shop_id))"), {"shop_id": str(shop_id)})
+
+
+def get_compiled_context(db: Session, shop_id: UUID) -> Optional[CompiledContext]:
+    return db.query(CompiledContext).filter(CompiledContext.shop_id == shop_id).first()
+
+
+def refresh_compiled_context(db: Session, shop_id: UUID) -> None:
+    """
+    Recompile and upsert a shop's context within the caller's transaction.
+    
+    The version is only bumped when the content hash changes, and the upsert
+    keeps concurrent writers from racing on the first insert. Writers of the
+    same shop compile one at a time: under READ COMMITTED each statement
+    after the lock sees the previous writer's committed changes, so the last
+    commit cannot store a context that misses an earlier one.
+    """
+    lock_shop_derived_state(db, shop_id)
+    compiled = compile_static_context(db, shop_id)
+    if compiled is None:
+        db.query(CompiledContext).filter(CompiledContext.shop_id == shop_id).delete(synchronize_session=False)
+        return
+    
+    context, uses_knowledge = compiled
+    content_hash = hash_context(context, uses_knowledge)
+    statement = insert(CompiledContext).values(
+        shop_id=shop_id,
+        version=1,
+        content_hash=content_hash,
+        context=context,
+        uses_knowledge=uses_knowledge
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[CompiledContext.shop_id],
+        set_={
+            "version": CompiledContext.version + 1,
+            "content_hash": statement.excluded.content_hash,
+            "context": statement.excluded.context,
+            "uses_knowledge": statement.excluded.uses_knowledge,
+            "compiled_at": func.now(),
+        },
+        where=CompiledContext.content_hash != statement.excluded.content_hash
+    )
+    db.execute(statement)
+
+
+def _shop_id_of(instance) -> Optional[UUID]:
+    return instance.id if isinstance(instance, Shop) else instance.shop_id
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _collect_changed_shops(session, flush_context, instances):
+    dirty_shops = session.info.setdefault(_DIRTY_KEY, set())
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, _CONTEXT_SOURCES):
+            shop_id = _shop_id_of(instance)
+            if shop_id is not None:
+                dirty_shops.add(shop_id)
+    
+    # The materialized row references the shop, so it has to go first
+    for instance in session.deleted:
+        if isinstance(instance, Shop):
+            session.query(CompiledContext).filter(
+                CompiledContext.shop_id == instance.id
+            ).delete(synchronize_session=False)
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _refresh_changed_contexts(session):
+    session.flush()
+    dirty_shops = session.info.pop(_DIRTY_KEY, None)
+    if not dirty_shops:
+        return
+    # Sorted so transactions touching several shops take the locks in one order
+    for shop_id in sorted(dirty_shops, key=str):
+        refresh_compiled_context(session, shop_id)
+    session.flush()
+    session.info.pop(_DIRTY_KEY, None)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _forget_changed_shops(session, previous_transaction):
+    session.info.pop(_DIRTY_KEY, None)
+
+
+def backfill_compiled_contexts(db: Session, shop_ids: Optional[List[UUID]] = None) -> int:
+    """Compile and store contexts for the given shops (default: every shop with a chat config)"""
+    if shop_ids is None:
+        shop_ids = [row.shop_id for row in db.query(ChatConfig.shop_id).all()]
+    for shop_id in shop_ids:
+        refresh_compiled_context(db, shop_id)
+        db.commit()
+    return len(shop_ids)
+
+
+def find_inconsistent_contexts(db: Session) -> List[Dict]:
+    """
+    Compare every materialized row with a fresh compile.
+    
+    Reports shops whose row is missing, stale (hash differs) or orphaned
+    (row exists but the shop no longer has a chat config).
+    """
+    problems = []
+    stored = {row.shop_id: row for row in db.query(CompiledContext).all()}
+    for (shop_id,) in db.query(ChatConfig.shop_id).all():
+        compiled = compile_static_context(db, shop_id)
+        row = stored.pop(shop_id, None)
+        if compiled is None:
+            continue
+        if row is None:
+            problems.append({"shop_id": shop_id, "status": "missing"})
+        elif row.content_hash != hash_context(*compiled):
+            problems.append({"shop_id": shop_id, "status": "stale", "version": row.version})
+    for shop_id, row in stored.items():
+        problems.append({"shop_id": shop_id, "status": "orphaned", "version": row.version})
+    return problems
\ No newline at end of file
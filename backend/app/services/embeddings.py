@@ -0,0 +1,79 @@
+import hashlib
+import re
+from functools import lru_cache
+from typing import Dict, List, Type
+
+import numpy as np
+from openai import OpenAI
+
+from app.core.config import settings
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class Embedder:
+    """Interface for turning text into L2-normalized float32 vectors"""
+
+    name: str = ""
+    dim: int = 0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic offline embedder using signed feature hashing of unigrams
+    and bigrams. No network or model files, identical output on every worker.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN_RE.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dim] += sign
+        return _normalize(vectors)
+
+
+class OpenAIEmbedder(Embedder):
+    def __init__(self, dim: int):
+        self.model = settings.embedding_openai_model
+        self.name = f"openai-{self.model}"
+        self.dim = dim
+        self._client = OpenAI(api_key=settings.openai_api_key)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        response = self._client.embeddings.create(model=self.model, input=texts)
+        vectors = np.array([item.embedding for item in response.data], dtype=np.float32)
+        self.dim = vectors.shape[1]
+        return _normalize(vectors)
+
+
+EMBEDDERS: Dict[str, Type[Embedder]] = {
+    "hashing": HashingEmbedder,
+    "openai": OpenAIEmbedder,
+}
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+@lru_cache(maxsize=1)
+def get_embedder() -> Embedder:
+    return EMBEDDERS[settings.embedder](settings.embedding_dim)
\ No newline at end of file
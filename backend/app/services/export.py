@@ -0,0 +1,175 @@
+import enum
+import io
+import json
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import LargeBinary, Table, select
+from sqlalchemy.orm import Session
+
+from app.db import read_session
+from app.models.chat_config import ChatConfig, ChatWidgetConfig
+from app.models.faq import FAQ
+from app.models.knowledge import KnowledgeDocument
+from app.models.service import Service
+from app.models.shop import Shop
+from app.models.subscription import Subscription
+from app.models.transcript import ChatTranscript
+from app.models.usage import ShopUsage
+
+EXPORT_FORMATS = ("ndjson", "zip")
+
+_BATCH_SIZE = 1000
+
+
+class ExportSection(NamedTuple):
+    name: str
+    table: Table
+    # Column the owner's rows are selected by: "owner_id" or "shop_id"
+    owner_column: str
+
+
+# Written in this order; the position is part of the resume cursor, so only append
+SECTIONS: List[ExportSection] = [
+    ExportSection("shops", Shop.__table__, "owner_id"),
+    ExportSection("subscriptions", Subscription.__table__, "owner_id"),
+    ExportSection("chat_configs", ChatConfig.__table__, "shop_id"),
+    ExportSection("widget_configs", ChatWidgetConfig.__table__, "shop_id"),
+    ExportSection("services", Service.__table__, "shop_id"),
+    ExportSection("faqs", FAQ.__table__, "shop_id"),
+    ExportSection("knowledge_documents", KnowledgeDocument.__table__, "shop_id"),
+    ExportSection("usage", ShopUsage.__table__, "shop_id"),
+    ExportSection("chat_transcripts", ChatTranscript.__table__, "shop_id"),
+]
+
+
+def parse_export_cursor(cursor: str) -> Tuple[int, UUID]:
+    """A cursor is "<section position>:<last exported id>"; raises ValueError when malformed"""
+    position, _, last_id = cursor.partition(":")
+    index = int(position)
+    if not 0 <= index < len(SECTIONS):
+        raise ValueError("Unknown export section")
+    return index, UUID(last_id)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _encode(record) -> bytes:
+    return json.dumps(record, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+def _iter_rows(db: Session, section: ExportSection, owner_id: UUID, after_id: Optional[UUID]):
+    table = section.table
+    # Binary columns (none exported today) would not survive JSON
+    columns = [column for column in table.c if not isinstance(column.type, LargeBinary)]
+    if section.owner_column == "owner_id":
+        condition = table.c.owner_id == owner_id
+    else:
+        owned_shops = select(Shop.__table__.c.id).where(Shop.__table__.c.owner_id == owner_id)
+        condition = table.c.shop_id.in_(owned_shops.scalar_subquery())
+    statement = select(*columns).where(condition)
+    if after_id is not None:
+        statement = statement.where(table.c.id > after_id)
+    # Keyset order on id makes a cursor a stable resume point; yield_per streams
+    # through a server-side cursor instead of loading the section
+    statement = statement.order_by(table.c.id).execution_options(yield_per=_BATCH_SIZE)
+    for row in db.execute(statement):
+        yield row._asdict()
+
+
+def iter_export_records(db: Session, owner_id: UUID, after: Optional[str] = None) -> Iterator[Tuple[int, dict]]:
+    """(section position, row) pairs for everything held about the owner, resuming after a cursor"""
+    start, after_id = parse_export_cursor(after) if after else (0, None)
+    for index in range(start, len(SECTIONS)):
+        for row in _iter_rows(db, SECTIONS[index], owner_id, after_id if index == start else None):
+            yield index, row
+
+
+def iter_ndjson_export(db: Session, owner_id: UUID, after: Optional[str] = None) -> Iterator[bytes]:
+    """
+    One JSON object per line: {"type": section, "cursor": ..., "data": row}.
+    A client that loses the connection passes the cursor of the last complete
+    line back as `after` to continue from the next row.
+    """
+    buffer = bytearray()
+    for index, row in iter_export_records(db, owner_id, after):
+        buffer += _encode({"type": SECTIONS[index].name, "cursor": f"{index}:{row['id']}", "data": row})
+        if len(buffer) >= 64 * 1024:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable file object that hands written bytes back to the generator"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip_export(db: Session, owner_id: UUID) -> Iterator[bytes]:
+    """A zip with one NDJSON file per section, written as it is read"""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        current, entry = None, None
+        for index, row in iter_export_records(db, owner_id):
+            if index != current:
+                if entry is not None:
+                    entry.close()
+                current = index
+                entry = archive.open(f"{SECTIONS[index].name}.ndjson", mode="w", force_zip64=True)
+            entry.write(_encode(row))
+            data = sink.drain()
+            if data:
+                yield data
+        if entry is not None:
+            entry.close()
+    yield sink.drain()
+
+
+def stream_export(owner_id: UUID, export_format: str, after: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Export generator for a streaming response. It owns its session, so the
+    export outlives the request's dependencies, and reads in one REPEATABLE
+    READ transaction so every section comes from the same snapshot.
+    """
+    db = read_session()
+    try:
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        if export_format == "zip":
+            yield from iter_zip_export(db, owner_id)
+        else:
+            yield from iter_ndjson_export(db, owner_id, after)
+    finally:
+        db.close()
@@ -1,9 +1,11 @@
 from uuid import UUID
-from typing import List, Optional
+from typing import Dict, List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.models.faq import FAQ
 from app.models.shop import Shop
+from app.services.faq_index import invalidate_faq_index
 
 
 def get_shop_by_owner(db: Session, owner_id: UUID) -> Optional[Shop]:
@@ -14,6 +16,12 @@ def get_faqs_by_shop(db: Session, shop_id: UUID) -> List[FAQ]:
     return db.query(FAQ).filter(FAQ.shop_id == shop_id).all()
 
 
+def get_faq_rows_by_shop(db: Session, shop_id: UUID) -> List[Dict]:
+    """The shop's FAQs as plain dicts, for list responses that skip ORM objects and Pydantic"""
+    table = FAQ.__table__
+    return [dict(row) for row in db.execute(select(table).where(table.c.shop_id == shop_id)).mappings()]
+
+
 def get_faq_by_id(db: Session, faq_id: UUID, shop_id: UUID) -> Optional[FAQ]:
     return db.query(FAQ).filter(
         FAQ.id == faq_id, 
@@ -29,6 +37,7 @@ def create_faq(db: Session, faq_data: dict, shop_id: UUID) -> FAQ:
     db.add(faq)
     db.commit()
     db.refresh(faq)
+    invalidate_faq_index(shop_id)
     return faq
 
 
@@ -38,9 +47,12 @@ def update_faq(db: Session, faq: FAQ, faq_data: dict) -> FAQ:
     
     db.commit()
     db.refresh(faq)
+    invalidate_faq_index(faq.shop_id)
     return faq
 
 
 def delete_faq(db: Session, faq: FAQ) -> None:
+    shop_id = faq.shop_id
     db.delete(faq)
-    db.commit()
\ No newline at end of file
+    db.commit()
+    invalidate_faq_index(shop_id)
\ No newline at end of file
@@ -0,0 +1,211 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import SessionLocal
+from app.models.faq import FAQ
+from app.models.shop import Shop
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Longest word prefix kept in the typeahead index; longer input is truncated
+MAX_PREFIX = 12
+
+STOPWORDS = frozenset({
+    "a", "an", "the", "is", "are", "do", "does", "you", "your", "i", "me", "my",
+    "we", "our", "to", "of", "for", "on", "in", "at", "it", "can", "could",
+    "would", "please", "what", "and", "or", "be", "with", "there", "any",
+})
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """Lowercase, strip punctuation and drop filler words"""
+    return [word for word in _WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    padded = f"  {' '.join(_WORD_RE.findall(text.lower()))} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+@dataclass(frozen=True)
+class FAQEntry:
+    id: UUID
+    question: str
+    answer: str
+    normalized: str
+    tokens: FrozenSet[str]
+    trigrams: FrozenSet[str]
+
+
+class FAQIndex:
+    """
+    Immutable in-memory index over one shop's FAQ questions.
+
+    Candidates are gathered through an inverted trigram index and scored by a
+    blend of token Jaccard and trigram Dice similarity, which tolerates typos
+    and reordered words while keeping lookups well under a millisecond.
+    """
+
+    def __init__(self, faqs: List[FAQ]):
+        self.entries: List[FAQEntry] = []
+        self._by_trigram: Dict[str, List[int]] = {}
+        self._by_prefix: Dict[str, Set[int]] = {}
+        for faq in faqs:
+            tokens = normalize_tokens(faq.question)
+            entry = FAQEntry(
+                id=faq.id,
+                question=faq.question,
+                answer=faq.answer,
+                normalized=" ".join(_WORD_RE.findall(faq.question.lower())),
+                tokens=frozenset(tokens),
+                trigrams=trigrams(faq.question),
+            )
+            position = len(self.entries)
+            self.entries.append(entry)
+            for gram in entry.trigrams:
+                self._by_trigram.setdefault(gram, []).append(position)
+            for word in entry.normalized.split(" "):
+                for size in range(1, min(len(word), MAX_PREFIX) + 1):
+                    self._by_prefix.setdefault(word[:size], set()).add(position)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _candidates(self, grams: FrozenSet[str]) -> Dict[int, int]:
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for position in self._by_trigram.get(gram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        return shared
+
+    @staticmethod
+    def _score(entry: FAQEntry, tokens: FrozenSet[str], grams: FrozenSet[str], shared: int) -> float:
+        dice = 2 * shared / (len(grams) + len(entry.trigrams))
+        union = tokens | entry.tokens
+        jaccard = len(tokens & entry.tokens) / len(union) if union else 0.0
+        return 0.6 * dice + 0.4 * jaccard
+
+    def suggest(self, query: str, limit: int) -> List[FAQEntry]:
+        """
+        Rank questions for typeahead: word-prefix matches on the normalized
+        question first, then fuzzy trigram matches for typos.
+        """
+        normalized = " ".join(_WORD_RE.findall(query.lower()))
+        if not normalized or not self.entries:
+            return []
+
+        scored: Dict[int, float] = {}
+        words = normalized.split(" ")
+        complete_words = frozenset(word for word in words[:-1] if word not in STOPWORDS)
+        for position in self._by_prefix.get(words[-1][:MAX_PREFIX], ()):
+            entry = self.entries[position]
+            if entry.normalized.startswith(normalized):
+                scored[position] = 2.0
+            elif complete_words <= entry.tokens:
+                scored[position] = 1.0 + len(complete_words) / (len(entry.tokens) or 1)
+
+        if len(scored) < limit and len(normalized) >= 3:
+            # Fuzzy fallback: share of the typed trigrams found in the question
+            grams = trigrams(query)
+            for position, shared in self._candidates(grams).items():
+                containment = shared / len(grams)
+                if position not in scored and containment >= 0.5:
+                    scored[position] = containment
+
+        ranked = sorted(scored.items(), key=lambda item: (-item[1], len(self.entries[item[0]].question)))
+        return [self.entries[position] for position, _ in ranked[:limit]]
+
+    def best_match(self, text: str) -> Optional[Tuple[FAQEntry, float]]:
+        grams = trigrams(text)
+        if not self.entries or len(grams) < 2:
+            return None
+        tokens = frozenset(normalize_tokens(text))
+        best: Optional[Tuple[FAQEntry, float]] = None
+        for position, shared in self._candidates(grams).items():
+            entry = self.entries[position]
+            score = self._score(entry, tokens, grams, shared)
+            if best is None or score > best[1]:
+                best = (entry, score)
+        return best
+
+
+# In build order, so the least recently built index is evicted first
+_indexes: "OrderedDict[UUID, Tuple[FAQIndex, float]]" = OrderedDict()
+_refreshing: Set[UUID] = set()
+_lock = threading.Lock()
+
+
+def get_cached_faq_index(shop_id: UUID, allow_stale: bool = False) -> Optional[FAQIndex]:
+    """Return the shop's index if this worker holds a copy, without touching the DB"""
+    cached = _indexes.get(shop_id)
+    if cached is None:
+        return None
+    if allow_stale or time.monotonic() - cached[1] < settings.faq_index_ttl:
+        return cached[0]
+    return None
+
+
+def is_faq_index_stale(shop_id: UUID) -> bool:
+    cached = _indexes.get(shop_id)
+    return cached is None or time.monotonic() - cached[1] >= settings.faq_index_ttl
+
+
+def get_faq_index(db: Session, shop_id: UUID) -> FAQIndex:
+    """
+    Return the shop's FAQ index, building it from the database on first use.
+
+    Writes through services/faq.py invalidate the local copy immediately; the
+    TTL bounds how long other workers can serve a stale index.
+    """
+    cached = get_cached_faq_index(shop_id)
+    if cached is not None:
+        return cached
+
+    return rebuild_faq_index(db, shop_id)
+
+
+def rebuild_faq_index(db: Session, shop_id: UUID) -> FAQIndex:
+    index = FAQIndex(db.query(FAQ).filter(FAQ.shop_id == shop_id).all())
+    # An empty index is only cached for a shop that exists, so made-up ids
+    # cannot push real shops out of the cache
+    if not index.entries and db.query(Shop.id).filter(Shop.id == shop_id).first() is None:
+        return index
+    with _lock:
+        _indexes[shop_id] = (index, time.monotonic())
+        _indexes.move_to_end(shop_id)
+        while len(_indexes) > settings.faq_index_max_shops:
+            _indexes.popitem(last=False)
+    return index
+
+
+def invalidate_faq_index(shop_id: UUID) -> None:
+    with _lock:
+        _indexes.pop(shop_id, None)
+
+
+def refresh_faq_index(shop_id: UUID) -> FAQIndex:
+    """Rebuild a shop's index with a short-lived session (for use off the request path)"""
+    db = SessionLocal()
+    try:
+        return rebuild_faq_index(db, shop_id)
+    finally:
+        db.close()
+        with _lock:
+            _refreshing.discard(shop_id)
+
+
+def claim_faq_index_refresh(shop_id: UUID) -> bool:
+    """Single-flight guard so a stale index is only rebuilt once per worker"""
+    with _lock:
+        if shop_id in _refreshing:
+            return False
+        _refreshing.add(shop_id)
+        return True
\ No newline at end of file
@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+from uuid import UUID, uuid4
+
+from prometheus_client import Counter
+from sqlalchemy import delete, func, null, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+from app.db import engine
+from app.models.idempotency import IdempotencyKey
+from app.services.chat import ChatResult
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+IDEMPOTENT_REQUESTS = Counter(
+    "chat_idempotent_requests_total",
+    "Chat turns sent with an idempotency key, by outcome (new, attached, replayed, conflict)",
+    ["outcome"],
+)
+
+
+class IdempotencyConflict(Exception):
+    """The idempotency key was already used with a different request body"""
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Hash of the request body a key is bound to"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+RUNNING = "running"
+DONE = "done"
+
+_table = IdempotencyKey.__table__
+_COLUMNS = (_table.c.claim_id, _table.c.fingerprint, _table.c.status, _table.c.result)
+_last_purge = 0.0
+
+
+def _purge_expired() -> None:
+    """Delete rows nobody can replay or is still running, at most once per idempotency_ttl"""
+    global _last_purge
+    if time.monotonic() - _last_purge < settings.idempotency_ttl:
+        return
+    _last_purge = time.monotonic()
+    with engine.begin() as conn:
+        conn.execute(delete(_table).where(_table.c.expires_at < func.now()))
+
+
+def _claim(scope: str, key: str, fingerprint: str, claim_id: UUID) -> Optional[Row]:
+    """
+    Claim the key for claim_id, taking over a row that has expired. Returns
+    the row as it stands, whoever holds it, or None if its holder released
+    it in the meantime.
+    """
+    _purge_expired()
+    statement = insert(_table).values(
+        scope=scope,
+        key=key,
+        fingerprint=fingerprint,
+        claim_id=claim_id,
+        status=RUNNING,
+        expires_at=func.now() + timedelta(seconds=settings.idempotency_claim_timeout)
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[_table.c.scope, _table.c.key],
+        set_={
+            "fingerprint": statement.excluded.fingerprint,
+            "claim_id": statement.excluded.claim_id,
+            "status": RUNNING,
+            "result": null(),
+            "expires_at": statement.excluded.expires_at,
+            "created_at": func.now(),
+        },
+        where=_table.c.expires_at < func.now()
+    ).returning(*_COLUMNS)
+    with engine.begin() as conn:
+        row = conn.execute(statement).first()
+        if row is None:
+            row = conn.execute(select(*_COLUMNS).where(_table.c.scope == scope, _table.c.key == key)).first()
+        return row
+
+
+def _complete(scope: str, key: str, claim_id: UUID, result: Dict) -> None:
+    with engine.begin() as conn:
+        conn.execute(update(_table).where(
+            _table.c.scope == scope, _table.c.key == key, _table.c.claim_id == claim_id
+        ).values(status=DONE, result=result, expires_at=func.now() + timedelta(seconds=settings.idempotency_ttl)))
+
+
+def _release(scope: str, key: str, claim_id: UUID) -> None:
+    with engine.begin() as conn:
+        conn.execute(delete(_table).where(
+            _table.c.scope == scope, _table.c.key == key, _table.c.claim_id == claim_id
+        ))
+
+
+async def _record(write: Callable[..., None], *args) -> None:
+    try:
+        await asyncio.to_thread(write, *args)
+    except SQLAlchemyError as e:
+        # The claim then expires after idempotency_claim_timeout and a retry runs the turn again
+        logger.warning("Could not update idempotency key: %r", e)
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    task: asyncio.Task
+    waiters: int = 0
+    # Set once the work has succeeded; failed work is forgotten so a retry runs it again
+    expires_at: Optional[float] = None
+    cancel_timer: Optional[asyncio.TimerHandle] = None
+
+
+class IdempotencyStore:
+    """
+    Deduplication of chat turns by client-supplied key, shared by all workers.
+
+    The first request for a key claims it in the idempotency_keys table and
+    starts the work as its own task; retries with the same key and body wait
+    for that work while it runs, on whichever worker they land, and get its
+    result for idempotency_ttl seconds after it succeeds. Failed work
+    releases the claim, so a retry runs it again.
+
+    Each worker also keeps the entries it has seen in memory as a fast path:
+    a retry reaching the same worker attaches to the running task or gets
+    the stored result without a query. A retry on another worker polls the
+    row every idempotency_poll_interval seconds until the result is there. A
+    claim still running after idempotency_claim_timeout is assumed lost with
+    its worker and taken over by the next retry. When the database cannot
+    be reached the work runs anyway, deduplicated only within the worker.
+
+    A requester that disconnects does not cancel the work; it is cancelled
+    only once nobody on this worker has been waiting for
+    idempotency_abandon_grace seconds, which leaves a retry on a flaky
+    connection time to attach. The work must not use the request's database
+    session, which is closed when the request ends. Results are stored with
+    encode and read back with decode.
+    """
+
+    def __init__(self, encode: Callable[[Any], Dict], decode: Callable[[Dict], Any]):
+        self._encode = encode
+        self._decode = decode
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+
+    def _lookup(self, entry_key: Tuple[str, str]) -> Optional[_Entry]:
+        entry = self._entries.get(entry_key)
+        if entry is not None and entry.expires_at is not None and entry.expires_at <= time.monotonic():
+            del self._entries[entry_key]
+            return None
+        return entry
+
+    def _on_done(self, entry_key: Tuple[str, str], entry: _Entry, task: asyncio.Task) -> None:
+        if entry.cancel_timer is not None:
+            entry.cancel_timer.cancel()
+            entry.cancel_timer = None
+        if task.cancelled() or task.exception() is not None:
+            if self._entries.get(entry_key) is entry:
+                del self._entries[entry_key]
+        else:
+            entry.expires_at = time.monotonic() + settings.idempotency_ttl
+
+    async def _claim_and_run(
+        self,
+        scope: str,
+        key: str,
+        fingerprint: str,
+        work: Callable[[], Awaitable[T]]
+    ) -> Tuple[T, bool]:
+        """Run work under a claim on the shared row, or wait for the worker holding it"""
+        claim_id = uuid4()
+        waiting = False
+        while True:
+            try:
+                row = await asyncio.to_thread(_claim, scope, key, fingerprint, claim_id)
+            except SQLAlchemyError as e:
+                logger.warning("Idempotency keys unavailable, running the turn without a claim: %r", e)
+                IDEMPOTENT_REQUESTS.labels("new").inc()
+                return await work(), False
+            if row is None:
+                # Released by a failed attempt just now; claim it
+                continue
+            if row.claim_id == claim_id:
+                break
+            if row.fingerprint != fingerprint:
+                IDEMPOTENT_REQUESTS.labels("conflict").inc()
+                raise IdempotencyConflict()
+            if row.status == DONE:
+                if not waiting:
+                    IDEMPOTENT_REQUESTS.labels("replayed").inc()
+                return self._decode(row.result), True
+            if not waiting:
+                IDEMPOTENT_REQUESTS.labels("attached").inc()
+                waiting = True
+            await asyncio.sleep(settings.idempotency_poll_interval)
+
+        IDEMPOTENT_REQUESTS.labels("new").inc()
+        try:
+            result = await work()
+        except BaseException:
+            # Also when abandoned: forget the claim so a retry runs the work again
+            await _record(_release, scope, key, claim_id)
+            raise
+        await _record(_complete, scope, key, claim_id, self._encode(result))
+        return result, False
+
+    async def run(
+        self,
+        scope: str,
+        key: str,
+        fingerprint: str,
+        work: Callable[[], Awaitable[T]]
+    ) -> Tuple[T, bool]:
+        """
+        Run work once per (scope, key). Returns (result, replayed), where
+        replayed is True when the result came from an earlier request.
+        Raises IdempotencyConflict when the key was used with another body.
+        """
+        entry_key = (scope, key)
+        entry = self._lookup(entry_key)
+        if entry is not None and entry.fingerprint != fingerprint:
+            IDEMPOTENT_REQUESTS.labels("conflict").inc()
+            raise IdempotencyConflict()
+
+        if entry is None:
+            replayed = False
+            entry = _Entry(fingerprint, asyncio.ensure_future(self._claim_and_run(scope, key, fingerprint, work)))
+            entry.task.add_done_callback(lambda task, entry=entry: self._on_done(entry_key, entry, task))
+            self._entries[entry_key] = entry
+            while len(self._entries) > settings.idempotency_max_entries:
+                # An evicted in-flight turn still completes for its own requesters
+                self._entries.popitem(last=False)
+        else:
+            replayed = True
+            self._entries.move_to_end(entry_key)
+            IDEMPOTENT_REQUESTS.labels("replayed" if entry.task.done() else "attached").inc()
+
+        if entry.cancel_timer is not None:
+            entry.cancel_timer.cancel()
+            entry.cancel_timer = None
+        entry.waiters += 1
+        try:
+            result, from_elsewhere = await asyncio.shield(entry.task)
+            return result, replayed or from_elsewhere
+        finally:
+            entry.waiters -= 1
+            if entry.waiters == 0 and not entry.task.done():
+                entry.cancel_timer = asyncio.get_running_loop().call_later(
+                    settings.idempotency_abandon_grace, entry.task.cancel
+                )
+
+
+chat_idempotency = IdempotencyStore(encode=asdict, decode=lambda result: ChatResult(**result))
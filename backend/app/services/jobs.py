@@ -0,0 +1,266 @@
+import asyncio
+import inspect
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Union
+from uuid import UUID
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import func, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.tracing import tracer
+from app.db import engine
+from app.models.job import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+JOBS = Counter(
+    "jobs_total",
+    "Finished job attempts by kind and outcome (succeeded, retried, dead, lease_lost)",
+    ["kind", "outcome"],
+)
+
+JOB_DURATION = Histogram(
+    "job_duration_seconds",
+    "Time spent running one job attempt",
+    ["kind"],
+)
+
+JOB_START_LAG = Histogram(
+    "job_start_lag_seconds",
+    "Delay between a job becoming due and a worker starting it",
+    ["kind"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900),
+)
+
+JOB_QUEUE_DEPTH = Gauge(
+    "jobs_queue_depth",
+    "Jobs in the table by status (queued includes jobs scheduled for later)",
+    ["status"],
+    multiprocess_mode="max",
+)
+
+JobHandler = Callable[[Dict], Union[None, Awaitable[None]]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def register_job_handler(kind: str, handler: JobHandler) -> None:
+    """
+    Handlers take the job payload and raise to have the job retried. They
+    may be coroutine functions or plain functions (run in a thread) and
+    must be safe to run more than once.
+    """
+    _handlers[kind] = handler
+
+
+def enqueue_job(
+    db: Session,
+    kind: str,
+    payload: Dict,
+    run_at: Optional[datetime] = None,
+    max_attempts: Optional[int] = None
+) -> Job:
+    """Add a job to the caller's transaction; it runs once that commits, no earlier than run_at"""
+    job = Job(kind=kind, payload=payload, max_attempts=max_attempts or settings.job_max_attempts)
+    if run_at is not None:
+        job.run_at = run_at
+    db.add(job)
+    return job
+
+
+def _backoff_seconds(attempts: int) -> float:
+    return min(settings.job_backoff_base * 2 ** (attempts - 1), settings.job_backoff_max)
+
+
+_CLAIM = text("""
+    UPDATE jobs
+    SET status = 'running', attempts = attempts + 1, started_at = now(),
+        locked_until = now() + make_interval(secs => :lease)
+    WHERE id IN (
+        SELECT id FROM jobs
+        WHERE status = 'queued' AND run_at <= now()
+        ORDER BY run_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, kind, payload, attempts, max_attempts, run_at, started_at
+""")
+
+_RECOVER_EXPIRED = text("""
+    UPDATE jobs
+    SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+        locked_until = NULL, last_error = 'Lease expired (worker stopped or job timed out)'
+    WHERE id IN (
+        SELECT id FROM jobs
+        WHERE status = 'running' AND locked_until < now()
+        FOR UPDATE SKIP LOCKED
+    )
+""")
+
+
+def _claim(limit: int) -> List:
+    with engine.begin() as conn:
+        return conn.execute(_CLAIM, {"limit": limit, "lease": settings.job_timeout + 30}).all()
+
+
+def _finish(job, error: Optional[str]) -> str:
+    """
+    Record the attempt's result; returns the outcome label. If the lease
+    expired and the job was recovered, and possibly claimed again, nothing
+    is written, so a later attempt's state is never overwritten.
+    """
+    # Only the attempt that still holds the job may record its result
+    current = "WHERE id = :id AND status = 'running' AND attempts = :attempts"
+    params = {"id": job.id, "attempts": job.attempts}
+    with engine.begin() as conn:
+        if error is None:
+            result = conn.execute(text(
+                "UPDATE jobs SET status = 'done', finished_at = now(), locked_until = NULL, last_error = NULL "
+                + current
+            ), params)
+            outcome = "succeeded"
+        elif job.attempts >= job.max_attempts:
+            result = conn.execute(text(
+                "UPDATE jobs SET status = 'dead', finished_at = now(), locked_until = NULL, last_error = :error "
+                + current
+            ), {**params, "error": error})
+            outcome = "dead"
+        else:
+            result = conn.execute(text(
+                "UPDATE jobs SET status = 'queued', locked_until = NULL, last_error = :error, "
+                "run_at = now() + make_interval(secs => :delay) " + current
+            ), {**params, "error": error, "delay": _backoff_seconds(job.attempts)})
+            outcome = "retried"
+        return outcome if result.rowcount else "lease_lost"
+
+
+def _maintain() -> None:
+    """Recover jobs from dead workers, purge old finished jobs and refresh the depth gauge"""
+    with engine.begin() as conn:
+        conn.execute(_RECOVER_EXPIRED)
+        conn.execute(text(
+            "DELETE FROM jobs WHERE status = 'done' AND finished_at < now() - make_interval(days => :days)"
+        ), {"days": settings.job_retention_days})
+        counts = dict(conn.execute(text(
+            "SELECT status, count(*) FROM jobs WHERE status IN ('queued', 'running', 'dead') GROUP BY status"
+        )).all())
+    for status in (JobStatus.QUEUED, JobStatus.RUNNING, JobStatus.DEAD):
+        JOB_QUEUE_DEPTH.labels(status).set(counts.get(status, 0))
+
+
+class JobRunner:
+    """
+    In-process worker pool for the jobs table.
+
+    A dispatcher task claims due jobs with FOR UPDATE SKIP LOCKED, so any
+    number of processes can share the table, and runs up to job_concurrency
+    of them at once on the event loop. Failed attempts are retried with
+    exponential backoff; after max_attempts a job is marked dead and left
+    for inspection. Jobs still running at shutdown keep their lease and are
+    re-queued by another worker once it expires.
+    """
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        if not settings.jobs_enabled or self._dispatcher is not None:
+            return
+        self._stop = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self) -> None:
+        if self._dispatcher is None:
+            return
+        self._stop.set()
+        await self._dispatcher
+        self._dispatcher = None
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=settings.job_shutdown_timeout)
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def _dispatch(self) -> None:
+        last_maintenance = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - last_maintenance >= settings.job_maintenance_interval:
+                    await asyncio.to_thread(_maintain)
+                    last_maintenance = time.monotonic()
+                free = settings.job_concurrency - len(self._tasks)
+                if free > 0:
+                    for job in await asyncio.to_thread(_claim, free):
+                        task = asyncio.create_task(self._run(job))
+                        self._tasks.add(task)
+                        task.add_done_callback(self._tasks.discard)
+            except SQLAlchemyError as e:
+                logger.warning("Job dispatch failed: %r", e)
+            try:
+                await asyncio.wait_for(self._stop.wait(), settings.job_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, job) -> None:
+        JOB_START_LAG.labels(job.kind).observe(max(0.0, (job.started_at - job.run_at).total_seconds()))
+        handler = _handlers.get(job.kind)
+        error = None
+        started = time.perf_counter()
+        with tracer.start_as_current_span("job.run") as span:
+            span.set_attribute("job.kind", job.kind)
+            span.set_attribute("job.attempt", job.attempts)
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler registered for job kind {job.kind!r}")
+                if inspect.iscoroutinefunction(handler):
+                    await asyncio.wait_for(handler(job.payload), settings.job_timeout)
+                else:
+                    await asyncio.wait_for(asyncio.to_thread(handler, job.payload), settings.job_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = repr(e)[:2000]
+        JOB_DURATION.labels(job.kind).observe(time.perf_counter() - started)
+
+        try:
+            outcome = await asyncio.to_thread(_finish, job, error)
+        except SQLAlchemyError as e:
+            # The lease runs out and the job is picked up again
+            logger.warning("Could not record result of job %s: %r", job.id, e)
+            return
+        JOBS.labels(job.kind, outcome).inc()
+        if outcome == "dead":
+            logger.error("Job %s (%s) dead after %d attempts: %s", job.id, job.kind, job.attempts, error)
+        elif outcome == "retried":
+            logger.warning("Job %s (%s) attempt %d failed: %s", job.id, job.kind, job.attempts, error)
+        elif outcome == "lease_lost":
+            logger.warning(
+                "Job %s (%s) attempt %d outlived its lease; its result was not recorded",
+                job.id, job.kind, job.attempts
+            )
+
+
+job_runner = JobRunner()
+
+
+def list_jobs(db: Session, status: str, limit: int) -> List[Job]:
+    return db.query(Job).filter(Job.status == status).order_by(Job.run_at.desc()).limit(limit).all()
+
+
+def retry_job(db: Session, job_id: UUID) -> Optional[Job]:
+    """Queue a dead job again with a fresh set of attempts"""
+    job = db.query(Job).filter(Job.id == job_id, Job.status == JobStatus.DEAD).first()
+    if job:
+        job.status = JobStatus.QUEUED
+        job.attempts = 0
+        job.run_at = func.now()
+        job.finished_at = None
+        db.commit()
+        db.refresh(job)
+    return job
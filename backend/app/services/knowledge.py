@@ -0,0 +1,231 @@
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.knowledge import KnowledgeChunk, KnowledgeDocument
+from app.services.embeddings import get_embedder
+
+USER_CONTEXT_SOURCE = "user_context"
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n|\n(?=#{1,6} )")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_into_chunks(text: str, max_chars: int, overlap: int) -> List[str]:
+    """
+    Split text on paragraphs and markdown headings, packing neighbours into
+    chunks of up to max_chars. Oversized paragraphs are split on sentences,
+    and as a last resort hard-wrapped with some overlap.
+    """
+    pieces: List[str] = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_RE.split(paragraph):
+            while len(sentence) > max_chars:
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars - overlap:]
+            if sentence.strip():
+                pieces.append(sentence.strip())
+
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ShopVectorIndex:
+    """Dense matrix of one shop's chunk embeddings, searched with a single matmul"""
+
+    def __init__(self, contents: List[str], matrix: np.ndarray):
+        self.contents = contents
+        self.matrix = matrix
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def search(self, query_vector: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        if not self.contents:
+            return []
+        k = min(k, len(self.contents))
+        if not query_vector.any():
+            # Nothing to rank by: keep the document's own order
+            return [(content, 0.0) for content in self.contents[:k]]
+        scores = self.matrix @ query_vector
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.contents[i], float(scores[i])) for i in top]
+
+
+_indexes: Dict[UUID, Tuple[ShopVectorIndex, float]] = {}
+_lock = threading.Lock()
+
+
+def invalidate_vector_index(shop_id: UUID) -> None:
+    with _lock:
+        _indexes.pop(shop_id, None)
+
+
+def get_vector_index(db: Session, shop_id: UUID) -> ShopVectorIndex:
+    """Load the shop's chunk vectors from Postgres once per worker (TTL-bounded)"""
+    cached = _indexes.get(shop_id)
+    if cached is not None and time.monotonic() - cached[1] < settings.knowledge_cache_ttl:
+        return cached[0]
+
+    embedder = get_embedder()
+    rows = (
+        db.query(KnowledgeChunk.content, KnowledgeChunk.embedding)
+        .join(KnowledgeDocument, KnowledgeDocument.id == KnowledgeChunk.document_id)
+        .filter(KnowledgeChunk.shop_id == shop_id, KnowledgeChunk.embedder == embedder.name)
+        .order_by(KnowledgeDocument.created_at, KnowledgeChunk.position)
+        .all()
+    )
+    if rows:
+        matrix = np.vstack([np.frombuffer(row.embedding, dtype="<f4") for row in rows])
+    else:
+        matrix = np.zeros((0, embedder.dim), dtype=np.float32)
+    index = ShopVectorIndex([row.content for row in rows], matrix)
+
+    with _lock:
+        _indexes[shop_id] = (index, time.monotonic())
+        if len(_indexes) > settings.knowledge_cache_max_shops:
+            oldest = min(_indexes, key=lambda key: _indexes[key][1])
+            _indexes.pop(oldest, None)
+    return index
+
+
+def has_knowledge(db: Session, shop_id: UUID) -> bool:
+    """True when the shop has chunks retrievable with the current embedder"""
+    return db.query(KnowledgeChunk.id).filter(
+        KnowledgeChunk.shop_id == shop_id,
+        KnowledgeChunk.embedder == get_embedder().name
+    ).first() is not None
+
+
+def retrieve_relevant_chunks(db: Session, shop_id: UUID, query: Optional[str]) -> Optional[List[str]]:
+    """
+    Top-k chunks for the question, or None when the shop has no ingested
+    knowledge (callers then fall back to the raw user context).
+    """
+    index = get_vector_index(db, shop_id)
+    if not len(index):
+        return None
+    query_vector = get_embedder().embed([query or ""])[0]
+    return [content for content, _ in index.search(query_vector, settings.knowledge_top_k)]
+
+
+def get_documents_by_shop(db: Session, shop_id: UUID) -> List[KnowledgeDocument]:
+    return db.query(KnowledgeDocument).filter(KnowledgeDocument.shop_id == shop_id).order_by(
+        KnowledgeDocument.created_at
+    ).all()
+
+
+def get_document_rows_by_shop(db: Session, shop_id: UUID) -> List[Dict]:
+    """Document listing as plain dicts (without content), for responses that skip Pydantic"""
+    table = KnowledgeDocument.__table__
+    statement = select(
+        table.c.id, table.c.shop_id, table.c.name, table.c.source,
+        table.c.char_count, table.c.created_at, table.c.updated_at
+    ).where(table.c.shop_id == shop_id).order_by(table.c.created_at)
+    return [dict(row) for row in db.execute(statement).mappings()]
+
+
+def get_document_by_id(db: Session, document_id: UUID, shop_id: UUID) -> Optional[KnowledgeDocument]:
+    return db.query(KnowledgeDocument).filter(
+        KnowledgeDocument.id == document_id,
+        KnowledgeDocument.shop_id == shop_id
+    ).first()
+
+
+def _replace_chunks(db: Session, document: KnowledgeDocument, text: str) -> None:
+    db.query(KnowledgeChunk).filter(KnowledgeChunk.document_id == document.id).delete()
+
+    chunks = split_into_chunks(text, settings.knowledge_chunk_chars, settings.knowledge_chunk_overlap)
+    embedder = get_embedder()
+    vectors = embedder.embed(chunks)
+    for position, (content, vector) in enumerate(zip(chunks, vectors)):
+        db.add(KnowledgeChunk(
+            shop_id=document.shop_id,
+            document_id=document.id,
+            position=position,
+            content=content,
+            embedding=vector.astype("<f4").tobytes(),
+            embedder=embedder.name
+        ))
+    document.content = text
+    document.char_count = len(text)
+
+
+def ingest_document(db: Session, shop_id: UUID, name: str, text: str, source: str = "upload") -> KnowledgeDocument:
+    document = KnowledgeDocument(shop_id=shop_id, name=name, source=source, content=text)
+    db.add(document)
+    db.flush()
+    _replace_chunks(db, document, text)
+    db.commit()
+    db.refresh(document)
+    invalidate_vector_index(shop_id)
+    return document
+
+
+def sync_user_context(db: Session, shop_id: UUID, user_context: Optional[str]) -> None:
+    """Keep the chunked copy of ChatConfig.user_context in step with the config"""
+    document = db.query(KnowledgeDocument).filter(
+        KnowledgeDocument.shop_id == shop_id,
+        KnowledgeDocument.source == USER_CONTEXT_SOURCE
+    ).first()
+
+    if not user_context or not user_context.strip():
+        if document:
+            delete_document(db, document)
+        return
+
+    if not document:
+        ingest_document(db, shop_id, "Business context", user_context, source=USER_CONTEXT_SOURCE)
+        return
+
+    _replace_chunks(db, document, user_context)
+    db.commit()
+    invalidate_vector_index(shop_id)
+
+
+def delete_document(db: Session, document: KnowledgeDocument) -> None:
+    shop_id = document.shop_id
+    db.query(KnowledgeChunk).filter(KnowledgeChunk.document_id == document.id).delete()
+    db.delete(document)
+    db.commit()
+    invalidate_vector_index(shop_id)
+
+
+def find_shops_needing_reindex(db: Session) -> List[UUID]:
+    """Shops with chunks from an embedder other than the current one"""
+    return [
+        row.shop_id for row in db.query(KnowledgeChunk.shop_id).filter(
+            KnowledgeChunk.embedder != get_embedder().name
+        ).distinct().all()
+    ]
+
+
+def reindex_shop(db: Session, shop_id: UUID) -> None:
+    """Re-chunk and re-embed every document of a shop, e.g. after switching embedders"""
+    for document in get_documents_by_shop(db, shop_id):
+        _replace_chunks(db, document, document.content)
+    db.commit()
+    invalidate_vector_index(shop_id)
\ No newline at end of file
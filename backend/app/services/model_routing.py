@@ -0,0 +1,93 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.models.chat_config import ChatConfig
+
+# Words that usually mean the visitor wants reasoning rather than a quick fact
+COMPLEX_HINTS = re.compile(
+    r"\b(compare|comparison|difference|differences|recommend|recommendation|which|why|explain|"
+    r"versus|vs|should i|better|worth|package|packages|ceramic|correction)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    name: str
+    model: str
+    temperature: float
+    max_tokens: int
+
+
+def latest_user_message(messages: List[Dict[str, str]]) -> str:
+    for message in reversed(messages):
+        if message["role"] == "user":
+            return message["content"]
+    return ""
+
+
+def is_simple_turn(messages: List[Dict[str, str]]) -> bool:
+    """Cheap heuristic: short, single-question turns without comparison/advice wording"""
+    text = latest_user_message(messages).strip()
+    if not text:
+        return True
+    words = text.split()
+    return (
+        len(words) <= settings.llm_fast_max_words
+        and text.count("?") <= 1
+        and not COMPLEX_HINTS.search(text)
+    )
+
+
+def _size_max_tokens(messages: List[Dict[str, str]]) -> int:
+    """Scale the completion budget with the size of the question"""
+    words = len(latest_user_message(messages).split())
+    return max(settings.llm_min_max_tokens, min(settings.llm_max_tokens, 200 + words * 10))
+
+
+def choose_route(
+    chat_config: Optional[ChatConfig],
+    plan_name: Optional[str],
+    messages: List[Dict[str, str]],
+    over_soft_limit: bool = False
+) -> ModelRoute:
+    """
+    Pick the model for a chat turn.
+    
+    Precedence: the fast tier for shops past their plan's soft token limit,
+    then the shop's model_override, then the fast tier for simple turns,
+    then the default model for the shop's plan.
+    """
+    if over_soft_limit:
+        return ModelRoute(
+            name="soft_limit",
+            model=settings.llm_fast_model,
+            temperature=settings.llm_temperature,
+            max_tokens=settings.llm_fast_max_tokens
+        )
+    
+    if chat_config is not None and chat_config.model_override:
+        return ModelRoute(
+            name="override",
+            model=chat_config.model_override,
+            temperature=settings.llm_temperature,
+            max_tokens=_size_max_tokens(messages)
+        )
+    
+    if settings.llm_fast_routing_enabled and is_simple_turn(messages):
+        return ModelRoute(
+            name="fast",
+            model=settings.llm_fast_model,
+            temperature=settings.llm_temperature,
+            max_tokens=settings.llm_fast_max_tokens
+        )
+    
+    model = settings.llm_plan_models.get(plan_name or "", settings.llm_default_model)
+    return ModelRoute(
+        name=f"plan:{plan_name}" if plan_name in settings.llm_plan_models else "default",
+        model=model,
+        temperature=settings.llm_temperature,
+        max_tokens=_size_max_tokens(messages)
+    )
\ No newline at end of file
@@ -1,5 +1,6 @@
 from uuid import UUID
-from typing import List, Optional
+from typing import Dict, List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.models.service import Service
@@ -14,6 +15,12 @@ def get_services_by_shop(db: Session, shop_id: UUID) -> List[Service]:
     return db.query(Service).filter(Service.shop_id == shop_id).all()
 
 
+def get_service_rows_by_shop(db: Session, shop_id: UUID) -> List[Dict]:
+    """The shop's services as plain dicts, for list responses that skip ORM objects and Pydantic"""
+    table = Service.__table__
+    return [dict(row) for row in db.execute(select(table).where(table.c.shop_id == shop_id)).mappings()]
+
+
 def get_service_by_id(db: Session, service_id: UUID, shop_id: UUID) -> Optional[Service]:
     return db.query(Service).filter(
         Service.id == service_id, 
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 
 from app.models.subscription import Subscription
+from app.services.subscription_cache import invalidate_subscription, notify_subscription_changed
 
 
 def get_subscription_by_owner(db: Session, owner_id: UUID) -> Subscription | None:
@@ -16,7 +17,9 @@ def create_free_subscription(db: Session, owner_id: UUID) -> Subscription:
         plan_name="free"
     )
     db.add(subscription)
+    notify_subscription_changed(db, owner_id)
     db.commit()
+    invalidate_subscription(owner_id)
     db.refresh(subscription)
     return subscription
 
@@ -26,6 +29,8 @@ def cancel_subscription(db: Session, owner_id: UUID) -> Subscription | None:
     if subscription:
         subscription.is_active = False
         subscription.canceled_at = func.now()
+        notify_subscription_changed(db, owner_id)
         db.commit()
+        invalidate_subscription(owner_id)
         db.refresh(subscription)
     return subscription
\ No newline at end of file
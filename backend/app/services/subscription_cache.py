@@ -0,0 +1,155 @@
+import logging
+import select
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from uuid import UUID
+
+import psycopg2
+from prometheus_client import Counter
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import engine
+from app.models.subscription import Subscription
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "subscription_changed"
+
+SUBSCRIPTION_CACHE = Counter(
+    "subscription_cache_lookups_total",
+    "Subscription state lookups by result (hit/miss)",
+    ["result"],
+)
+
+
+@dataclass(frozen=True)
+class SubscriptionState:
+    """The parts of a subscription needed for access checks and model routing"""
+    owner_id: UUID
+    plan_name: str
+    is_active: bool
+
+
+# owner id -> (state or None when the owner has no subscription, monotonic time cached)
+_cache: "OrderedDict[str, Tuple[Optional[SubscriptionState], float]]" = OrderedDict()
+_lock = threading.Lock()
+# Bumped on every invalidation so a lookup racing with one does not re-cache old state
+_invalidations = 0
+
+
+def get_subscription_state(db: Session, owner_id: UUID) -> Optional[SubscriptionState]:
+    """
+    Cached subscription state for an owner (TTL + LRU, per worker).
+
+    Writes through services/subscription.py invalidate the entry in every
+    worker via NOTIFY; the TTL bounds staleness if a notification is missed.
+    """
+    key = str(owner_id)
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None and time.monotonic() - cached[1] < settings.subscription_cache_ttl:
+            _cache.move_to_end(key)
+            SUBSCRIPTION_CACHE.labels("hit").inc()
+            return cached[0]
+        seen_invalidations = _invalidations
+
+    SUBSCRIPTION_CACHE.labels("miss").inc()
+    subscription = db.query(Subscription).filter(Subscription.owner_id == owner_id).first()
+    state = None
+    if subscription:
+        state = SubscriptionState(subscription.owner_id, subscription.plan_name, subscription.is_active)
+
+    with _lock:
+        if seen_invalidations != _invalidations:
+            return state
+        _cache[key] = (state, time.monotonic())
+        _cache.move_to_end(key)
+        while len(_cache) > settings.subscription_cache_max_entries:
+            _cache.popitem(last=False)
+    return state
+
+
+def invalidate_subscription(owner_id) -> None:
+    global _invalidations
+    with _lock:
+        _invalidations += 1
+        _cache.pop(str(owner_id), None)
+
+
+def clear_subscription_cache() -> None:
+    global _invalidations
+    with _lock:
+        _invalidations += 1
+        _cache.clear()
+
+
+def notify_subscription_changed(db: Session, owner_id) -> None:
+    """
+    Queue a cross-worker invalidation in the caller's transaction.
+
+    Postgres only delivers the notification if the transaction commits, so
+    other workers never drop their entry before the change is visible.
+    """
+    db.execute(text("SELECT pg_notify(:channel, :owner_id)"), {"channel": CHANNEL, "owner_id": str(owner_id)})
+
+
+class SubscriptionInvalidationListener:
+    """
+    Background thread holding a dedicated LISTEN connection.
+
+    Each notification drops one owner from this worker's cache. After a
+    (re)connect the whole cache is cleared, since anything published while
+    the connection was down has been lost.
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if not settings.subscription_notify_enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="subscription-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _run(self) -> None:
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        backoff = 1.0
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = psycopg2.connect(dsn)
+                connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                clear_subscription_cache()
+                backoff = 1.0
+                while not self._stop.is_set():
+                    if select.select([connection], [], [], 1.0) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        invalidate_subscription(connection.notifies.pop(0).payload)
+            except psycopg2.Error as e:
+                logger.warning("Subscription listener disconnected, retrying in %.0fs: %r", backoff, e)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+
+subscription_listener = SubscriptionInvalidationListener()
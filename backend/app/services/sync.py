@@ -0,0 +1,169 @@
+import itertools
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Row, delete, event, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import SessionLocal
+from app.models.chat_config import ChatConfig, ChatWidgetConfig
+from app.models.faq import FAQ
+from app.models.service import Service
+from app.models.shop import Shop
+from app.models.sync import ShopSyncState, SyncTombstone
+from app.services.compiled_context import lock_shop_derived_state
+
+# Writes to any of these bump the owning shop's sync version
+_SYNCED = (Shop, Service, FAQ, ChatConfig, ChatWidgetConfig)
+# Deletes of these leave a tombstone; configs are only removed with their shop
+_TOMBSTONED = {Service: "services", FAQ: "faqs"}
+_CHANGED_KEY = "sync_changed_shops"
+_TOMBSTONES_KEY = "sync_tombstones"
+_DELETED_SHOPS_KEY = "sync_deleted_shops"
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _collect_sync_changes(session, flush_context, instances):
+    changed = session.info.setdefault(_CHANGED_KEY, set())
+    tombstones = session.info.setdefault(_TOMBSTONES_KEY, [])
+    deleted_shops = session.info.setdefault(_DELETED_SHOPS_KEY, set())
+    modified = (instance for instance in session.dirty if session.is_modified(instance))
+    for instance in itertools.chain(session.new, modified, session.deleted):
+        if isinstance(instance, _SYNCED):
+            changed.add(instance.id if isinstance(instance, Shop) else instance.shop_id)
+    for instance in session.deleted:
+        if isinstance(instance, Shop):
+            deleted_shops.add(instance.id)
+        elif type(instance) in _TOMBSTONED:
+            tombstones.append((instance.shop_id, _TOMBSTONED[type(instance)], instance.id))
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _record_sync_changes(session):
+    session.flush()
+    changed = session.info.pop(_CHANGED_KEY, None)
+    tombstones = session.info.pop(_TOMBSTONES_KEY, None)
+    deleted_shops = session.info.pop(_DELETED_SHOPS_KEY, None) or set()
+    if not changed:
+        return
+    # Sorted so concurrent writers lock the counters in the same order
+    shop_ids = sorted(changed - deleted_shops, key=str)
+    tombstones = [tombstone for tombstone in tombstones or [] if tombstone[0] not in deleted_shops]
+    if tombstones:
+        session.execute(insert(SyncTombstone), [
+            {"shop_id": shop_id, "entity": entity, "entity_id": entity_id}
+            for shop_id, entity, entity_id in tombstones
+        ])
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.sync_tombstone_retention_days)
+        session.execute(delete(SyncTombstone).where(
+            SyncTombstone.shop_id.in_({tombstone[0] for tombstone in tombstones}),
+            SyncTombstone.deleted_at < cutoff
+        ))
+    if shop_ids:
+        # Same lock as the compiled context refresh, taken before locking the counter rows
+        for shop_id in shop_ids:
+            lock_shop_derived_state(session, shop_id)
+        statement = insert(ShopSyncState).values([{"shop_id": shop_id, "version": 1} for shop_id in shop_ids])
+        statement = statement.on_conflict_do_update(
+            index_elements=[ShopSyncState.shop_id],
+            set_={"version": ShopSyncState.version + 1, "changed_at": func.now()}
+        )
+        session.execute(statement)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _forget_sync_changes(session, previous_transaction):
+    for key in (_CHANGED_KEY, _TOMBSTONES_KEY, _DELETED_SHOPS_KEY):
+        session.info.pop(key, None)
+
+
+def format_sync_cursor(version: int, as_of: datetime) -> str:
+    return f"{version}.{int(as_of.timestamp() * 1_000_000)}"
+
+
+def parse_sync_cursor(cursor: str) -> Tuple[int, datetime]:
+    """A cursor is "<version>.<microseconds since the epoch>"; raises ValueError when malformed"""
+    version, _, micros = cursor.partition(".")
+    return int(version), datetime.fromtimestamp(int(micros) / 1_000_000, tz=timezone.utc)
+
+
+def get_sync_state(db: Session, owner_id: UUID) -> Optional[Row]:
+    """
+    The owner's shop id, its sync version (0 before the first tracked write)
+    and the database clock, in one indexed query.
+    """
+    return db.execute(
+        select(
+            Shop.id.label("shop_id"),
+            func.coalesce(ShopSyncState.version, 0).label("version"),
+            func.now().label("now")
+        )
+        .outerjoin(ShopSyncState, ShopSyncState.shop_id == Shop.id)
+        .where(Shop.owner_id == owner_id)
+        .limit(1)
+    ).first()
+
+
+def _rows(db: Session, statement) -> List[Dict]:
+    return [dict(row) for row in db.execute(statement).mappings()]
+
+
+def get_sync_changes(db: Session, state: Row, cursor: Optional[str]) -> Optional[Dict]:
+    """
+    Rows created, updated or deleted since the cursor, or None when the shop's
+    version has not moved.
+
+    updated_at is the writing transaction's start time, so a transaction
+    that commits after a poll can carry a timestamp older than that poll's
+    cursor; rows are therefore re-read sync_overlap_seconds before it and
+    clients apply them idempotently. Without a cursor, or with one older
+    than the tombstone retention, the full state is returned with "full"
+    set and the client replaces what it holds.
+    """
+    since = None
+    if cursor is not None:
+        version, since = parse_sync_cursor(cursor)
+        if version == state.version:
+            return None
+        if since < state.now - timedelta(days=settings.sync_tombstone_retention_days):
+            since = None
+
+    window = since - timedelta(seconds=settings.sync_overlap_seconds) if since else None
+
+    def changed(table, *conditions):
+        statement = select(table).where(*conditions)
+        if window is not None:
+            statement = statement.where(table.c.updated_at > window)
+        return _rows(db, statement)
+
+    shops = Shop.__table__
+    chat_configs = ChatConfig.__table__
+    widget_configs = ChatWidgetConfig.__table__
+    services = Service.__table__
+    faqs = FAQ.__table__
+    shop = changed(shops, shops.c.id == state.shop_id)
+    chat_config = changed(chat_configs, chat_configs.c.shop_id == state.shop_id)
+    widget_config = changed(widget_configs, widget_configs.c.shop_id == state.shop_id)
+
+    deleted: Dict[str, List[UUID]] = {entity: [] for entity in _TOMBSTONED.values()}
+    if window is not None:
+        for entity, entity_id in db.execute(
+            select(SyncTombstone.entity, SyncTombstone.entity_id)
+            .where(SyncTombstone.shop_id == state.shop_id, SyncTombstone.deleted_at > window)
+            .order_by(SyncTombstone.id)
+        ):
+            deleted[entity].append(entity_id)
+
+    return {
+        "cursor": format_sync_cursor(state.version, state.now),
+        "full": window is None,
+        "shop": shop[0] if shop else None,
+        "chat_config": chat_config[0] if chat_config else None,
+        "widget_config": widget_config[0] if widget_config else None,
+        "services": changed(services, services.c.shop_id == state.shop_id),
+        "faqs": changed(faqs, faqs.c.shop_id == state.shop_id),
+        "deleted": deleted,
+    }
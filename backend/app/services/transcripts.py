@@ -0,0 +1,183 @@
+import logging
+import queue
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from prometheus_client import Counter
+from sqlalchemy import select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+from app.db import engine
+from app.models.shop import Shop
+from app.models.transcript import ChatTranscript
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_ROWS = Counter(
+    "chat_transcript_rows_total",
+    "Chat transcript rows by outcome (written, dropped_overflow, dropped_unknown_shop, dropped_error)",
+    ["outcome"],
+)
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + 1, 1, 1) if month.month == 12 else date(month.year, month.month + 1, 1)
+
+
+def ensure_transcript_partitions(months_ahead: int = 1) -> List[str]:
+    """
+    Create the monthly partitions of chat_transcripts from the current month
+    through months_ahead, plus a default partition that catches anything
+    outside them. Returns the partition names.
+
+    An old month is removed with DROP TABLE on its partition.
+    """
+    names = []
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS chat_transcripts_default PARTITION OF chat_transcripts DEFAULT"))
+        month = _month_start(datetime.now(timezone.utc).date())
+        for _ in range(months_ahead + 1):
+            name = f"chat_transcripts_{month:%Y_%m}"
+            following = _next_month(month)
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF chat_transcripts "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+            ))
+            names.append(name)
+            month = following
+    return names
+
+
+class TranscriptWriter:
+    """
+    Writes chat transcripts from a background thread.
+
+    Request handlers only put a row on a bounded queue; when the queue is
+    full the row is dropped and counted rather than making the visitor wait.
+    The thread inserts rows in batches of up to transcript_batch_size, at
+    least every transcript_flush_interval seconds, and drains the queue on
+    stop().
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=settings.transcript_queue_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._partitions_month: Optional[date] = None
+
+    def record(
+        self,
+        shop_id: UUID,
+        session_id: Optional[str],
+        turn: int,
+        channel: str,
+        question: str,
+        result
+    ) -> None:
+        """Queue one turn; result is the services.chat.ChatResult of the reply"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put_nowait({
+                "created_at": datetime.now(timezone.utc),
+                "shop_id": shop_id,
+                "session_id": session_id,
+                "turn": turn,
+                "channel": channel,
+                "question": question,
+                "reply": result.reply,
+                "source": result.source,
+                "route": result.route,
+                "model": result.model,
+                "prompt_tokens": result.prompt_tokens,
+                "completion_tokens": result.completion_tokens,
+                "latency_ms": result.latency_ms,
+            })
+        except queue.Full:
+            TRANSCRIPT_ROWS.labels("dropped_overflow").inc()
+
+    def start(self) -> None:
+        if not settings.transcripts_enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="transcript-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Flush whatever is queued and stop the thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=settings.transcript_shutdown_timeout)
+            self._thread = None
+
+    def _next_batch(self) -> List[Dict]:
+        batch: List[Dict] = []
+        deadline = time.monotonic() + settings.transcript_flush_interval
+        while len(batch) < settings.transcript_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if self._stop.is_set():
+                # Shutting down: take what is already queued without waiting
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                continue
+            try:
+                batch.append(self._queue.get(timeout=min(remaining, 0.25)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _ensure_partitions(self) -> None:
+        month = _month_start(datetime.now(timezone.utc).date())
+        if self._partitions_month == month:
+            return
+        try:
+            ensure_transcript_partitions()
+            self._partitions_month = month
+        except SQLAlchemyError as e:
+            # Rows still land in the default partition
+            logger.warning("Could not create transcript partitions: %r", e)
+
+    def _flush(self, rows: List[Dict]) -> None:
+        self._ensure_partitions()
+        try:
+            with engine.begin() as conn:
+                # A shop deleted since its turn was recorded would fail the whole batch;
+                # KEY SHARE keeps the others from being deleted until this commits
+                known = set(conn.execute(
+                    select(Shop.id)
+                    .where(Shop.id.in_({row["shop_id"] for row in rows}))
+                    .with_for_update(key_share=True)
+                ).scalars())
+                kept = [row for row in rows if row["shop_id"] in known]
+                if kept:
+                    # executemany on an insert() is sent as multi-row INSERT ... VALUES statements
+                    conn.execute(ChatTranscript.__table__.insert(), kept)
+            TRANSCRIPT_ROWS.labels("written").inc(len(kept))
+            TRANSCRIPT_ROWS.labels("dropped_unknown_shop").inc(len(rows) - len(kept))
+        except SQLAlchemyError as e:
+            logger.error("Dropped %d chat transcript rows: %r", len(rows), e)
+            TRANSCRIPT_ROWS.labels("dropped_error").inc(len(rows))
+
+    def _run(self) -> None:
+        while True:
+            stopping = self._stop.is_set()
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+            elif stopping:
+                return
+
+
+transcript_writer = TranscriptWriter()
@@ -0,0 +1,248 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from prometheus_client import Counter
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import engine
+from app.models.shop import Shop
+from app.models.usage import ShopUsage
+
+logger = logging.getLogger(__name__)
+
+QUOTA_OK = "ok"
+QUOTA_SOFT_LIMIT = "soft_limit"
+QUOTA_HARD_LIMIT = "hard_limit"
+
+QUOTA_CHECKS = Counter(
+    "llm_quota_checks_total",
+    "Chat turns checked against the shop's token quota, by result",
+    ["result"],
+)
+
+UsageKey = Tuple[UUID, datetime]
+
+
+def current_period_start(now: Optional[datetime] = None) -> datetime:
+    """Billing periods are calendar months in UTC"""
+    now = now or datetime.now(timezone.utc)
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_period_start(period_start: datetime) -> datetime:
+    if period_start.month == 12:
+        return period_start.replace(year=period_start.year + 1, month=1)
+    return period_start.replace(month=period_start.month + 1)
+
+
+@dataclass(frozen=True)
+class PlanLimits:
+    """Tokens (prompt + completion) per period; None means unlimited"""
+    soft: Optional[int]
+    hard: Optional[int]
+
+
+def plan_limits(plan_name: Optional[str]) -> PlanLimits:
+    plan = plan_name or "free"
+    return PlanLimits(settings.usage_soft_limits.get(plan), settings.usage_hard_limits.get(plan))
+
+
+def quota_status(used: int, limits: PlanLimits) -> str:
+    if limits.hard is not None and used >= limits.hard:
+        return QUOTA_HARD_LIMIT
+    if limits.soft is not None and used >= limits.soft:
+        return QUOTA_SOFT_LIMIT
+    return QUOTA_OK
+
+
+class UsageMeter:
+    """
+    Per-worker token metering for the chat hot path.
+
+    record() and check_quota() only touch memory. A background thread
+    flushes the accumulated deltas every usage_flush_interval seconds in a
+    single upsert whose RETURNING clause refreshes this worker's view of
+    each shop's total across all workers. Totals of limited shops this
+    worker has not written for are loaded on the next flush after they are
+    first checked, and reloaded once older than usage_totals_ttl. A shop can
+    therefore overshoot its hard limit by roughly one flush interval of
+    traffic.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[UsageKey, List[int]] = {}
+        # Deltas taken by a flush that is still running; still counted as used
+        self._flushing: Dict[UsageKey, List[int]] = {}
+        # Totals across all workers as of the last flush: key -> (tokens, monotonic time loaded)
+        self._totals: Dict[UsageKey, Tuple[int, float]] = {}
+        self._wanted: Set[UsageKey] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, shop_id: UUID, prompt_tokens: int, completion_tokens: int) -> None:
+        if not prompt_tokens and not completion_tokens:
+            return
+        key = (shop_id, current_period_start())
+        with self._lock:
+            pending = self._pending.setdefault(key, [0, 0])
+            pending[0] += prompt_tokens
+            pending[1] += completion_tokens
+
+    def used_tokens(self, shop_id: UUID) -> int:
+        """Best known usage for the current period, without a database query"""
+        key = (shop_id, current_period_start())
+        with self._lock:
+            total = self._totals.get(key)
+            if total is None:
+                self._wanted.add(key)
+            used = total[0] if total else 0
+            for deltas in (self._pending.get(key), self._flushing.get(key)):
+                if deltas:
+                    used += deltas[0] + deltas[1]
+        return used
+
+    def check_quota(self, shop_id: UUID, plan_name: Optional[str]) -> str:
+        limits = plan_limits(plan_name)
+        if limits.soft is None and limits.hard is None:
+            return QUOTA_OK
+        result = quota_status(self.used_tokens(shop_id), limits)
+        QUOTA_CHECKS.labels(result).inc()
+        return result
+
+    def pending_tokens(self, shop_id: UUID) -> Tuple[int, int]:
+        """This worker's (prompt, completion) tokens not yet written to the database"""
+        key = (shop_id, current_period_start())
+        prompt = completion = 0
+        with self._lock:
+            for deltas in (self._pending.get(key), self._flushing.get(key)):
+                if deltas:
+                    prompt += deltas[0]
+                    completion += deltas[1]
+        return prompt, completion
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-meter", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write what has been metered and stop the thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def flush(self) -> None:
+        period = current_period_start()
+        now = time.monotonic()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushing = pending
+            for key in [key for key in self._totals if key[1] != period]:
+                del self._totals[key]
+            stale = {key for key, (_, loaded) in self._totals.items() if now - loaded >= settings.usage_totals_ttl}
+            wanted = (self._wanted | stale) - set(pending)
+            self._wanted = set()
+        if not pending and not wanted:
+            return
+
+        totals: Dict[UsageKey, int] = {}
+        table = ShopUsage.__table__
+        upserts: List[Dict] = []
+        try:
+            with engine.begin() as conn:
+                if pending:
+                    # A shop deleted since its usage was recorded has nothing left to bill;
+                    # KEY SHARE keeps the others from being deleted until this commits
+                    known = set(conn.execute(
+                        select(Shop.id)
+                        .where(Shop.id.in_({shop_id for shop_id, _ in pending}))
+                        .with_for_update(key_share=True)
+                    ).scalars())
+                    upserts = [
+                        {"shop_id": shop_id, "period_start": period_start, "prompt_tokens": prompt, "completion_tokens": completion}
+                        for (shop_id, period_start), (prompt, completion) in pending.items()
+                        if shop_id in known
+                    ]
+                if upserts:
+                    # One statement, so a flush is applied entirely or not at all
+                    statement = insert(table).values(upserts)
+                    statement = statement.on_conflict_do_update(
+                        constraint="unique_shop_usage_period",
+                        set_={
+                            "prompt_tokens": table.c.prompt_tokens + statement.excluded.prompt_tokens,
+                            "completion_tokens": table.c.completion_tokens + statement.excluded.completion_tokens,
+                            "updated_at": func.now(),
+                        }
+                    ).returning(table.c.shop_id, table.c.period_start, table.c.prompt_tokens, table.c.completion_tokens)
+                    for row in conn.execute(statement):
+                        totals[(row.shop_id, row.period_start)] = row.prompt_tokens + row.completion_tokens
+                if wanted:
+                    rows = conn.execute(
+                        select(table.c.shop_id, table.c.period_start, table.c.prompt_tokens, table.c.completion_tokens)
+                        .where(tuple_(table.c.shop_id, table.c.period_start).in_(list(wanted)))
+                    )
+                    totals.update({key: 0 for key in wanted})
+                    for row in rows:
+                        totals[(row.shop_id, row.period_start)] = row.prompt_tokens + row.completion_tokens
+        except SQLAlchemyError as e:
+            logger.error("Token usage flush failed, will retry: %r", e)
+            with self._lock:
+                for key, (prompt, completion) in pending.items():
+                    deltas = self._pending.setdefault(key, [0, 0])
+                    deltas[0] += prompt
+                    deltas[1] += completion
+                self._flushing = {}
+            return
+
+        if len(upserts) < len(pending):
+            logger.info("Discarded token usage for %d period(s) of deleted shops", len(pending) - len(upserts))
+        loaded = time.monotonic()
+        with self._lock:
+            for key, total in totals.items():
+                self._totals[key] = (total, loaded)
+            self._flushing = {}
+
+    def _run(self) -> None:
+        while not self._stop.wait(settings.usage_flush_interval):
+            self.flush()
+        self.flush()
+
+
+usage_meter = UsageMeter()
+
+
+def get_shop_usage(db: Session, shop_id: UUID, plan_name: Optional[str]) -> Dict:
+    """Usage and limits for the current period, including this worker's unflushed tokens"""
+    period_start = current_period_start()
+    usage = db.query(ShopUsage).filter(
+        ShopUsage.shop_id == shop_id,
+        ShopUsage.period_start == period_start
+    ).first()
+    pending_prompt, pending_completion = usage_meter.pending_tokens(shop_id)
+    prompt_tokens = (usage.prompt_tokens if usage else 0) + pending_prompt
+    completion_tokens = (usage.completion_tokens if usage else 0) + pending_completion
+    limits = plan_limits(plan_name)
+    return {
+        "plan_name": plan_name or "free",
+        "period_start": period_start,
+        "period_end": next_period_start(period_start),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "soft_limit": limits.soft,
+        "hard_limit": limits.hard,
+        "status": quota_status(prompt_tokens + completion_tokens, limits),
+    }
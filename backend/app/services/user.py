@@ -1,50 +1,53 @@
+import logging
+from typing import Dict
+
 import httpx
 from sqlalchemy.orm import Session
 
 from app.models.shop import Shop
 from app.models.subscription import Subscription
-from app.models.service import Service
-from app.models.faq import FAQ
-from app.models.chat_config import ChatConfig, ChatWidgetConfig
+from app.services.jobs import enqueue_job, register_job_handler
+from app.services.subscription_cache import invalidate_subscription, notify_subscription_changed
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+SUPABASE_DELETE_USER = "supabase.delete_user"
+
+_supabase_client = httpx.AsyncClient(timeout=10.0)
 
-async def delete_user_account(db: Session, user_id: str):
-    """Delete user account and all associated data"""
-    # Get user's shop
-    shop = db.query(Shop).filter(Shop.owner_id == user_id).first()
+
+def delete_user_account(db: Session, user_id: str):
+    """
+    Delete user account and all associated data.
     
-    if shop:
-        # Delete related data first (avoid foreign key constraints)
-        db.query(Service).filter(Service.shop_id == shop.id).delete()
-        db.query(FAQ).filter(FAQ.shop_id == shop.id).delete()
-        db.query(ChatConfig).filter(ChatConfig.shop_id == shop.id).delete()
-        db.query(ChatWidgetConfig).filter(ChatWidgetConfig.shop_id == shop.id).delete()
-        
-        # Delete shop
-        db.delete(shop)
+    Deleting the shop removes everything it owns through ON DELETE CASCADE.
+    The Supabase auth user is removed afterwards by a background job; the
+    job commits together with the deletion, so it cannot be lost.
+    """
+    db.query(Shop).filter(Shop.owner_id == user_id).delete(synchronize_session=False)
     
-    # Delete subscription
     subscription = db.query(Subscription).filter(Subscription.owner_id == user_id).first()
     if subscription:
         db.delete(subscription)
+        notify_subscription_changed(db, user_id)
     
-    # Commit database changes
+    enqueue_job(db, SUPABASE_DELETE_USER, {"user_id": str(user_id)}, max_attempts=settings.supabase_delete_max_attempts)
     db.commit()
-    
-    # Try to delete from Supabase (optional - main data is already cleaned up)
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                f"{settings.supabase_project_url}/auth/v1/admin/users/{user_id}",
-                headers={
-                    "Authorization": f"Bearer {settings.supabase_service_role_key}",
-                    "apikey": settings.supabase_service_role_key
-                }
-            )
-            
-            if response.status_code not in [200, 204]:
-                print(f"Warning: Failed to delete user from Supabase: {response.status_code}")
-    except Exception as e:
-        print(f"Warning: Supabase deletion failed: {str(e)}")
-        # Don't fail the entire operation if Supabase deletion fails
\ No newline at end of file
+    invalidate_subscription(user_id)
+
+
+async def _delete_supabase_user(payload: Dict) -> None:
+    response = await _supabase_client.delete(
+        f"{settings.supabase_project_url}/auth/v1/admin/users/{payload['user_id']}",
+        headers={
+            "Authorization": f"Bearer {settings.supabase_service_role_key}",
+            "apikey": settings.supabase_service_role_key
+        }
+    )
+    # 404: already gone, e.g. an earlier attempt succeeded before its commit failed
+    if response.status_code not in (200, 204, 404):
+        raise RuntimeError(f"Supabase returned {response.status_code}: {response.text[:200]}")
+
+
+register_job_handler(SUPABASE_DELETE_USER, _delete_supabase_user)
@@ -26,11 +26,13 @@ def generate_embed_script(db: Session, shop_id: UUID) -> str:
     Auto-creates default config if none exists.
     """
     widget_config = get_or_create_widget_config(db, shop_id)
+    api_url = settings.widget_api_url or settings.backend_url
     
     script = f'''<!-- Chatbot.ai Widget -->
 <script>
   window.ChatbotAiConfig = {{
     shopId: "{shop_id}",
+    apiUrl: "{api_url}",
     position: "{widget_config.position}",
     theme: "{widget_config.theme}",
     primaryColor: "{widget_config.primary_color}",
@@ -39,7 +41,7 @@ def generate_embed_script(db: Session, shop_id: UUID) -> str:
     showBranding: {str(widget_config.show_branding).lower()}
   }};
 </script>
-<script src="{settings.backend_url}/api/v1/widget/widget.js" async></script>
+<script src="{api_url}/api/v1/widget/widget.js" async></script>
 <!-- End Chatbot.ai Widget -->'''
     
     return script
\ No newline at end of file
@@ -0,0 +1,119 @@
+import logging
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Mapping, Optional, Tuple
+from uuid import UUID
+
+from prometheus_client import Counter
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+from app.db import engine
+from app.models.analytics import WidgetEventCount
+from app.models.shop import Shop
+from app.services.allowed_origins import is_known_shop
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ("impression", "open", "close", "message_sent")
+
+WIDGET_EVENTS = Counter(
+    "widget_events_total",
+    "Widget funnel events by outcome (accepted, dropped_overflow, written, dropped_unknown_shop, dropped_error)",
+    ["outcome"],
+)
+
+
+class WidgetEventAggregator:
+    """
+    Per-worker counters for widget funnel events.
+
+    Beacon requests only add to an in-memory dict keyed by (shop, hour,
+    event type); a background thread swaps the dict out every
+    widget_events_flush_interval seconds and upserts it in one statement.
+    Events for shop ids missing from the origin registry's snapshot are
+    dropped on arrival, so junk ids cannot take up keys; beyond that,
+    widget_events_max_keys still bounds memory.
+    """
+
+    def __init__(self):
+        self._counts: Dict[Tuple[UUID, datetime, str], int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, shop_id: UUID, counts: Mapping[str, int]) -> None:
+        if not is_known_shop(shop_id):
+            WIDGET_EVENTS.labels("dropped_unknown_shop").inc(sum(counts.values()))
+            return
+        bucket_start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        accepted = dropped = 0
+        with self._lock:
+            for event_type, count in counts.items():
+                key = (shop_id, bucket_start, event_type)
+                if key not in self._counts and len(self._counts) >= settings.widget_events_max_keys:
+                    dropped += count
+                    continue
+                self._counts[key] = self._counts.get(key, 0) + count
+                accepted += count
+        if accepted:
+            WIDGET_EVENTS.labels("accepted").inc(accepted)
+        if dropped:
+            WIDGET_EVENTS.labels("dropped_overflow").inc(dropped)
+
+    def start(self) -> None:
+        if not settings.widget_events_enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="widget-events", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Flush the current counts and stop the thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def flush(self) -> None:
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        if not counts:
+            return
+        try:
+            with engine.begin() as conn:
+                # A shop deleted since its events were counted would fail the whole upsert;
+                # KEY SHARE keeps the others from being deleted until this commits
+                known = set(conn.execute(
+                    select(Shop.id)
+                    .where(Shop.id.in_({key[0] for key in counts}))
+                    .with_for_update(key_share=True)
+                ).scalars())
+                rows = [
+                    {"id": uuid.uuid4(), "shop_id": shop_id, "bucket_start": bucket_start, "event_type": event_type, "count": count}
+                    for (shop_id, bucket_start, event_type), count in counts.items()
+                    if shop_id in known
+                ]
+                if rows:
+                    statement = insert(WidgetEventCount.__table__)
+                    conn.execute(statement.on_conflict_do_update(
+                        constraint="unique_widget_event_bucket",
+                        set_={"count": WidgetEventCount.__table__.c.count + statement.excluded.count}
+                    ), rows)
+            written = sum(row["count"] for row in rows)
+            WIDGET_EVENTS.labels("written").inc(written)
+            WIDGET_EVENTS.labels("dropped_unknown_shop").inc(sum(counts.values()) - written)
+        except SQLAlchemyError as e:
+            logger.error("Dropped %d widget events: %r", sum(counts.values()), e)
+            WIDGET_EVENTS.labels("dropped_error").inc(sum(counts.values()))
+
+    def _run(self) -> None:
+        while not self._stop.wait(settings.widget_events_flush_interval):
+            self.flush()
+        self.flush()
+
+
+widget_events = WidgetEventAggregator()
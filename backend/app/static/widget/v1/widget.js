@@ -14,6 +14,13 @@
       greeting: 'Hi! How can we help you with your detailing services?',
       placeholder: 'Ask about pricing, packages, or booking...',
       showBranding: true,
+      reportTiming: false,
+      trackEvents: true,
+      showSuggestions: true,
+      transport: 'websocket',
+      // HTTP chat: per-attempt timeout (ms) and retries of the same turn
+      requestTimeout: 30000,
+      requestRetries: 2,
       apiUrl: window.location.protocol === 'https:' ? 'https://' : 'http://' + 'localhost:8000'
     },
     ...window.ChatbotAiConfig
@@ -23,6 +30,19 @@
   let isOpen = false;
   let messages = [];
   let widgetContainer = null;
+  let suggestTimer = null;
+  let suggestController = null;
+  let pendingEvents = {};
+  let eventTimer = null;
+
+  // WebSocket transport state (HTTP is used when this is unavailable)
+  let socket = null;
+  let socketOpening = null;
+  let socketFailed = false;
+  let socketTurn = 0;
+  let socketSeq = 0;
+  let finishedTurn = 0;
+  let pendingReply = null;
 
   // Create widget HTML structure
   function createWidget() {
@@ -50,6 +70,13 @@
     
     // Initialize with greeting
     addMessage(config.greeting, false);
+
+    // Send queued funnel events before the page goes away
+    document.addEventListener('visibilitychange', () => {
+      if (document.visibilityState === 'hidden') flushEvents();
+    });
+    window.addEventListener('pagehide', flushEvents);
+    trackEvent('impression');
   }
 
   function createChatButton() {
@@ -90,6 +117,7 @@
         <div class="dcb-messages"></div>
       </div>
       <div class="dcb-input-container">
+        <div class="dcb-suggestions"></div>
         <div class="dcb-input-wrapper">
           <input type="text" class="dcb-message-input" placeholder="${config.placeholder}" maxlength="500">
           <button class="dcb-send-button">
@@ -137,12 +165,15 @@
       chatWindow.classList.add('dcb-open');
       notificationDot.style.display = 'none';
       focusInput();
+      trackEvent('open');
     } else {
       chatWindow.classList.remove('dcb-open');
+      trackEvent('close');
     }
   }
 
   function closeChat() {
+    if (isOpen) trackEvent('close');
     isOpen = false;
     const chatWindow = widgetContainer.querySelector('.dcb-chat-window');
     chatWindow.classList.remove('dcb-open');
@@ -167,6 +198,57 @@
   function handleInput(e) {
     const sendButton = widgetContainer.querySelector('.dcb-send-button');
     sendButton.disabled = !e.target.value.trim();
+    scheduleSuggestions(e.target.value.trim());
+  }
+
+  // Debounced FAQ typeahead: picking a suggestion answers locally, no chat call needed
+  function scheduleSuggestions(query) {
+    if (!config.showSuggestions) return;
+    clearTimeout(suggestTimer);
+    if (query.length < 2) {
+      renderSuggestions([]);
+      return;
+    }
+    suggestTimer = setTimeout(() => fetchSuggestions(query), 150);
+  }
+
+  async function fetchSuggestions(query) {
+    if (suggestController) suggestController.abort();
+    suggestController = new AbortController();
+
+    try {
+      const response = await fetch(
+        `${config.apiUrl}/api/v1/widget/${config.shopId}/suggest?q=${encodeURIComponent(query)}&limit=3`,
+        { signal: suggestController.signal }
+      );
+      if (!response.ok) return;
+      renderSuggestions(await response.json());
+    } catch (error) {
+      // Aborted by a newer keystroke or network hiccup; suggestions are best-effort
+    }
+  }
+
+  function renderSuggestions(suggestions) {
+    const container = widgetContainer.querySelector('.dcb-suggestions');
+    container.innerHTML = '';
+
+    suggestions.forEach((suggestion) => {
+      const item = document.createElement('button');
+      item.type = 'button';
+      item.className = 'dcb-suggestion';
+      item.textContent = suggestion.question;
+      item.addEventListener('click', () => selectSuggestion(suggestion));
+      container.appendChild(item);
+    });
+  }
+
+  function selectSuggestion(suggestion) {
+    const input = widgetContainer.querySelector('.dcb-message-input');
+    input.value = '';
+    widgetContainer.querySelector('.dcb-send-button').disabled = true;
+    renderSuggestions([]);
+    addMessage(suggestion.question, true);
+    addMessage(suggestion.answer, false);
   }
 
   async function sendMessage() {
@@ -174,18 +256,35 @@
     const message = input.value.trim();
     
     if (!message) return;
+    trackEvent('message_sent');
 
     // Add user message
     addMessage(message, true);
     input.value = '';
+    clearTimeout(suggestTimer);
+    renderSuggestions([]);
     
     // Show typing indicator
     showTypingIndicator();
     
+    const traceparent = createTraceparent();
+    const startedAt = performance.now();
+
     try {
-      const response = await sendToAPI(message);
+      if (canUseSocket()) {
+        try {
+          await sendViaSocket(message, traceparent, startedAt);
+          return;
+        } catch (error) {
+          if (error.fatal) throw error;
+          // Connection trouble: retry this turn over HTTP
+          console.warn('Chat socket unavailable, using HTTP:', error);
+        }
+      }
+      const response = await sendToAPI(message, traceparent);
       hideTypingIndicator();
       addMessage(response, false);
+      reportRenderTiming(traceparent, startedAt);
     } catch (error) {
       hideTypingIndicator();
       addMessage('Sorry, I\'m having trouble right now. Please try again later.', false);
@@ -193,28 +292,289 @@
     }
   }
 
-  async function sendToAPI(message) {
+  // Funnel events are counted locally and sent in one beacon at most every 10s
+  function trackEvent(type) {
+    if (!config.trackEvents) return;
+    pendingEvents[type] = Math.min((pendingEvents[type] || 0) + 1, 1000);
+    if (!eventTimer) eventTimer = setTimeout(flushEvents, 10000);
+  }
+
+  function flushEvents() {
+    clearTimeout(eventTimer);
+    eventTimer = null;
+    if (Object.keys(pendingEvents).length === 0) return;
+
+    // A string body goes out as text/plain, so no CORS preflight is needed
+    const body = JSON.stringify({ events: pendingEvents });
+    pendingEvents = {};
+    const url = `${config.apiUrl}/api/v1/widget/${config.shopId}/events`;
+    if (navigator.sendBeacon && navigator.sendBeacon(url, body)) return;
+    fetch(url, {
+      method: 'POST',
+      keepalive: true,
+      headers: {
+        'Content-Type': 'text/plain',
+      },
+      body: body
+    }).catch(() => {});
+  }
+
+  // W3C trace context so the backend can continue this turn's trace
+  function createTraceparent() {
+    const bytes = new Uint8Array(24);
+    (window.crypto || window.msCrypto).getRandomValues(bytes);
+    const hex = Array.from(bytes, (b) => b.toString(16).padStart(2, '0')).join('');
+    return `00-${hex.slice(0, 32)}-${hex.slice(32, 48)}-01`;
+  }
+
+  function reportRenderTiming(traceparent, startedAt) {
+    if (!config.reportTiming) return;
+
+    // Measure once the reply has actually been painted
+    requestAnimationFrame(() => {
+      const ttfr = performance.now() - startedAt;
+      // Plain-text JSON keeps this a CORS-simple request (no preflight)
+      fetch(`${config.apiUrl}/api/v1/widget/${config.shopId}/timing`, {
+        method: 'POST',
+        keepalive: true,
+        headers: {
+          'Content-Type': 'text/plain',
+        },
+        body: JSON.stringify({ traceparent: traceparent, ttfr_ms: ttfr })
+      }).catch(() => {});
+    });
+  }
+
+  async function sendToAPI(message, traceparent) {
     const chatMessages = [
       ...messages.slice(-10), // Keep last 10 messages for context
       { role: 'user', content: message }
     ];
 
-    const response = await fetch(`${config.apiUrl}/api/v1/chat/${config.shopId}/public`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({
-        messages: chatMessages
-      })
+    // text/plain body and traceparent in the URL avoid a CORS preflight per message
+    const url = `${config.apiUrl}/api/v1/chat/${config.shopId}/public?traceparent=${encodeURIComponent(traceparent)}`;
+    // One key per turn, sent in the body rather than a header to stay preflight-free:
+    // a retry attaches to the reply the server is already generating
+    const body = JSON.stringify({
+      messages: chatMessages,
+      session_id: httpSessionId(),
+      idempotency_key: randomHex(16)
+    });
+
+    for (let attempt = 0; ; attempt++) {
+      const controller = new AbortController();
+      const timer = setTimeout(() => controller.abort(), config.requestTimeout);
+      let response;
+      try {
+        response = await fetch(url, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'text/plain',
+          },
+          body: body,
+          signal: controller.signal
+        });
+      } catch (error) {
+        // Network failure or timeout
+        if (attempt >= config.requestRetries) throw error;
+        await wait(1000 * (attempt + 1));
+        continue;
+      } finally {
+        clearTimeout(timer);
+      }
+
+      if (response.status >= 502 && response.status <= 504 && attempt < config.requestRetries) {
+        await wait(1000 * (attempt + 1));
+        continue;
+      }
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+
+      const data = await response.json();
+      return data.reply;
+    }
+  }
+
+  function wait(ms) {
+    return new Promise((resolve) => setTimeout(resolve, ms));
+  }
+
+  function randomHex(byteCount) {
+    const bytes = new Uint8Array(byteCount);
+    (window.crypto || window.msCrypto).getRandomValues(bytes);
+    return Array.from(bytes, (b) => b.toString(16).padStart(2, '0')).join('');
+  }
+
+  function canUseSocket() {
+    return config.transport === 'websocket' && !socketFailed && 'WebSocket' in window;
+  }
+
+  function socketUrl() {
+    return `${config.apiUrl.replace(/^http/, 'ws')}/api/v1/chat/${config.shopId}/ws`;
+  }
+
+  function storedSessionId() {
+    try {
+      return sessionStorage.getItem(`dcb-session-${config.shopId}`);
+    } catch (error) {
+      return null;
+    }
+  }
+
+  function storeSessionId(sessionId) {
+    try {
+      sessionStorage.setItem(`dcb-session-${config.shopId}`, sessionId);
+    } catch (error) {}
+  }
+
+  // Groups HTTP turns of one visit in the transcript log; reuses the socket session if there was one
+  function httpSessionId() {
+    let sessionId = storedSessionId();
+    if (!sessionId) {
+      sessionId = randomHex(16);
+      storeSessionId(sessionId);
+    }
+    return sessionId;
+  }
+
+  // One connection per visitor session; the hello frame resumes an earlier one
+  function openSocket(history) {
+    if (socket && socket.readyState === WebSocket.OPEN) return Promise.resolve(socket);
+    if (socketOpening) return socketOpening;
+
+    socketOpening = new Promise((resolve, reject) => {
+      let ws;
+      try {
+        ws = new WebSocket(socketUrl());
+      } catch (error) {
+        reject(error);
+        return;
+      }
+      const timer = setTimeout(() => ws.close(), 5000);
+
+      ws.onopen = () => {
+        ws.send(JSON.stringify({
+          type: 'hello',
+          session_id: storedSessionId(),
+          turn: socketTurn,
+          seq: socketSeq,
+          history: history
+        }));
+      };
+      ws.onmessage = (event) => {
+        const frame = JSON.parse(event.data);
+        if (frame.type === 'ready') {
+          clearTimeout(timer);
+          storeSessionId(frame.session_id);
+          if (!frame.resumed) {
+            socketTurn = 0;
+            socketSeq = 0;
+            finishedTurn = 0;
+            // The reply we were waiting for is gone with the old session
+            if (pendingReply) failPendingReply(new Error('Chat session expired'));
+          }
+          socket = ws;
+          resolve(ws);
+          return;
+        }
+        handleSocketFrame(ws, frame);
+      };
+      ws.onclose = () => {
+        clearTimeout(timer);
+        reject(new Error('Chat socket closed'));
+        if (socket === ws) {
+          socket = null;
+          if (pendingReply) resumeSocket(1);
+        }
+      };
     });
+    socketOpening.then(() => { socketOpening = null; }, () => { socketOpening = null; });
+    return socketOpening;
+  }
+
+  function resumeSocket(attempt) {
+    setTimeout(() => {
+      openSocket([]).catch(() => {
+        if (attempt < 3) {
+          resumeSocket(attempt + 1);
+        } else if (pendingReply) {
+          failPendingReply(new Error('Chat socket lost'));
+        }
+      });
+    }, 500 * attempt);
+  }
+
+  function sendViaSocket(message, traceparent, startedAt) {
+    // The server rejects a hello whose history entries exceed 4000 characters
+    const history = messages.slice(-11, -1).map((m) => ({ role: m.role, content: m.content.slice(0, 4000) }));
+    return openSocket(history).catch((error) => {
+      // Never connected: stay on HTTP for the rest of this page view
+      socketFailed = true;
+      throw error;
+    }).then((ws) => new Promise((resolve, reject) => {
+      pendingReply = { text: '', contentEl: null, resolve, reject, traceparent, startedAt };
+      ws.send(JSON.stringify({ type: 'message', content: message, traceparent: traceparent }));
+    }));
+  }
 
-    if (!response.ok) {
-      throw new Error(`HTTP ${response.status}`);
+  function handleSocketFrame(ws, frame) {
+    if (frame.type === 'ping') {
+      ws.send(JSON.stringify({ type: 'pong' }));
+      return;
     }
+    if (!pendingReply) return;
+
+    if (frame.type === 'delta') {
+      if (frame.turn !== socketTurn) {
+        socketTurn = frame.turn;
+        pendingReply.text = '';
+      }
+      socketSeq = frame.seq;
+      pendingReply.text += frame.text;
+      if (!pendingReply.contentEl) {
+        hideTypingIndicator();
+        pendingReply.contentEl = createStreamingMessage();
+      }
+      pendingReply.contentEl.textContent = pendingReply.text;
+      scrollToBottom();
+    } else if (frame.type === 'done') {
+      if (frame.turn <= finishedTurn) return;
+      finishedTurn = socketTurn = frame.turn;
+      socketSeq = frame.seq;
+      const reply = pendingReply;
+      pendingReply = null;
+      hideTypingIndicator();
+      if (!reply.contentEl) reply.contentEl = createStreamingMessage();
+      reply.contentEl.textContent = reply.text;
+      messages.push({ role: 'assistant', content: reply.text });
+      reportRenderTiming(reply.traceparent, reply.startedAt);
+      reply.resolve();
+    } else if (frame.type === 'error') {
+      if (frame.turn) finishedTurn = socketTurn = frame.turn;
+      const error = new Error(frame.detail);
+      error.fatal = true;
+      failPendingReply(error);
+    }
+  }
 
-    const data = await response.json();
-    return data.reply;
+  function failPendingReply(error) {
+    const reply = pendingReply;
+    pendingReply = null;
+    if (reply.contentEl) reply.contentEl.closest('.dcb-message').remove();
+    reply.reject(error);
+  }
+
+  function createStreamingMessage() {
+    const messagesContainer = widgetContainer.querySelector('.dcb-messages');
+    const messageEl = document.createElement('div');
+    messageEl.className = 'dcb-message dcb-bot-message';
+    messageEl.innerHTML = `
+      <div class="dcb-message-content"></div>
+      <div class="dcb-message-time">${formatTime(new Date())}</div>
+    `;
+    messagesContainer.appendChild(messageEl);
+    return messageEl.querySelector('.dcb-message-content');
   }
 
   function addMessage(content, isUser) {
@@ -502,6 +862,32 @@
         border-top: 1px solid #E5E7EB;
       }
 
+      .dcb-suggestions {
+        display: flex;
+        flex-direction: column;
+        gap: 6px;
+      }
+
+      .dcb-suggestions:not(:empty) {
+        margin-bottom: 10px;
+      }
+
+      .dcb-suggestion {
+        text-align: left;
+        padding: 8px 12px;
+        background: #F8FAFC;
+        border: 1px solid #E5E7EB;
+        border-radius: 12px;
+        color: #1F2937;
+        font-size: 13px;
+        cursor: pointer;
+        transition: border-color 0.2s;
+      }
+
+      .dcb-suggestion:hover {
+        border-color: ${config.primaryColor};
+      }
+
       .dcb-input-wrapper {
         display: flex;
         gap: 8px;
@@ -610,6 +996,9 @@
   // Cleanup function for SPA compatibility
   window.DetailChatbotWidget = {
     destroy: function() {
+      pendingReply = null;
+      flushEvents();
+      if (socket) socket.close();
       if (widgetContainer) {
         widgetContainer.remove();
         const styles = document.getElementById('dcb-widget-styles');
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.core.metrics import LLM_CANCELLED
+from app.core.resilience import CircuitBreaker
+from app.services import chat
+from app.services.model_routing import ModelRoute
+
+COMPLETION = {
+    "id": "chatcmpl-test",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-test",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "Hello"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 3, "completion_tokens": 1, "total_tokens": 4},
+}
+
+
+class SlowFakeLLM:
+    """Local OpenAI-compatible server answering chat completions after delay seconds"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.requests = 0
+        self.request_seen = asyncio.Event()
+        self.disconnected = asyncio.Event()
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._server.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                await reader.readexactly(int(re.search(rb"content-length: *(\d+)", head, re.I).group(1)))
+                self.requests += 1
+                self.request_seen.set()
+                # The client hanging up shows as end of stream before the reply is due
+                hangup = asyncio.ensure_future(reader.read(1))
+                done, _ = await asyncio.wait({hangup}, timeout=self.delay)
+                if done:
+                    self.disconnected.set()
+                    return
+                hangup.cancel()
+                body = json.dumps(COMPLETION).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+                    b"content-length: %d\r\n\r\n" % len(body) + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+@pytest.fixture
+def shop():
+    return SimpleNamespace(id=uuid4(), business_name="Test Shop", phone_number=None, email=None)
+
+
+@pytest.fixture
+def fake_turn(monkeypatch):
+    """Skip everything before the OpenAI call and isolate the module-level LLM state"""
+    route = ModelRoute(name="test", model="gpt-test", temperature=0.0, max_tokens=50)
+    params = {"model": route.model, "messages": [{"role": "user", "content": "hi"}], "max_tokens": 50}
+    monkeypatch.setattr(chat, "_prepare_turn", lambda db, shop, messages: (None, route, params))
+    monkeypatch.setattr(chat, "llm_breaker", CircuitBreaker("test", failure_threshold=1, recovery_timeout=30))
+    monkeypatch.setattr(chat, "llm_latency", {})
+    monkeypatch.setattr(settings, "llm_hedge_enabled", False)
+
+    def use(server: SlowFakeLLM, slots: int = 1):
+        monkeypatch.setattr(chat, "client", AsyncOpenAI(base_url=server.base_url, api_key="sk-test", max_retries=0))
+        monkeypatch.setattr(chat, "llm_slots", asyncio.Semaphore(slots))
+
+    return use
+
+
+def _cancelled_count() -> float:
+    return LLM_CANCELLED.labels("client_disconnect")._value.get()
+
+
+def test_cancelled_turn_closes_the_upstream_request(fake_turn, shop):
+    async def scenario():
+        async with SlowFakeLLM(delay=30) as server:
+            fake_turn(server)
+            before = _cancelled_count()
+            turn = asyncio.ensure_future(chat.generate_chat_response(None, shop, []))
+            await asyncio.wait_for(server.request_seen.wait(), 5)
+
+            # What the endpoint does when the visitor goes away
+            turn.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await turn
+
+            await asyncio.wait_for(server.disconnected.wait(), 5)
+            assert _cancelled_count() == before + 1
+            assert not chat.llm_slots.locked()
+            assert chat.llm_breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_waiting_for_a_permit_does_not_count_against_the_attempt_timeout(fake_turn, shop, monkeypatch):
+    monkeypatch.setattr(settings, "llm_attempt_timeout", 0.5)
+    monkeypatch.setattr(settings, "llm_max_retries", 0)
+
+    async def scenario():
+        async with SlowFakeLLM(delay=0.35) as server:
+            fake_turn(server, slots=1)
+            # Each call fits the attempt timeout, but the later turns queue for a
+            # permit for longer than that
+            results = await asyncio.gather(*(chat.generate_chat_response(None, shop, []) for _ in range(3)))
+
+            assert [result.source for result in results] == ["model"] * 3
+            assert server.requests == 3
+            assert chat.llm_breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
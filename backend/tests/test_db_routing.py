@@ -0,0 +1,141 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, text
+from sqlalchemy.orm import declarative_base
+
+from app import db as app_db
+from app.core.config import settings
+from app.db import ReplicaSet, SessionLocal, get_db, get_read_db, read_session
+
+Base = declarative_base()
+
+
+class Marker(Base):
+    __tablename__ = "markers"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(32), nullable=False)
+
+
+def _database(path, name):
+    database = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(database)
+    with database.begin() as conn:
+        conn.execute(Marker.__table__.insert(), {"name": name})
+    return database
+
+
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    """A primary and one replica, each holding a row naming it"""
+    primary = _database(tmp_path / "primary.db", "primary")
+    replica = _database(tmp_path / "replica.db", "replica")
+    monkeypatch.setattr(app_db, "engine", primary)
+    monkeypatch.setattr(app_db, "replicas", ReplicaSet([replica]))
+    monkeypatch.setattr(app_db, "_recent_writers", {})
+    return primary, replica
+
+
+def _served_by(session) -> str:
+    return session.execute(text("SELECT name FROM markers ORDER BY id LIMIT 1")).scalar_one()
+
+
+def _request(user_id=None):
+    state = SimpleNamespace(user_id=user_id) if user_id else SimpleNamespace()
+    return SimpleNamespace(state=state, headers={})
+
+
+def _open(dependency, request):
+    generator = dependency(request)
+    return next(generator), generator
+
+
+def test_read_only_sessions_use_the_replica(databases):
+    read = read_session()
+    default = SessionLocal()
+    try:
+        assert _served_by(read) == "replica"
+        assert _served_by(default) == "primary"
+    finally:
+        read.close()
+        default.close()
+
+
+def test_session_reads_its_own_writes_from_the_primary(databases):
+    session = read_session()
+    try:
+        assert _served_by(session) == "replica"
+        session.add(Marker(name="written"))
+        session.flush()
+        assert _served_by(session) == "primary"
+        assert session.query(Marker).filter(Marker.name == "written").count() == 1
+        session.rollback()
+    finally:
+        session.close()
+
+
+def test_user_who_just_wrote_reads_from_the_primary(databases):
+    writer_request = _request("user-1")
+    session, generator = _open(get_db, writer_request)
+    session.add(Marker(name="saved"))
+    session.commit()
+    generator.close()
+
+    # Keyed by the authenticated user, never by the bearer token
+    assert set(app_db._recent_writers) == {"user-1"}
+
+    session, generator = _open(get_read_db, _request("user-1"))
+    assert _served_by(session) == "primary"
+    generator.close()
+
+    session, generator = _open(get_read_db, _request("user-2"))
+    assert _served_by(session) == "replica"
+    generator.close()
+
+    session, generator = _open(get_read_db, _request())
+    assert _served_by(session) == "replica"
+    generator.close()
+
+
+def test_read_your_writes_window_expires(databases, monkeypatch):
+    monkeypatch.setattr(settings, "database_read_your_writes_seconds", 0)
+    session, generator = _open(get_db, _request("user-1"))
+    session.add(Marker(name="saved"))
+    session.commit()
+    generator.close()
+
+    session, generator = _open(get_read_db, _request("user-1"))
+    assert _served_by(session) == "replica"
+    generator.close()
+
+
+def test_failed_replica_is_ejected(tmp_path, databases, monkeypatch):
+    _, replica = databases
+    broken = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    monkeypatch.setattr(app_db, "replicas", ReplicaSet([broken, replica]))
+
+    session = read_session()
+    with pytest.raises(Exception):
+        _served_by(session)
+    session.close()
+
+    # The broken replica is skipped from now on
+    for _ in range(3):
+        session = read_session()
+        assert _served_by(session) == "replica"
+        session.close()
+
+
+def test_reads_fall_back_to_the_primary_when_every_replica_is_ejected(tmp_path, databases, monkeypatch):
+    broken = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    monkeypatch.setattr(app_db, "replicas", ReplicaSet([broken]))
+
+    session = read_session()
+    with pytest.raises(Exception):
+        _served_by(session)
+    session.close()
+
+    session = read_session()
+    assert _served_by(session) == "primary"
+    session.close()
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+from app.models.idempotency import IdempotencyKey
+from app.services import idempotency
+from app.services.chat import ChatResult
+from app.services.idempotency import IdempotencyConflict, chat_idempotency
+
+
+@pytest.fixture
+def shared_db(postgres_url, monkeypatch):
+    """Stores pointed at an emptied idempotency_keys table in the scratch database"""
+    database = create_engine(postgres_url)
+    IdempotencyKey.__table__.create(database, checkfirst=True)
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM idempotency_keys"))
+    monkeypatch.setattr(idempotency, "engine", database)
+    monkeypatch.setattr(settings, "idempotency_poll_interval", 0.02)
+    yield database
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM idempotency_keys"))
+    database.dispose()
+
+
+def _worker():
+    """A fresh store, standing in for another uvicorn worker"""
+    return idempotency.IdempotencyStore(encode=chat_idempotency._encode, decode=chat_idempotency._decode)
+
+
+class Turn:
+    """Work that counts its runs and finishes once released"""
+
+    def __init__(self, reply: str = "Hello", error: Exception = None):
+        self.reply = reply
+        self.error = error
+        self.runs = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> ChatResult:
+        self.runs += 1
+        self.started.set()
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return ChatResult(reply=self.reply, prompt_tokens=3)
+
+
+def test_retries_share_the_turn_without_a_database():
+    # conftest points DATABASE_URL at a closed port, so every claim fails
+    async def scenario():
+        store = _worker()
+        turn = Turn()
+        first = asyncio.ensure_future(store.run("shop:1", "key", "body", turn))
+        await turn.started.wait()
+        second = asyncio.ensure_future(store.run("shop:1", "key", "body", turn))
+        turn.release.set()
+        assert (await first)[1] is False
+        result, replayed = await second
+        assert (result.reply, replayed, turn.runs) == ("Hello", True, 1)
+
+    asyncio.run(scenario())
+
+
+def test_retry_on_another_worker_waits_for_the_reply(shared_db):
+    async def scenario():
+        turn, duplicate = Turn(), Turn(reply="Second completion")
+        first = asyncio.ensure_future(_worker().run("shop:1", "key", "body", turn))
+        await turn.started.wait()
+        second = asyncio.ensure_future(_worker().run("shop:1", "key", "body", duplicate))
+        await asyncio.sleep(0.1)
+        turn.release.set()
+
+        assert (await first)[0].reply == "Hello"
+        result, replayed = await second
+        assert (result, replayed) == (ChatResult(reply="Hello", prompt_tokens=3), True)
+        assert duplicate.runs == 0
+
+        # Later retries replay the stored reply
+        result, replayed = await _worker().run("shop:1", "key", "body", duplicate)
+        assert (result.reply, replayed, duplicate.runs) == ("Hello", True, 0)
+
+    asyncio.run(scenario())
+
+
+def test_key_reused_with_another_body_on_another_worker_conflicts(shared_db):
+    async def scenario():
+        turn = Turn()
+        turn.release.set()
+        await _worker().run("shop:1", "key", "body", turn)
+        with pytest.raises(IdempotencyConflict):
+            await _worker().run("shop:1", "key", "other body", Turn())
+        # Keys are scoped
+        result, replayed = await _worker().run("shop:2", "key", "other body", turn)
+        assert replayed is False
+
+    asyncio.run(scenario())
+
+
+def test_failed_turn_is_run_again_by_a_retry(shared_db):
+    async def scenario():
+        failing = Turn(error=RuntimeError("OpenAI down"))
+        failing.release.set()
+        with pytest.raises(RuntimeError):
+            await _worker().run("shop:1", "key", "body", failing)
+
+        retry = Turn()
+        retry.release.set()
+        result, replayed = await _worker().run("shop:1", "key", "body", retry)
+        assert (result.reply, replayed, retry.runs) == ("Hello", False, 1)
+
+    asyncio.run(scenario())
+
+
+def test_claim_of_a_lost_worker_is_taken_over(shared_db):
+    with shared_db.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO idempotency_keys (scope, key, fingerprint, claim_id, status, expires_at) "
+            "VALUES ('shop:1', 'key', 'body', gen_random_uuid(), 'running', now() - interval '1 second')"
+        ))
+
+    async def scenario():
+        retry = Turn()
+        retry.release.set()
+        result, replayed = await _worker().run("shop:1", "key", "body", retry)
+        assert (result.reply, replayed, retry.runs) == ("Hello", False, 1)
+
+    asyncio.run(scenario())
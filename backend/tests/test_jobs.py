@@ -0,0 +1,163 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.job import Job, JobStatus
+from app.services import jobs
+from app.services.jobs import JobRunner, _backoff_seconds, enqueue_job
+
+KIND = "test.job"
+
+
+@pytest.fixture
+def jobs_db(postgres_url, monkeypatch):
+    """The job runner pointed at an emptied jobs table in the scratch database"""
+    database = create_engine(postgres_url)
+    Job.__table__.create(database, checkfirst=True)
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM jobs"))
+    monkeypatch.setattr(jobs, "engine", database)
+    yield database
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM jobs"))
+    database.dispose()
+
+
+def _enqueue(database, count: int = 1, max_attempts: int = 3) -> None:
+    with Session(database) as db:
+        for n in range(count):
+            enqueue_job(db, KIND, {"n": n}, max_attempts=max_attempts)
+        db.commit()
+
+
+def _job(database):
+    with database.connect() as conn:
+        return conn.execute(text(
+            "SELECT status, attempts, last_error, run_at - now() AS delay FROM jobs"
+        )).one()
+
+
+def _make_due(database) -> None:
+    with database.begin() as conn:
+        conn.execute(text("UPDATE jobs SET run_at = now()"))
+
+
+def _expire_leases(database) -> None:
+    with database.begin() as conn:
+        conn.execute(text("UPDATE jobs SET locked_until = now() - interval '1 second' WHERE status = 'running'"))
+
+
+def test_backoff_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(settings, "job_backoff_base", 5.0)
+    monkeypatch.setattr(settings, "job_backoff_max", 30.0)
+    assert [_backoff_seconds(attempts) for attempts in (1, 2, 3, 4, 10)] == [5.0, 10.0, 20.0, 30.0, 30.0]
+
+
+def test_claim_skips_jobs_locked_by_another_worker(jobs_db):
+    _enqueue(jobs_db, count=4)
+    with jobs_db.connect() as other_worker:
+        locked = other_worker.execute(text(
+            "SELECT id FROM jobs ORDER BY run_at LIMIT 2 FOR UPDATE"
+        )).scalars().all()
+
+        claimed = jobs._claim(10)
+
+        assert len(claimed) == 2
+        assert not {job.id for job in claimed} & set(locked)
+        other_worker.rollback()
+
+    assert [job.attempts for job in jobs._claim(10)] == [1, 1]
+
+
+def test_two_runners_run_each_job_once(jobs_db, monkeypatch):
+    monkeypatch.setattr(settings, "jobs_enabled", True)
+    monkeypatch.setattr(settings, "job_concurrency", 3)
+    monkeypatch.setattr(settings, "job_poll_interval", 0.05)
+    seen = []
+
+    async def handler(payload):
+        await asyncio.sleep(0.01)
+        seen.append(payload["n"])
+
+    monkeypatch.setitem(jobs._handlers, KIND, handler)
+    _enqueue(jobs_db, count=30)
+
+    async def scenario():
+        runners = [JobRunner(), JobRunner()]
+        for runner in runners:
+            await runner.start()
+        try:
+            for _ in range(200):
+                with jobs_db.connect() as conn:
+                    done = conn.execute(text("SELECT count(*) FROM jobs WHERE status = 'done'")).scalar_one()
+                if done == 30:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            for runner in runners:
+                await runner.stop()
+
+    asyncio.run(scenario())
+
+    assert Counter(seen) == Counter(range(30))
+
+
+def test_failed_job_backs_off_then_goes_dead(jobs_db, monkeypatch):
+    monkeypatch.setattr(settings, "job_backoff_base", 60.0)
+    _enqueue(jobs_db, max_attempts=2)
+
+    (job,) = jobs._claim(10)
+    assert jobs._finish(job, "boom") == "retried"
+    status, attempts, last_error, delay = _job(jobs_db)
+    assert (status, attempts, last_error) == (JobStatus.QUEUED, 1, "boom")
+    assert delay.total_seconds() > 50
+    # Not due again until the backoff has passed
+    assert jobs._claim(10) == []
+
+    _make_due(jobs_db)
+    (job,) = jobs._claim(10)
+    assert jobs._finish(job, "boom again") == "dead"
+    status, attempts, last_error, _ = _job(jobs_db)
+    assert (status, attempts, last_error) == (JobStatus.DEAD, 2, "boom again")
+    _make_due(jobs_db)
+    assert jobs._claim(10) == []
+
+
+def test_expired_lease_is_recovered(jobs_db):
+    _enqueue(jobs_db, max_attempts=2)
+    jobs._claim(10)
+    # A live lease is left alone
+    jobs._maintain()
+    assert _job(jobs_db).status == JobStatus.RUNNING
+
+    _expire_leases(jobs_db)
+    jobs._maintain()
+    status, attempts, last_error, _ = _job(jobs_db)
+    assert (status, attempts) == (JobStatus.QUEUED, 1)
+    assert last_error.startswith("Lease expired")
+
+    # Without attempts left the job goes dead instead
+    jobs._claim(10)
+    _expire_leases(jobs_db)
+    jobs._maintain()
+    assert _job(jobs_db).status == JobStatus.DEAD
+
+
+def test_attempt_that_lost_its_lease_records_nothing(jobs_db):
+    _enqueue(jobs_db)
+    (first,) = jobs._claim(10)
+    _expire_leases(jobs_db)
+    jobs._maintain()
+    (second,) = jobs._claim(10)
+
+    assert jobs._finish(first, None) == "lease_lost"
+    assert jobs._finish(first, "late failure") == "lease_lost"
+    status, attempts, last_error, _ = _job(jobs_db)
+    assert (status, attempts) == (JobStatus.RUNNING, 2)
+
+    assert jobs._finish(second, None) == "succeeded"
+    assert _job(jobs_db).status == JobStatus.DONE
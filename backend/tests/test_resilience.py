@@ -0,0 +1,75 @@
+import asyncio
+
+from app.core.resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, call_with_resilience
+
+
+def _call(breaker, func):
+    return call_with_resilience(
+        func,
+        name="test",
+        breaker=breaker,
+        latency=LatencyTracker(),
+        is_retryable=lambda exc: isinstance(exc, ConnectionError),
+        attempt_timeout=5,
+        deadline=5,
+        max_retries=0,
+    )
+
+
+def _half_open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_cancelled_half_open_probe_frees_the_breaker():
+    async def scenario():
+        breaker = _half_open_breaker()
+        await asyncio.sleep(0.06)
+
+        probe = asyncio.ensure_future(_call(breaker, lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+        # Neither tripped nor closed by the cancellation, and the next call is the probe
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+        async def ok():
+            return "ok"
+
+        assert await _call(breaker, ok) == "ok"
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_lost_probe_is_replaced_after_recovery_timeout():
+    async def scenario():
+        breaker = _half_open_breaker()
+        await asyncio.sleep(0.06)
+        assert breaker.allow_request()
+        # The probe never reports back
+        assert not breaker.allow_request()
+        await asyncio.sleep(0.06)
+        assert breaker.allow_request()
+
+    asyncio.run(scenario())
+
+
+def test_open_breaker_rejects_calls():
+    async def scenario():
+        breaker = _half_open_breaker()
+
+        async def ok():
+            return "ok"
+
+        try:
+            await _call(breaker, ok)
+        except CircuitOpenError:
+            return
+        raise AssertionError("call was not rejected")
+
+    asyncio.run(scenario())
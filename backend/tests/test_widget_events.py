@@ -0,0 +1,27 @@
+from uuid import uuid4
+
+from app.core.config import settings
+from app.services import allowed_origins
+from app.services.widget_events import WidgetEventAggregator
+
+
+def test_events_for_unknown_shops_take_no_keys(monkeypatch):
+    known = uuid4()
+    monkeypatch.setattr(allowed_origins, "_shop_ids", frozenset({known}))
+    monkeypatch.setattr(settings, "widget_events_max_keys", 4)
+    aggregator = WidgetEventAggregator()
+
+    for _ in range(100):
+        aggregator.add(uuid4(), {"impression": 1, "open": 1})
+    aggregator.add(known, {"impression": 2, "open": 1})
+
+    assert {key[0] for key in aggregator._counts} == {known}
+    assert sorted(aggregator._counts.values()) == [1, 2]
+
+
+def test_shops_created_by_this_worker_are_known_at_once(monkeypatch):
+    monkeypatch.setattr(allowed_origins, "_shop_ids", frozenset())
+    shop_id = uuid4()
+    assert not allowed_origins.is_known_shop(shop_id)
+    allowed_origins.add_known_shop(shop_id)
+    assert allowed_origins.is_known_shop(shop_id)
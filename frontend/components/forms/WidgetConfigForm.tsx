@@ -12,10 +12,12 @@ interface WidgetConfigData {
   greeting?: string
   placeholder?: string
   show_branding?: boolean
+  allowed_origins?: string[]
 }
 
 interface ChatConfigData {
   user_context?: string
+  faq_shortcut_enabled?: boolean
 }
 
 interface WidgetConfigFormProps {
@@ -30,10 +32,12 @@ export function WidgetConfigForm({ onSuccess }: WidgetConfigFormProps) {
     greeting: "Hi! How can we help you with your services?",
     placeholder: "Ask about pricing, availability, or how we work...",
     show_branding: true,
+    allowed_origins: [],
   })
   
   const [chatConfig, setChatConfig] = useState<ChatConfigData>({
     user_context: "",
+    faq_shortcut_enabled: false,
   })
   
   const [loading, setLoading] = useState(true)
@@ -57,7 +61,10 @@ export function WidgetConfigForm({ onSuccess }: WidgetConfigFormProps) {
 
       try {
         const chat = await chatWidgetAPI.getChatConfig()
-        setChatConfig({ user_context: chat.user_context || '' })
+        setChatConfig({
+          user_context: chat.user_context || '',
+          faq_shortcut_enabled: chat.faq_shortcut_enabled,
+        })
         setHasConfig(prev => ({ ...prev, chat: true }))
       } catch (error) {
         setHasConfig(prev => ({ ...prev, chat: false }))
@@ -244,6 +251,24 @@ export function WidgetConfigForm({ onSuccess }: WidgetConfigFormProps) {
           </div>
         </div>
 
+        {/* Allowed Websites */}
+        <div>
+          <h3 className="text-lg font-semibold text-gray-900 mb-4">Allowed Websites</h3>
+          <label className="block text-sm font-semibold text-gray-700 mb-2">
+            Websites that may use your chat widget (one per line)
+          </label>
+          <textarea
+            value={(widgetConfig.allowed_origins || []).join('\n')}
+            onChange={(e) => handleWidgetChange('allowed_origins', e.target.value.split('\n'))}
+            rows={3}
+            className="w-full px-4 py-3 border border-gray-300 rounded-xl focus:outline-none focus:ring-2 focus:ring-primary-500 focus:border-primary-500 transition-colors font-mono text-sm"
+            placeholder={"https://www.example.com\nhttps://*.example.com"}
+          />
+          <p className="mt-2 text-xs text-gray-500">
+            Leave empty to allow any website. Use *.example.com to include all subdomains.
+          </p>
+        </div>
+
         {/* Chat Behavior */}
         <div>
           <h3 className="text-lg font-semibold text-gray-900 mb-4">Chat Behavior</h3>
@@ -262,6 +287,24 @@ export function WidgetConfigForm({ onSuccess }: WidgetConfigFormProps) {
               This helps the AI provide more relevant responses about your business.
             </p>
           </div>
+
+          {/* Instant FAQ Answers */}
+          <div className="mt-6">
+            <label className="flex items-center">
+              <input
+                type="checkbox"
+                checked={!!chatConfig.faq_shortcut_enabled}
+                onChange={(e) => handleChatChange('faq_shortcut_enabled', e.target.checked)}
+                className="w-4 h-4 text-primary-600 border-gray-300 rounded focus:ring-primary-500"
+              />
+              <span className="ml-3 text-sm font-semibold text-gray-700">
+                Answer matching FAQs instantly
+              </span>
+            </label>
+            <p className="mt-2 text-xs text-gray-500">
+              When a visitor asks something that closely matches one of your FAQs, your saved answer is sent right away.
+            </p>
+          </div>
         </div>
 
         {/* Save Button */}
@@ -245,6 +245,8 @@ export const chatWidgetAPI = {
       shop_id: string
       user_context?: string
       system_prompt: string
+      faq_shortcut_enabled: boolean
+      faq_shortcut_threshold: number
       created_at: string
       updated_at: string
     }>('/api/v1/chat-config/')
@@ -263,6 +265,8 @@ export const chatWidgetAPI = {
   // Update chat config
   updateChatConfig: async (configData: {
     user_context?: string
+    faq_shortcut_enabled?: boolean
+    faq_shortcut_threshold?: number
   }) => {
     return apiRequest('/api/v1/chat-config/', {
       method: 'PUT',
@@ -281,6 +285,7 @@ export const chatWidgetAPI = {
       greeting: string
       placeholder: string
       show_branding: boolean
+      allowed_origins: string[]
       created_at: string
       updated_at: string
     }>('/api/v1/chat-config/widget-config')
@@ -294,6 +299,7 @@ export const chatWidgetAPI = {
     greeting?: string
     placeholder?: string
     show_branding?: boolean
+    allowed_origins?: string[]
   }) => {
     return apiRequest('/api/v1/chat-config/widget-config', {
       method: 'POST',
@@ -309,6 +315,7 @@ export const chatWidgetAPI = {
     greeting?: string
     placeholder?: string
     show_branding?: boolean
+    allowed_origins?: string[]
   }) => {
     return apiRequest('/api/v1/chat-config/widget-config', {
       method: 'PUT',